@@ -0,0 +1,325 @@
+"""Many simultaneous connections against the WSGI and ASGI entry points.
+
+Starts each server in its own process on the same database:
+
+    wsgi   ``src.main:app`` on the threaded werkzeug server (one thread per
+           connection, as ``app.run`` serves it)
+    asgi   ``src.asgi:application`` on uvicorn (one event loop)
+
+Then ``--connections`` clients connect at once, wait until every connection
+attempt has finished, and each sends ``--requests`` keep-alive requests from
+the scenario's mix:
+
+    track  page view and interaction beacons
+    read   project, blog and shop reads (after a warm-up that fills the cache)
+
+Reports how many connections were established, request outcomes, throughput
+and latency percentiles for every mode and scenario. Run from
+``portfolio_backend``. Point ``DATABASE_URL`` at data from
+``benchmarks.datagen``, or pass ``--generate N`` for a scratch database:
+
+    python -m benchmarks.concurrency --generate 20000 --connections 1000
+
+Tracking requests add rows to the database they run against.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+
+from benchmarks.harness import ENDPOINTS, fill, git_revision, percentile
+
+SCENARIOS = {
+    'track': ['analytics.track_pageview', 'analytics.track_interaction'],
+    'read': ['projects.list', 'projects.get', 'blog.list', 'blog.categories', 'shop.list', 'shop.get']
+}
+MODES = ('wsgi', 'asgi')
+
+
+def raise_file_limit():
+    """Lift the soft open-file limit to the hard one; servers inherit it"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or hard > soft:
+        soft = 1 << 20 if hard == resource.RLIM_INFINITY else hard
+        resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+    return soft
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def sample_values(url):
+    """Placeholder values for the endpoint templates, read without importing the app"""
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        def pick(query):
+            return [value for value, in connection.execute(text(query))]
+        values = {
+            'project_id': pick('SELECT id FROM project LIMIT 50'),
+            'post_slug': pick('SELECT slug FROM blog_post WHERE published LIMIT 50'),
+            'product_id': pick('SELECT id FROM product WHERE active LIMIT 50')
+        }
+    engine.dispose()
+    return values
+
+
+def build_requests(scenario, values, rng, count, offset):
+    """``count`` raw ``(method, path, body)`` requests drawn from a scenario's endpoints"""
+    endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in SCENARIOS[scenario]]
+    requests = []
+    for n in range(offset, offset + count):
+        endpoint = rng.choice(endpoints)
+        body = json.dumps(fill(endpoint.body, values, rng, n)).encode() if endpoint.body is not None else None
+        requests.append((endpoint.method, fill(endpoint.path, values, rng, n), body))
+    return requests
+
+
+def serve(mode, port, backlog):
+    """Server process command line for ``mode``"""
+    if mode == 'asgi':
+        return [
+            sys.executable, '-m', 'uvicorn', 'src.asgi:application', '--host', '127.0.0.1', '--port', str(port),
+            '--backlog', str(backlog), '--log-level', 'warning', '--no-access-log'
+        ]
+    return [sys.executable, '-m', 'benchmarks.concurrency', '--serve-wsgi', str(port), '--backlog', str(backlog)]
+
+
+def serve_wsgi(port, backlog):
+    from src.main import app
+    from benchmarks.harness import LocalServer
+
+    with LocalServer(app, backlog=backlog, port=port) as server:
+        server.thread.join()
+
+
+async def fetch(reader, writer, method, path, body):
+    """Send one HTTP/1.1 request and read the whole response; ``(status, keep_alive)``"""
+    head = f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept-Encoding: gzip\r\n'
+    if body is not None:
+        head += f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+    writer.write(head.encode('latin-1') + b'\r\n' + (body or b''))
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed before the response')
+    status = int(status_line.split()[1])
+    length, chunked, keep_alive = None, False, True
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding':
+            chunked = 'chunked' in value
+        elif name == 'connection':
+            keep_alive = value != 'close'
+
+    if status == 304 or status < 200 or status == 204:
+        pass
+    elif chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length is not None:
+        await reader.readexactly(length)
+    else:
+        await reader.read()
+        keep_alive = False
+    return status, keep_alive
+
+
+async def load(port, connection_requests, timeout):
+    """Open one connection per request list at once, then run them all"""
+    outcome = {'connected': 0, 'connect_failed': 0, 'transport_errors': 0, 'statuses': Counter()}
+    latencies = []
+    attempted = 0
+    go = asyncio.Event()
+
+    async def client(requests):
+        nonlocal attempted
+        connection = None
+        try:
+            connection = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+            outcome['connected'] += 1
+        except (OSError, asyncio.TimeoutError):
+            outcome['connect_failed'] += 1
+        attempted += 1
+        if attempted == len(connection_requests):
+            go.set()
+        await go.wait()
+        if connection is None:
+            return
+
+        reader, writer = connection
+        try:
+            for method, path, body in requests:
+                started = time.perf_counter()
+                status, keep_alive = await asyncio.wait_for(fetch(reader, writer, method, path, body), timeout)
+                latencies.append(time.perf_counter() - started)
+                outcome['statuses'][status] += 1
+                if not keep_alive:
+                    writer.close()
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            outcome['transport_errors'] += 1
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(client(requests)) for requests in connection_requests]
+    await go.wait()
+    connected_at = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - connected_at
+
+    ordered = sorted(latencies)
+    statuses = outcome.pop('statuses')
+    return {
+        **outcome,
+        'connect_seconds': round(connected_at - started, 3),
+        'requests': len(latencies),
+        'ok': sum(count for status, count in statuses.items() if status < 400),
+        'http_errors': sum(count for status, count in statuses.items() if status >= 400),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 2) if ordered else None,
+        'p90_ms': round(percentile(ordered, 0.90) * 1000, 2) if ordered else None,
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2) if ordered else None,
+        'max_ms': round(ordered[-1] * 1000, 2) if ordered else None
+    }
+
+
+def wait_until_ready(process, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with status {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1) as probe:
+                probe.sendall(b'GET /api/projects/categories HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n')
+                if probe.recv(16).startswith(b'HTTP/1.1 200'):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'Server did not answer on port {port} within {timeout}s')
+
+
+def run_mode(mode, args, values):
+    port = free_port()
+    backlog = max(128, args.connections * 2)
+    process = subprocess.Popen(serve(mode, port, backlog))
+    results = {}
+    try:
+        wait_until_ready(process, port)
+        for scenario in args.scenarios:
+            rng = random.Random(args.seed)
+            # A few sequential connections first, so reads measure the warm (cached) path
+            warmup = [build_requests(scenario, values, rng, 20, offset) for offset in range(0, 200, 20)]
+            for requests in warmup:
+                asyncio.run(load(port, [requests], args.timeout))
+            connection_requests = [
+                build_requests(scenario, values, rng, args.requests, index * args.requests)
+                for index in range(args.connections)
+            ]
+            row = results[scenario] = asyncio.run(load(port, connection_requests, args.timeout))
+            print(
+                f'{mode:<5} {scenario:<6} {row["connected"]:>9} {row["connect_failed"]:>6} '
+                f'{row["ok"]:>8} {row["http_errors"]:>7} {row["transport_errors"]:>6} '
+                f'{row["throughput_rps"]:>8.1f} {row["p50_ms"] or 0:>9.1f} {row["p99_ms"] or 0:>9.1f} '
+                f'{row["max_ms"] or 0:>9.1f}',
+                flush=True
+            )
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', type=int, default=1000, help='Simultaneous client connections.')
+    parser.add_argument('--requests', type=int, default=10, help='Keep-alive requests per connection.')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=['track', 'read'])
+    parser.add_argument('--timeout', type=float, default=60.0, help='Seconds allowed per connect or request.')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--generate', type=int, metavar='PAGEVIEWS',
+                        help='Run against a fresh scratch database with this many generated page views.')
+    parser.add_argument('--output', help='Write the results JSON here.')
+    parser.add_argument('--serve-wsgi', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    parser.add_argument('--backlog', type=int, default=2048, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_wsgi:
+        serve_wsgi(args.serve_wsgi, args.backlog)
+        return
+
+    limit = raise_file_limit()
+    if limit < args.connections * 2 + 64:
+        parser.error(f'open-file limit {limit} is too low for {args.connections} connections')
+
+    if args.generate:
+        directory = tempfile.mkdtemp(prefix='portfolio-bench-')
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(directory, "app.db")}'
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.datagen', '--pageviews', str(args.generate),
+             '--seed', str(args.seed), '--compact'],
+            check=True, stdout=subprocess.DEVNULL
+        )
+        print(f'Generated {args.generate:,} page views in {os.environ["DATABASE_URL"]}')
+    url = os.environ.get('DATABASE_URL')
+    if not url:
+        parser.error('set DATABASE_URL or pass --generate')
+    values = sample_values(url)
+
+    print(
+        f'{"mode":<5} {"load":<6} {"connected":>9} {"failed":>6} {"ok":>8} {"errors":>7} {"resets":>6} '
+        f'{"req/s":>8} {"p50 ms":>9} {"p99 ms":>9} {"max ms":>9}'
+    )
+    results = {mode: run_mode(mode, args, values) for mode in args.modes}
+
+    if args.output:
+        commit, dirty = git_revision()
+        with open(args.output, 'w') as output:
+            json.dump({
+                'commit': commit,
+                'dirty': dirty,
+                'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'connections': args.connections,
+                'requests_per_connection': args.requests,
+                'seed': args.seed,
+                'results': results
+            }, output, indent=2, sort_keys=True)
+        print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
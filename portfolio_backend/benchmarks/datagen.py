@@ -0,0 +1,466 @@
+"""Reproducible synthetic data at realistic scale.
+
+Fills the configured database (``DATABASE_URL``) with content and traffic
+shaped like a real portfolio site rather than uniform noise:
+
+- Page popularity is Zipfian: a few pages (the home page, the shop, a
+  couple of viral posts) take most of the views, with a long tail of
+  posts, projects and products.
+- Views come in sessions. A session belongs to a returning or one-off
+  visitor with a fixed IP, device and browser. It has a geometric number
+  of views a few seconds to minutes apart, and each view may carry clicks,
+  scrolls and downloads.
+- Timestamps are bursty. Traffic follows a day/night curve, varies from
+  day to day, and has a few launch days with several times the usual load.
+
+The same ``--seed`` and ``--now`` always produce the same rows. Rows are written in
+chunks with one executemany per table, and page views and interactions go
+straight to their month partitions. Afterwards the tag, search and sales
+indexes are rebuilt so every endpoint sees consistent data. Point
+``DATABASE_URL`` at a scratch file; the generator appends to whatever is
+already there.
+
+Run from ``portfolio_backend``:
+
+    DATABASE_URL=sqlite:////tmp/bench/app.db python -m benchmarks.datagen --pageviews 1000000
+"""
+import argparse
+import bisect
+import itertools
+import json
+import math
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, func, insert, select, update
+
+from src.models.user import db, User
+from src.models.analytics import PageView, Interaction
+from src.models.blog import BlogPost
+from src.models.message import Message
+from src.models.product import Product
+from src.models.project import Project
+from src.models.purchase import Purchase
+from src.services.partitions import partition_rows
+
+CHUNK_SIZE = 20000
+
+BLOG_CATEGORIES = ['AI', 'Frontend', 'Backend', 'DevOps', 'Career', 'Design', 'Databases', 'Tutorials']
+PROJECT_CATEGORIES = ['web', 'ai', 'mobile', 'data', 'devops', 'design']
+PRODUCT_CATEGORIES = ['software', 'templates', 'courses', 'ebooks', 'assets']
+TAGS = [
+    'python', 'flask', 'react', 'typescript', 'sqlite', 'postgres', 'docker', 'kubernetes', 'aws',
+    'tailwind', 'framer-motion', 'nlp', 'tensorflow', 'pytorch', 'rust', 'go', 'graphql', 'redis',
+    'testing', 'performance', 'security', 'accessibility', 'css', 'nodejs', 'nextjs', 'vue'
+]
+WORDS = (
+    'build ship scale design data model query cache index stream render async deploy portfolio '
+    'component layout pipeline service latency throughput review refactor feature release debug '
+    'pattern system interface network storage browser mobile desktop server client token'
+).split()
+STATIC_PAGES = ['/', '/projects', '/blog', '/shop', '/about', '/contact', '/resume', '/search']
+
+REFERRERS = [None, 'https://www.google.com/', 'https://github.com/', 'https://www.linkedin.com/',
+             'https://news.ycombinator.com/', 'https://twitter.com/', 'https://www.reddit.com/']
+REFERRER_WEIGHTS = [45, 25, 10, 8, 5, 4, 3]
+DEVICES = [('desktop', 55), ('mobile', 38), ('tablet', 7)]
+BROWSERS = [('Chrome', 62), ('Safari', 20), ('Firefox', 8), ('Edge', 7), ('Opera', 3)]
+SYSTEMS = {
+    'desktop': [('Windows', 55), ('macOS', 30), ('Linux', 15)],
+    'mobile': [('Android', 60), ('iOS', 40)],
+    'tablet': [('iOS', 65), ('Android', 35)]
+}
+COUNTRIES = [('US', 'New York', 30), ('US', 'San Francisco', 10), ('GB', 'London', 10), ('DE', 'Berlin', 8),
+             ('IN', 'Bangalore', 12), ('PK', 'Lahore', 8), ('CA', 'Toronto', 6), ('BR', 'Sao Paulo', 6),
+             ('FR', 'Paris', 5), ('JP', 'Tokyo', 5)]
+INTERACTIONS = [('click', 60), ('scroll', 30), ('hover', 6), ('download', 4)]
+
+# Relative traffic for each hour of the day (UTC), busiest in the afternoon
+HOURLY_TRAFFIC = [2, 1, 1, 1, 1, 2, 3, 5, 7, 8, 9, 10, 10, 10, 10, 9, 9, 8, 8, 7, 6, 5, 4, 3]
+
+
+def zipf_weights(count, exponent=1.1):
+    """Cumulative Zipf weights for ranks ``1..count``, for ``random.choices``"""
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def weighted(rng, pairs):
+    """Pick from ``[(value, ..., weight)]``"""
+    return rng.choices(pairs, weights=[pair[-1] for pair in pairs])[0]
+
+
+def sentence(rng, words=8):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def paragraphs(rng, count):
+    return '\n\n'.join(' '.join(sentence(rng, rng.randint(8, 16)) for _ in range(5)) for _ in range(count))
+
+
+def tag_list(rng, low=2, high=5):
+    return json.dumps(rng.sample(TAGS, rng.randint(low, high)))
+
+
+def spread(rng, now, days):
+    """A timestamp in the last ``days`` days, older ones less likely"""
+    return now - timedelta(days=days * rng.random() ** 1.5, seconds=rng.randrange(86400))
+
+
+def user_rows(rng, count, offset):
+    return [
+        {'username': f'user{offset + index}', 'email': f'user{offset + index}@example.com'}
+        for index in range(count)
+    ]
+
+
+def post_rows(rng, count, offset, now, days):
+    categories = zipf_weights(len(BLOG_CATEGORIES), 0.8)
+    rows = []
+    for index in range(count):
+        title = sentence(rng, rng.randint(4, 9))[:-1]
+        created_at = spread(rng, now, days)
+        published = rng.random() < 0.85
+        body = paragraphs(rng, rng.randint(3, 12))
+        rows.append({
+            'title': title,
+            'slug': f'{"-".join(title.lower().split()[:6])}-{offset + index}',
+            'content': body,
+            'excerpt': body[:200],
+            'category': rng.choices(BLOG_CATEGORIES, cum_weights=categories)[0],
+            'tags': tag_list(rng),
+            'featured_image': f'/images/blog/{offset + index}.jpg',
+            'published': published,
+            'featured': published and rng.random() < 0.05,
+            'reading_time': max(1, len(body.split()) // 200),
+            'views': 0,
+            'created_at': created_at,
+            'updated_at': created_at,
+            'published_at': created_at + timedelta(hours=rng.randint(1, 72)) if published else None
+        })
+    return rows
+
+
+def project_rows(rng, count, offset, now, days):
+    categories = zipf_weights(len(PROJECT_CATEGORIES), 0.8)
+    rows = []
+    for index in range(count):
+        created_at = spread(rng, now, days)
+        rows.append({
+            'title': sentence(rng, rng.randint(2, 5))[:-1],
+            'description': paragraphs(rng, rng.randint(1, 4)),
+            'short_description': sentence(rng, 12),
+            'category': rng.choices(PROJECT_CATEGORIES, cum_weights=categories)[0],
+            'tags': tag_list(rng),
+            'tech_stack': tag_list(rng, 3, 6),
+            'image_url': f'/images/projects/{offset + index}.jpg',
+            'demo_url': '#',
+            'github_url': f'https://github.com/example/project-{offset + index}',
+            'featured': rng.random() < 0.08,
+            'status': rng.choices(['completed', 'in_progress', 'planned'], [70, 20, 10])[0],
+            'created_at': created_at,
+            'updated_at': created_at
+        })
+    return rows
+
+
+def product_rows(rng, count, offset, now, days):
+    categories = zipf_weights(len(PRODUCT_CATEGORIES), 0.8)
+    rows = []
+    for index in range(count):
+        created_at = spread(rng, now, days)
+        price = round(min(499.0, math.exp(rng.gauss(3.4, 0.7))), 2)
+        digital = rng.random() < 0.8
+        rows.append({
+            'name': sentence(rng, rng.randint(2, 4))[:-1],
+            'description': paragraphs(rng, rng.randint(1, 3)),
+            'short_description': sentence(rng, 10),
+            'price': price,
+            'original_price': round(price * 1.3, 2) if rng.random() < 0.2 else None,
+            'category': rng.choices(PRODUCT_CATEGORIES, cum_weights=categories)[0],
+            'tags': tag_list(rng),
+            'image_url': f'/images/products/{offset + index}.jpg',
+            'gallery_images': json.dumps([f'/images/products/{offset + index}-{n}.jpg' for n in range(rng.randint(0, 4))]),
+            'download_url': f'/downloads/{offset + index}.zip' if digital else None,
+            'file_size': f'{rng.randint(1, 500)} MB' if digital else None,
+            'file_format': 'zip' if digital else None,
+            'featured': rng.random() < 0.05,
+            'active': rng.random() < 0.95,
+            'stock_quantity': -1 if digital else rng.randint(0, 200),
+            'sales_count': 0,
+            'created_at': created_at,
+            'updated_at': created_at
+        })
+    return rows
+
+
+def purchase_rows(rng, count, product_ids, prices, now, days):
+    popularity = zipf_weights(len(product_ids))
+    rows = []
+    for _ in range(count):
+        rank = bisect.bisect_left(popularity, rng.random() * popularity[-1])
+        rows.append({
+            'product_id': product_ids[rank],
+            'quantity': 1 if rng.random() < 0.9 else rng.randint(2, 5),
+            'unit_price': prices[rank],
+            'source': 'checkout',
+            'applied': False,
+            'created_at': spread(rng, now, days)
+        })
+    return rows
+
+
+def message_rows(rng, count, now, days):
+    rows = []
+    for index in range(count):
+        created_at = spread(rng, now, days)
+        age = (now - created_at).days
+        # Older messages have usually been handled
+        status = rng.choices(['new', 'read', 'replied', 'archived'], [1, 2, 2, 1] if age < 7 else [1, 10, 30, 20])[0]
+        rows.append({
+            'name': f'Visitor {index}',
+            'email': f'visitor{index}@example.com',
+            'subject': sentence(rng, 5),
+            'message': paragraphs(rng, 1),
+            'company': rng.choice([None, 'Acme Corp', 'Initech', 'Globex', 'Umbrella']),
+            'project_type': rng.choice([None, 'web', 'mobile', 'ai', 'consulting']),
+            'budget_range': rng.choice([None, '<$1k', '$1k-$5k', '$5k-$20k', '>$20k']),
+            'status': status,
+            'priority': rng.choices(['low', 'normal', 'high', 'urgent'], [20, 65, 12, 3])[0],
+            'source': rng.choices(['contact_form', 'chat', 'email'], [80, 12, 8])[0],
+            'ip_address': f'198.51.{rng.randrange(256)}.{rng.randrange(256)}',
+            'created_at': created_at,
+            'read_at': created_at + timedelta(hours=rng.randint(1, 48)) if status != 'new' else None,
+            'replied_at': created_at + timedelta(hours=rng.randint(2, 96)) if status in ('replied', 'archived') else None
+        })
+    return rows
+
+
+def make_visitors(rng, count):
+    """Visitor profiles; a visitor keeps one address, device and browser"""
+    visitors = []
+    for index in range(count):
+        device = weighted(rng, DEVICES)[0]
+        browser = weighted(rng, BROWSERS)[0]
+        system = weighted(rng, SYSTEMS[device])[0]
+        country, city, _ = weighted(rng, COUNTRIES)
+        visitors.append({
+            'ip_address': f'{rng.randrange(1, 224)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}',
+            'device_type': device,
+            'browser': browser,
+            'os': system,
+            'country': country,
+            'city': city,
+            'user_agent': f'Mozilla/5.0 ({system}) {browser}/{rng.randint(90, 130)}.0'
+        })
+    return visitors
+
+
+def day_weights(rng, days, launch_days):
+    """Relative traffic per day: a slow upward trend, daily noise and a few launch spikes"""
+    weights = [(1 + day / days) * math.exp(rng.gauss(0, 0.35)) for day in range(days)]
+    for day in rng.sample(range(days), min(launch_days, days)):
+        # A launch spikes for a day and tails off over the next few
+        for offset, factor in enumerate((8, 4, 2, 1.5)):
+            if day + offset < days:
+                weights[day + offset] *= factor
+    return weights
+
+
+def session_lengths(rng, views):
+    """Geometric session lengths (mean of three views) adding up to exactly ``views``"""
+    lengths = []
+    while views > 0:
+        length = min(views, 1 + int(math.log(1 - rng.random()) / math.log(2 / 3)))
+        lengths.append(length)
+        views -= length
+    return lengths
+
+
+def traffic(rng, pageviews, pages, now, days, launch_days=4):
+    """Yield ``(pageview_rows, interaction_rows)`` chunks, roughly in time order"""
+    page_weights = zipf_weights(len(pages))
+    visitors = make_visitors(rng, max(1, pageviews // 12))
+    visitor_weights = zipf_weights(len(visitors), 0.7)
+    day_totals = list(itertools.accumulate(day_weights(rng, days, launch_days)))
+    hour_weights = list(itertools.accumulate(HOURLY_TRAFFIC))
+    # The last day is today, so nothing lands after ``now``
+    first_day = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+
+    def session_start(day_start):
+        while True:
+            started = day_start + timedelta(
+                hours=rng.choices(range(24), cum_weights=hour_weights)[0],
+                seconds=rng.randrange(3600)
+            )
+            if started < now:
+                return started
+
+    views, actions = [], []
+    produced = 0
+    session_number = 0
+    for day, total in enumerate(day_totals):
+        # Each day gets its share of the exact total
+        quota = round(pageviews * total / day_totals[-1]) - produced
+        lengths = session_lengths(rng, quota)
+        day_start = first_day + timedelta(days=day)
+        starts = sorted(session_start(day_start) for _ in lengths)
+        for started, length in zip(starts, lengths):
+            session_number += 1
+            visitor = visitors[bisect.bisect_left(visitor_weights, rng.random() * visitor_weights[-1])]
+            session_id = f'sess-{session_number:x}'
+            referrer = rng.choices(REFERRERS, weights=REFERRER_WEIGHTS)[0]
+            at = started
+            for _ in range(length):
+                page_url, page_title = pages[bisect.bisect_left(page_weights, rng.random() * page_weights[-1])]
+                duration = int(rng.expovariate(1 / 45)) + 1
+                views.append({
+                    'page_url': page_url,
+                    'page_title': page_title,
+                    'referrer': referrer,
+                    'session_id': session_id,
+                    'duration': duration,
+                    'created_at': min(at, now),
+                    **visitor
+                })
+                for _ in range(rng.choices((0, 1, 2, 3), [50, 30, 15, 5])[0]):
+                    event_type = weighted(rng, INTERACTIONS)[0]
+                    actions.append({
+                        'event_type': event_type,
+                        'element_id': f'{event_type}-{rng.randrange(30)}',
+                        'element_class': rng.choice(['btn', 'link', 'card', 'nav-item', None]),
+                        'element_text': rng.choice(['Download', 'View demo', 'Buy now', 'Read more', None]),
+                        'page_url': page_url,
+                        'session_id': session_id,
+                        'ip_address': visitor['ip_address'],
+                        'created_at': min(at + timedelta(seconds=rng.randrange(duration)), now)
+                    })
+                referrer = page_url
+                at += timedelta(seconds=duration + rng.randrange(1, 30))
+            produced += length
+            if len(views) >= CHUNK_SIZE:
+                yield views, actions
+                views, actions = [], []
+    if views:
+        yield views, actions
+
+
+def _next_offset(model):
+    return (db.session.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _bulk_insert(model, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(insert(model), rows[start:start + CHUNK_SIZE])
+    db.session.commit()
+    return len(rows)
+
+
+def populate(pageviews=100000, posts=1000, projects=200, products=500, messages=2000, users=50,
+             purchases=None, days=180, seed=42, now=None, log=print):
+    """Insert a full synthetic data set; returns ``{table: rows inserted}``.
+
+    Must run inside an application context.
+    """
+    from src.services.search import rebuild_search_index
+    from src.services.purchases import rebuild_sales_counts
+    from src.services.tags import rebuild_tag_index
+
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    purchases = products * 20 if purchases is None else purchases
+    inserted = Counter()
+
+    post_offset = _next_offset(BlogPost)
+    project_offset = _next_offset(Project)
+    product_offset = _next_offset(Product)
+    inserted['user'] = _bulk_insert(User, user_rows(rng, users, _next_offset(User)))
+    inserted['blog_post'] = _bulk_insert(BlogPost, post_rows(rng, posts, post_offset, now, days))
+    inserted['project'] = _bulk_insert(Project, project_rows(rng, projects, project_offset, now, days))
+    inserted['product'] = _bulk_insert(Product, product_rows(rng, products, product_offset, now, days))
+    inserted['message'] = _bulk_insert(Message, message_rows(rng, messages, now, days))
+
+    catalog = db.session.execute(
+        select(Product.id, Product.price).where(Product.id >= product_offset).order_by(Product.id)
+    ).all()
+    if catalog and purchases:
+        product_ids, prices = zip(*catalog)
+        inserted['purchase'] = _bulk_insert(Purchase, purchase_rows(rng, purchases, product_ids, prices, now, days))
+        rebuild_sales_counts()
+    log(f'Inserted content: {dict(inserted)}')
+
+    # Every piece of content is a page; shuffle so popularity does not follow insert order
+    slugs = db.session.execute(select(BlogPost.slug, BlogPost.title).where(BlogPost.id >= post_offset)).all()
+    pages = [(url, url.strip('/').title() or 'Home') for url in STATIC_PAGES]
+    pages += [(f'/blog/{slug}', title) for slug, title in slugs]
+    pages += [(f'/projects/{project_offset + n}', f'Project {project_offset + n}') for n in range(projects)]
+    pages += [(f'/shop/products/{product_id}', f'Product {product_id}') for product_id, _ in catalog]
+    head, tail = pages[:3], pages[3:]
+    rng.shuffle(tail)
+    pages = head + tail
+
+    started = time.perf_counter()
+    post_views = Counter()
+    for views, actions in traffic(rng, pageviews, pages, now, days):
+        # Create any missing partitions before the session takes the write lock
+        by_table = {**partition_rows(PageView, views), **partition_rows(Interaction, actions)}
+        for table, rows in by_table.items():
+            db.session.execute(insert(table), rows)
+        db.session.commit()
+        inserted['page_view'] += len(views)
+        inserted['interaction'] += len(actions)
+        post_views.update(row['page_url'][6:] for row in views if row['page_url'].startswith('/blog/'))
+        log(f'  {inserted["page_view"]:,} page views, {inserted["interaction"]:,} interactions '
+            f'({inserted["page_view"] / (time.perf_counter() - started):,.0f} views/s)')
+
+    # Blog view counters agree with the generated traffic
+    if post_views:
+        table = BlogPost.__table__
+        db.session.execute(
+            update(table).where(table.c.slug == bindparam('post_slug')).values(
+                views=bindparam('views'), updated_at=table.c.updated_at
+            ),
+            [{'post_slug': slug, 'views': count} for slug, count in post_views.items()]
+        )
+        db.session.commit()
+
+    rebuild_tag_index()
+    rebuild_search_index()
+    return dict(inserted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pageviews', type=int, default=100000)
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--projects', type=int, default=200)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--purchases', type=int, default=None, help='Defaults to 20 per product.')
+    parser.add_argument('--days', type=int, default=180, help='Spread the data over this many days.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--now', type=datetime.fromisoformat, default=None,
+                        help='Anchor timestamps here (ISO format) instead of the current time.')
+    parser.add_argument('--compact', action='store_true', help='Build the analytics rollups afterwards.')
+    args = parser.parse_args()
+
+    # Importing the app connects to DATABASE_URL and creates the schema
+    from src.main import app
+    from src.services.rollups import compact_rollups
+
+    started = time.perf_counter()
+    with app.app_context():
+        inserted = populate(
+            pageviews=args.pageviews, posts=args.posts, projects=args.projects, products=args.products,
+            messages=args.messages, users=args.users, purchases=args.purchases, days=args.days, seed=args.seed,
+            now=args.now
+        )
+        if args.compact:
+            print(f'Compacted {compact_rollups(settle_seconds=0)} hour(s) of rollups')
+    print(f'Done in {time.perf_counter() - started:.1f}s: {inserted}')
+
+
+if __name__ == '__main__':
+    main()
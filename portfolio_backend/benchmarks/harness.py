@@ -0,0 +1,401 @@
+"""Per-endpoint latency and throughput across every blueprint.
+
+Sends ``--requests`` requests to each entry in ``ENDPOINTS`` and reports
+p50/p90/p99 latency, throughput and error counts. Path placeholders such
+as ``{post_slug}`` are filled from rows in the database, so point
+``DATABASE_URL`` at data from ``benchmarks.datagen``, or pass
+``--generate N`` to build a scratch database with N page views first.
+
+Two ways to drive the app:
+
+    client   the Flask test client in this process, one request at a time;
+             measures handler cost without any network stack
+    server   a threaded werkzeug server on a local port with
+             ``--concurrency`` workers making keep-alive HTTP requests
+
+The results are JSON, tagged with the commit, interpreter and data set
+size. ``--baseline`` (after a run) or ``--compare A B`` (on its own) shows
+the change per endpoint and exits with status 1 when a p50 or p99 is worse
+than ``--threshold`` percent:
+
+    python -m benchmarks.harness --generate 100000 --mode server --output head.json
+    git stash && python -m benchmarks.harness --generate 100000 --mode server --baseline head.json
+
+Run from ``portfolio_backend``. Write endpoints (``--skip-writes`` leaves
+them out) add rows to the database they run against.
+"""
+import argparse
+import fnmatch
+import http.client
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+
+Endpoint = namedtuple('Endpoint', 'name method path body', defaults=(None,))
+
+ENDPOINTS = [
+    Endpoint('user.list', 'GET', '/api/users'),
+    Endpoint('user.get', 'GET', '/api/users/{user_id}'),
+    Endpoint('projects.list', 'GET', '/api/projects'),
+    Endpoint('projects.list_category', 'GET', '/api/projects?category=web'),
+    Endpoint('projects.get', 'GET', '/api/projects/{project_id}'),
+    Endpoint('projects.categories', 'GET', '/api/projects/categories'),
+    Endpoint('blog.list', 'GET', '/api/blog/posts'),
+    Endpoint('blog.list_category', 'GET', '/api/blog/posts?category=AI'),
+    Endpoint('blog.get', 'GET', '/api/blog/posts/{post_slug}'),
+    Endpoint('blog.categories', 'GET', '/api/blog/categories'),
+    Endpoint('shop.list', 'GET', '/api/shop/products'),
+    Endpoint('shop.list_price', 'GET', '/api/shop/products?sort_by=price&order=asc'),
+    Endpoint('shop.get', 'GET', '/api/shop/products/{product_id}'),
+    Endpoint('shop.categories', 'GET', '/api/shop/categories'),
+    Endpoint('shop.sales', 'GET', '/api/shop/sales?days=30'),
+    Endpoint('contact.list', 'GET', '/api/contact/messages'),
+    Endpoint('contact.list_new', 'GET', '/api/contact/messages?status=new'),
+    Endpoint('contact.stats', 'GET', '/api/contact/stats'),
+    Endpoint('analytics.dashboard', 'GET', '/api/analytics/dashboard?days=30'),
+    Endpoint('analytics.pageviews', 'GET', '/api/analytics/pageviews?limit=50'),
+    Endpoint('analytics.pageviews_page', 'GET', '/api/analytics/pageviews?page_url=/&limit=50'),
+    Endpoint('analytics.interactions', 'GET', '/api/analytics/interactions?limit=50'),
+    Endpoint('search.query', 'GET', '/api/search?q={word}'),
+    Endpoint('tags.list', 'GET', '/api/tags'),
+    Endpoint('system.cache_stats', 'GET', '/api/cache/stats'),
+    Endpoint('system.db_pool', 'GET', '/api/db/pool'),
+    Endpoint('analytics.track_pageview', 'POST', '/api/analytics/pageview', {
+        'page_url': '/blog/{post_slug}', 'session_id': 'bench-{n}', 'device_type': 'desktop', 'browser': 'Chrome'
+    }),
+    Endpoint('analytics.track_interaction', 'POST', '/api/analytics/interaction', {
+        'event_type': 'click', 'page_url': '/shop', 'element_id': 'buy-{n}', 'session_id': 'bench-{n}'
+    }),
+    Endpoint('analytics.track_batch', 'POST', '/api/analytics/batch', [
+        {'page_url': '/projects/{project_id}', 'session_id': 'bench-{n}'},
+        {'event_type': 'scroll', 'page_url': '/projects/{project_id}', 'session_id': 'bench-{n}'},
+    ] * 10),
+    Endpoint('contact.create', 'POST', '/api/contact/messages', {
+        'name': 'Load Test', 'email': 'bench{n}@example.com', 'subject': 'Benchmark', 'message': 'Hello from the harness.'
+    }),
+]
+
+# Values for path and body placeholders are drawn from this many rows of each table
+SAMPLE_SIZE = 50
+SEARCH_WORDS = ['data', 'cache', 'deploy', 'python', 'react', 'design', 'latency']
+
+
+def sample_values(db):
+    """Placeholder name -> candidate values, read from the current database"""
+    from sqlalchemy import select
+    from src.models.blog import BlogPost
+    from src.models.product import Product
+    from src.models.project import Project
+    from src.models.user import User
+
+    def pick(column, *where):
+        return [value for value, in db.session.execute(select(column).where(*where).limit(SAMPLE_SIZE))]
+
+    return {
+        'user_id': pick(User.id),
+        'project_id': pick(Project.id),
+        'post_slug': pick(BlogPost.slug, BlogPost.published.is_(True)),
+        'product_id': pick(Product.id, Product.active.is_(True)),
+        'word': SEARCH_WORDS
+    }
+
+
+def fill(template, values, rng, n):
+    """Substitute ``{placeholders}`` in a path or JSON body"""
+    if isinstance(template, str):
+        for name, candidates in values.items():
+            token = '{' + name + '}'
+            if token in template:
+                template = template.replace(token, str(rng.choice(candidates)))
+        return template.replace('{n}', str(n))
+    if isinstance(template, list):
+        return [fill(item, values, rng, n) for item in template]
+    if isinstance(template, dict):
+        return {key: fill(value, values, rng, n) for key, value in template.items()}
+    return template
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def summarize(endpoint, latencies, errors, cache_hits, sizes, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'method': endpoint.method,
+        'path': endpoint.path,
+        'requests': len(latencies),
+        'errors': errors,
+        'cache_hits': cache_hits,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p90_ms': round(percentile(ordered, 0.90) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'mean_bytes': round(statistics.fmean(sizes)) if sizes else 0
+    }
+
+
+def prepare(endpoint, values, rng, count):
+    """``count`` concrete ``(path, body bytes)`` requests for an endpoint"""
+    requests = []
+    for n in range(count):
+        path = fill(endpoint.path, values, rng, n)
+        body = json.dumps(fill(endpoint.body, values, rng, n)).encode() if endpoint.body is not None else None
+        requests.append((path, body))
+    return requests
+
+
+def run_client(app, endpoint, requests, warmup):
+    """Time ``requests`` one at a time through the test client"""
+    client = app.test_client()
+    latencies, sizes = [], []
+    errors = cache_hits = 0
+    for index, (path, body) in enumerate(requests[:warmup] + requests):
+        started = time.perf_counter()
+        response = client.open(path, method=endpoint.method, data=body, content_type='application/json')
+        data = response.get_data()
+        latency = time.perf_counter() - started
+        if index < warmup:
+            continue
+        latencies.append(latency)
+        sizes.append(len(data))
+        errors += response.status_code >= 400
+        cache_hits += response.headers.get('X-Cache') == 'HIT'
+    return latencies, errors, cache_hits, sizes
+
+
+class LocalServer:
+    """A threaded werkzeug server for ``app`` on ``port`` (a free one by default)"""
+
+    def __init__(self, app, backlog=128, port=0):
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class QuietHandler(WSGIRequestHandler):
+            # HTTP/1.1 keeps worker connections open between requests
+            protocol_version = 'HTTP/1.1'
+
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self.server = make_server('127.0.0.1', port, app, threaded=True, request_handler=QuietHandler)
+        self.server.socket.listen(backlog)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, name='bench-server', daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def run_server(port, endpoint, requests, warmup, concurrency):
+    """Time ``requests`` spread over ``concurrency`` keep-alive connections"""
+    local = threading.local()
+    headers = {'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'}
+
+    def send(request):
+        path, body = request
+        connection = getattr(local, 'connection', None)
+        if connection is None:
+            connection = local.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        started = time.perf_counter()
+        try:
+            connection.request(endpoint.method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            local.connection = None
+            return time.perf_counter() - started, 599, False, 0
+        return time.perf_counter() - started, response.status, response.getheader('X-Cache') == 'HIT', len(data)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, requests[:warmup]))
+        started = time.perf_counter()
+        results = list(pool.map(send, requests))
+        elapsed = time.perf_counter() - started
+    latencies = [latency for latency, _, _, _ in results]
+    errors = sum(status >= 400 for _, status, _, _ in results)
+    cache_hits = sum(hit for _, _, hit, _ in results)
+    return latencies, errors, cache_hits, [size for _, _, _, size in results], elapsed
+
+
+def dataset_size(db):
+    """Row counts for the tables the endpoints read, summing analytics partitions"""
+    from sqlalchemy import func, select
+    from src.models.blog import BlogPost
+    from src.models.message import Message
+    from src.models.product import Product
+    from src.models.project import Project
+    from src.services.partitions import PARTITIONED_MODELS, partition_stats
+
+    counts = {
+        model.__tablename__: db.session.execute(select(func.count()).select_from(model)).scalar()
+        for model in (BlogPost, Project, Product, Message)
+    }
+    for model in PARTITIONED_MODELS:
+        counts[model.__tablename__] = sum(stats['rows'] for stats in partition_stats(model))
+    return counts
+
+
+def git_revision():
+    """``(commit, dirty)`` for the working tree, or ``(None, None)`` outside git"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def run(app, db, args):
+    """Benchmark every selected endpoint; returns the results document"""
+    rng = random.Random(args.seed)
+    with app.app_context():
+        values = sample_values(db)
+        size = dataset_size(db)
+    endpoints = [
+        endpoint for endpoint in ENDPOINTS
+        if (not args.only or any(fnmatch.fnmatch(endpoint.name, pattern) for pattern in args.only))
+        and not (args.skip_writes and endpoint.method != 'GET')
+    ]
+
+    results = {}
+    serving = LocalServer(app, backlog=max(128, args.concurrency)) if args.mode == 'server' else nullcontext()
+    with serving as server:
+        for endpoint in endpoints:
+            requests = prepare(endpoint, values, rng, args.requests)
+            started = time.perf_counter()
+            if server:
+                latencies, errors, hits, sizes, elapsed = run_server(
+                    server.port, endpoint, requests, args.warmup, args.concurrency
+                )
+            else:
+                latencies, errors, hits, sizes = run_client(app, endpoint, requests, args.warmup)
+                elapsed = sum(latencies)
+            row = results[endpoint.name] = summarize(endpoint, latencies, errors, hits, sizes, elapsed)
+            print(
+                f'{endpoint.name:<30} {row["p50_ms"]:>9.2f} {row["p99_ms"]:>9.2f} '
+                f'{row["throughput_rps"]:>9.1f} {row["errors"]:>6} {row["cache_hits"]:>6}'
+                f'   ({time.perf_counter() - started:.1f}s)',
+                flush=True
+            )
+
+    commit, dirty = git_revision()
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'mode': args.mode,
+        'concurrency': args.concurrency if args.mode == 'server' else 1,
+        'requests_per_endpoint': args.requests,
+        'seed': args.seed,
+        'dataset': size,
+        'endpoints': results
+    }
+
+
+def compare(baseline, current, threshold):
+    """Print per-endpoint changes; returns the names of endpoints that regressed"""
+    print(f'baseline {baseline.get("commit") or "?"} ({baseline.get("mode")}) -> '
+          f'current {current.get("commit") or "?"} ({current.get("mode")})')
+    print(f'{"endpoint":<30} {"p50 ms":>19} {"p99 ms":>19} {"req/s":>19}')
+    regressed = []
+    for name, after in current['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            print(f'{name:<30} (new)')
+            continue
+        cells = []
+        worse = False
+        for key in ('p50_ms', 'p99_ms', 'throughput_rps'):
+            change = (after[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            if key != 'throughput_rps' and change > threshold:
+                worse = True
+            cells.append(f'{before[key]:>7.2f}->{after[key]:>7.2f} {change:>+4.0f}%')
+        if worse:
+            regressed.append(name)
+        print(f'{name:<30} {" ".join(cells)}{"  REGRESSED" if worse else ""}')
+    return regressed
+
+
+def generate(pageviews, seed):
+    """Point ``DATABASE_URL`` at a scratch database and fill it; call before importing the app"""
+    directory = tempfile.mkdtemp(prefix='portfolio-bench-')
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(directory, "app.db")}'
+    from src.main import app
+    from src.models.user import db
+    from src.services.rollups import compact_rollups
+    from benchmarks.datagen import populate
+
+    with app.app_context():
+        populate(pageviews=pageviews, seed=seed, log=lambda message: None)
+        compact_rollups(settle_seconds=0)
+    print(f'Generated {pageviews:,} page views in {os.environ["DATABASE_URL"]}')
+    return app, db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['client', 'server'], default='client')
+    parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint.')
+    parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per endpoint first.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Server mode connections.')
+    parser.add_argument('--only', action='append', help='Endpoint name pattern, e.g. "blog.*"; repeatable.')
+    parser.add_argument('--skip-writes', action='store_true')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--generate', type=int, metavar='PAGEVIEWS',
+                        help='Benchmark a fresh scratch database with this many generated page views.')
+    parser.add_argument('--output', help='Write the results JSON here.')
+    parser.add_argument('--baseline', help='Compare this run with a previous results file.')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help='Compare two results files and exit.')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Percent slowdown that counts as a regression.')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as baseline, open(args.compare[1]) as current:
+            sys.exit(1 if compare(json.load(baseline), json.load(current), args.threshold) else 0)
+
+    if args.generate:
+        app, db = generate(args.generate, args.seed)
+    else:
+        from src.main import app
+        from src.models.user import db
+
+    print(f'{"endpoint":<30} {"p50 ms":>9} {"p99 ms":>9} {"req/s":>9} {"errors":>6} {"hits":>6}')
+    results = run(app, db, args)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+        print(f'Wrote {args.output}')
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            sys.exit(1 if compare(json.load(baseline), results, args.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Compare the ORM ``to_dict()`` + ``jsonify`` path with projected Core rows.
+
+Loads synthetic page views and products into an in-memory SQLite database
+and times, for each payload size, both ways of turning a full listing into
+a JSON response body:
+
+    orm   Model.query.all() -> [row.to_dict()] -> jsonify
+    core  with_entities(columns) -> serialize_rows -> json_response
+
+Run from ``portfolio_backend``:
+
+    python -m benchmarks.serialization --rows 10000 100000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask, jsonify
+from sqlalchemy import insert
+
+from src.models.user import db
+from src.models.analytics import PageView
+from src.models.product import Product
+from src.services.serialization import backend, json_response, model_fields, serialize_rows
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def pageview_rows(count, seed=1):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    return [
+        {
+            'page_url': f'/page/{rng.randrange(200)}',
+            'page_title': f'Page {index}',
+            'referrer': rng.choice([None, 'https://google.com', 'https://github.com']),
+            'user_agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36',
+            'ip_address': f'10.0.{rng.randrange(256)}.{rng.randrange(256)}',
+            'session_id': f'session-{rng.randrange(count // 3 + 1)}',
+            'device_type': rng.choice(['desktop', 'mobile', 'tablet']),
+            'browser': rng.choice(['Chrome', 'Firefox', 'Safari']),
+            'os': rng.choice(['Linux', 'Windows', 'macOS']),
+            'country': 'US',
+            'city': 'Austin',
+            'duration': rng.randrange(600),
+            'created_at': start + timedelta(seconds=index * 7)
+        }
+        for index in range(count)
+    ]
+
+
+def product_rows(count, seed=2):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    return [
+        {
+            'name': f'Product {index}',
+            'description': 'Lorem ipsum dolor sit amet. ' * 20,
+            'short_description': 'Lorem ipsum dolor sit amet.',
+            'price': round(rng.uniform(5, 200), 2),
+            'category': rng.choice(['software', 'templates', 'courses']),
+            'tags': '["python", "flask"]',
+            'gallery_images': '["/a.png", "/b.png"]',
+            'featured': rng.random() < 0.1,
+            'active': True,
+            'stock_quantity': -1,
+            'sales_count': rng.randrange(1000),
+            'created_at': start + timedelta(minutes=index),
+            'updated_at': start + timedelta(minutes=index)
+        }
+        for index in range(count)
+    ]
+
+
+def orm_path(model):
+    return jsonify({'success': True, 'data': [row.to_dict() for row in model.query.all()]}).get_data()
+
+
+def core_path(model):
+    fields = model_fields(model)
+    rows = model.query.with_entities(*(getattr(model, name) for name in fields)).all()
+    return json_response({'success': True, 'data': serialize_rows(rows, fields)}).get_data()
+
+
+def timed(func, model, repeat):
+    samples = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        body = func(model)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = make_app()
+    print(f'JSON backend: {backend()}')
+    print(f'{"model":<10} {"rows":>8} {"orm ms":>10} {"core ms":>10} {"speedup":>8} {"bytes":>12}')
+    with app.test_request_context():
+        for count in args.rows:
+            db.drop_all()
+            db.create_all()
+            db.session.execute(insert(PageView), pageview_rows(count))
+            db.session.execute(insert(Product), product_rows(count))
+            db.session.commit()
+
+            for model in (PageView, Product):
+                orm_seconds, orm_bytes = timed(orm_path, model, args.repeat)
+                core_seconds, core_bytes = timed(core_path, model, args.repeat)
+                print(
+                    f'{model.__name__:<10} {count:>8} {orm_seconds * 1000:>10.1f} {core_seconds * 1000:>10.1f} '
+                    f'{orm_seconds / core_seconds:>7.1f}x {core_bytes:>12}'
+                )
+
+
+if __name__ == '__main__':
+    main()
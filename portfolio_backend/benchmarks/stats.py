@@ -0,0 +1,184 @@
+"""Compare the per-counter stats queries with the single-statement versions.
+
+Loads synthetic messages and page views into an in-memory SQLite database
+and times, for each table size:
+
+``/api/contact/stats``
+
+    stats      one ORM ``.count()`` per counter (six round trips)
+    scan       one SELECT of ``SUM(CASE ...)`` columns over the table
+    auto       one SELECT of index-backed ``(SELECT count(*) ...)`` subqueries
+    cached     the endpoint answered from the response cache
+
+``dashboard_counts`` over raw rows (nothing rolled up yet)
+
+    dashboard  one grouped query per metric plus the per-day query
+    union      the same groupings as one UNION ALL statement
+
+Run from ``portfolio_backend``:
+
+    python -m benchmarks.stats --rows 10000 100000 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import func, insert, select, text
+
+from src.models.user import db
+from src.models.analytics import PageView, Interaction
+from src.models.message import Message
+from src.routes.contact import contact_bp
+from src.services.cache import response_cache
+from src.services.rollups import ROLLUP_METRICS, dashboard_counts
+from src.services.stats import message_stats
+
+from benchmarks.serialization import pageview_rows
+
+NOW = datetime(2025, 6, 1)
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    response_cache.init_app(app)
+    app.register_blueprint(contact_bp, url_prefix='/api')
+    return app
+
+
+def message_rows(count, seed=3):
+    rng = random.Random(seed)
+    return [
+        {
+            'name': f'Sender {index}',
+            'email': f'sender{index}@example.com',
+            'subject': 'Project enquiry',
+            'message': 'Hello, I would like to talk about a project. ' * 4,
+            'status': rng.choices(['new', 'read', 'replied', 'archived'], [1, 4, 4, 1])[0],
+            'priority': rng.choices(['low', 'normal', 'high', 'urgent'], [2, 6, 1.5, 0.5])[0],
+            'source': 'contact_form',
+            'created_at': NOW - timedelta(seconds=index * 30)
+        }
+        for index in range(count)
+    ]
+
+
+def interaction_rows(count, seed=4):
+    rng = random.Random(seed)
+    return [
+        {
+            'event_type': rng.choice(['click', 'scroll', 'submit']),
+            'element_id': f'button-{rng.randrange(20)}',
+            'page_url': f'/page/{rng.randrange(200)}',
+            'session_id': f'session-{rng.randrange(count // 3 + 1)}',
+            'created_at': NOW - timedelta(seconds=index * 7)
+        }
+        for index in range(count)
+    ]
+
+
+def legacy_message_stats():
+    return {
+        'total_messages': Message.query.count(),
+        'new_messages': Message.query.filter_by(status='new').count(),
+        'read_messages': Message.query.filter_by(status='read').count(),
+        'replied_messages': Message.query.filter_by(status='replied').count(),
+        'high_priority': Message.query.filter_by(priority='high').count(),
+        'urgent_priority': Message.query.filter_by(priority='urgent').count()
+    }
+
+
+def legacy_dashboard_counts(start):
+    counts = defaultdict(Counter)
+    for metric, (model, column) in ROLLUP_METRICS.items():
+        if column is None:
+            counts[metric][None] += db.session.execute(
+                select(func.count()).select_from(model).where(model.created_at >= start)
+            ).scalar() or 0
+            continue
+        grouped = getattr(model, column)
+        for dimension, count in db.session.execute(
+            select(grouped, func.count()).where(model.created_at >= start).group_by(grouped)
+        ):
+            counts[metric][dimension] += count
+    daily = select(func.date(PageView.created_at), func.count(PageView.id)).where(
+        PageView.created_at >= start
+    ).group_by(func.date(PageView.created_at))
+    for day, views in db.session.execute(daily):
+        counts['daily'][str(day)] += views
+    return counts
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), result
+
+
+def load(count):
+    db.drop_all()
+    db.create_all()
+    db.session.execute(insert(Message), message_rows(count))
+    pageviews = pageview_rows(count)
+    # Move the generated views so the newest lands just before NOW
+    shift = NOW - pageviews[-1]['created_at'] - timedelta(seconds=1)
+    for row in pageviews:
+        row['created_at'] += shift
+    db.session.execute(insert(PageView), pageviews)
+    db.session.execute(insert(Interaction), interaction_rows(count))
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+
+
+def as_dicts(counts):
+    return {metric: dict(values) for metric, values in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    client = app.test_client()
+    start = NOW - timedelta(days=3650)
+    print(
+        f'{"rows":>8} | {"stats ms":>9} {"scan":>8} {"auto":>8} {"cached":>8} | '
+        f'{"dashboard ms":>12} {"union":>8}'
+    )
+    with app.app_context():
+        for count in args.rows:
+            load(count)
+            legacy_seconds, expected = timed(legacy_message_stats, args.repeat)
+            scan_seconds, scanned = timed(lambda: message_stats(strategy='scan'), args.repeat)
+            auto_seconds, auto = timed(message_stats, args.repeat)
+            assert scanned == auto == expected, (scanned, auto, expected)
+
+            response_cache.invalidate('messages')
+            client.get('/api/contact/stats')
+            cached_seconds, response = timed(lambda: client.get('/api/contact/stats'), args.repeat)
+            assert response.headers.get('X-Cache') == 'HIT'
+
+            legacy_dashboard, expected = timed(lambda: legacy_dashboard_counts(start), args.repeat)
+            union_dashboard, counts = timed(lambda: dashboard_counts(start, NOW), args.repeat)
+            assert as_dicts(counts) == as_dicts(expected)
+
+            print(
+                f'{count:>8} | {legacy_seconds * 1000:>9.2f} {scan_seconds * 1000:>8.2f} '
+                f'{auto_seconds * 1000:>8.2f} {cached_seconds * 1000:>8.2f} | '
+                f'{legacy_dashboard * 1000:>12.1f} {union_dashboard * 1000:>8.1f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
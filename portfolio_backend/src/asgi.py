@@ -0,0 +1,441 @@
+"""ASGI entry point.
+
+    uvicorn src.asgi:application --host 0.0.0.0 --port 8000
+
+Serves the same API as the WSGI app in ``src/main.py``, which keeps working
+unchanged (``python src/main.py`` or any WSGI server). The hot paths run on
+the event loop and use the async engine from ``services.async_database``:
+
+- ``POST /api/analytics/pageview`` and ``/interaction`` validate the beacon
+  (a wrongly typed field answers 400) and put it in an ``AsyncIngestBuffer``.
+  A full buffer answers 503 at once.
+- ``POST /api/analytics/batch`` writes the accepted events in one async
+  transaction before answering.
+- ``GET`` views decorated with ``@conditional`` / ``@response_cache.cached``
+  (the project, blog and shop reads) answer revalidations from the
+  collection version row and serve response-cache hits directly.
+
+Everything else runs the Flask app in a thread pool of
+``ASGI_THREAD_POOL_SIZE`` workers. That includes cache misses and requests
+the loop handlers leave alone, such as tracking bodies that are not JSON,
+so those responses are exactly what the WSGI app returns. Requests answered
+on the loop skip the Flask hooks. They are still counted in
+``/api/metrics``, but the query monitor does not see them.
+"""
+import asyncio
+import io
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import http_date, parse_accept_header, parse_date, parse_etags, parse_options_header, quote_etag
+
+from src.main import app
+from src.models.analytics import PageView, Interaction
+from src.services.async_database import async_database
+from src.services.cache import MemoryCacheBackend, response_cache
+from src.services.compression import COMPRESSIBLE_TYPES, compress, compressor, negotiate_encoding
+from src.services.conditional import etag_for, is_not_modified, last_modified_for
+from src.services.ingest import (
+    AsyncIngestBuffer, IngestQueueFull, InvalidEvent, interaction_row, pageview_row, parse_batch_body, split_batch,
+    write_rows
+)
+from src.services.metrics import request_metrics
+from src.services.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Bodies at least this large are compressed in the thread pool (zlib and brotli release the GIL)
+# rather than on the loop, where a large list response would stall every other connection
+OFFLOAD_COMPRESS_SIZE = 64 * 1024
+
+
+class Request:
+    """The parts of an ASGI HTTP scope the loop handlers read"""
+
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query_string = scope['query_string'].decode('latin-1')
+        self.body = body
+        self.headers = {}
+        for name, value in scope['headers']:
+            name, value = name.decode('latin-1').lower(), value.decode('latin-1')
+            self.headers[name] = f'{self.headers[name]}, {value}' if name in self.headers else value
+
+    @property
+    def mimetype(self):
+        return parse_options_header(self.headers.get('content-type'))[0].lower()
+
+    @property
+    def ip_address(self):
+        # Same precedence as the Flask views: X-Forwarded-For, then the peer address
+        client = self.scope.get('client')
+        return self.headers.get('x-forwarded-for') or (client[0] if client else None)
+
+    def json(self):
+        """The body as a JSON object, or None when Flask should decide what to answer"""
+        if self.mimetype != 'application/json' and not self.mimetype.endswith('+json'):
+            return None
+        try:
+            data = app.json.loads(self.body)
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+
+def json_reply(payload, status=200, headers=()):
+    return status, dumps(payload), [('Content-Type', 'application/json'), *headers]
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def send_all(send, messages):
+    for message in messages:
+        await send(message)
+
+
+def _no_write(data):
+    raise NotImplementedError('The WSGI write() callable is not supported')
+
+
+def wsgi_environ(scope, body):
+    """PEP 3333 environ for an ASGI HTTP scope and its complete body"""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': '',
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+    for name, value in scope['headers']:
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class WsgiBridge:
+    """Runs a WSGI app in the loop's default thread pool.
+
+    Buffered responses (those with a Content-Length) go out in one hop back
+    to the loop; streamed ones, like exports, are sent chunk by chunk.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    async def __call__(self, scope, body, send):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._run, wsgi_environ(scope, body), loop, send)
+
+    def _run(self, environ, loop, send):
+        state = {}
+
+        def start_response(status, headers, exc_info=None):
+            state['status'] = int(status.split(' ', 1)[0])
+            # The server sends its own Date header
+            state['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers if name.lower() != 'date'
+            ]
+            return _no_write
+
+        def emit(*messages):
+            asyncio.run_coroutine_threadsafe(send_all(send, messages), loop).result()
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            start = {'type': 'http.response.start', 'status': state['status'], 'headers': state['headers']}
+            if any(name == b'content-length' for name, _ in state['headers']):
+                emit(start, {'type': 'http.response.body', 'body': b''.join(result)})
+                return
+            emit(start)
+            for chunk in result:
+                if chunk:
+                    emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            emit({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+class AsyncApplication:
+    """ASGI app: event-loop handlers for the hot endpoints, Flask for the rest"""
+
+    def __init__(self, flask_app):
+        flask_app.config.setdefault('ASGI_THREAD_POOL_SIZE', 32)
+        async_database.init_app(flask_app)
+
+        self.app = flask_app
+        self.urls = flask_app.url_map.bind('localhost')
+        self.flask = WsgiBridge(flask_app.wsgi_app)
+        self.ingest = AsyncIngestBuffer(async_database)
+        self.started = False
+        self.handlers = {
+            ('POST', 'analytics.track_pageview'): self.track_pageview,
+            ('POST', 'analytics.track_interaction'): self.track_interaction,
+            ('POST', 'analytics.track_batch'): self.track_batch
+        }
+        flask_app.extensions['async_analytics_ingest'] = self.ingest
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise RuntimeError(f'Unsupported ASGI scope type: {scope["type"]}')
+
+        # Servers without lifespan support start us on the first request
+        if not self.started:
+            await self.startup()
+
+        body = await read_body(receive)
+        if body is None:
+            return
+
+        started = time.perf_counter()
+        request = Request(scope, body)
+        try:
+            endpoint, view_args = self.urls.match(request.path, method=request.method)
+        except HTTPException:
+            endpoint = None
+
+        reply = None
+        if endpoint is not None:
+            handler = self.handlers.get((request.method, endpoint))
+            if handler is not None:
+                reply = await handler(request)
+            elif request.method == 'GET':
+                try:
+                    reply = await self.read_content(request, endpoint, view_args)
+                except Exception:
+                    # The view does the same work synchronously and reports its own errors
+                    logger.exception('Event-loop read failed for %s; running the view', request.path)
+                    reply = None
+
+        if reply is None:
+            await self.flask(scope, body, send)
+            return
+
+        status, payload, headers = await self.finish(request, *reply)
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        })
+        await send({'type': 'http.response.body', 'body': payload})
+        request_metrics.observe(
+            endpoint.rpartition('.')[0] or 'app', endpoint, request.method, status,
+            time.perf_counter() - started, len(payload)
+        )
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def startup(self):
+        if self.started:
+            return
+        self.started = True
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(
+            max_workers=self.app.config['ASGI_THREAD_POOL_SIZE'], thread_name_prefix='asgi-wsgi'
+        ))
+        async_database.connect()
+        self.ingest.start(self.app)
+
+    async def shutdown(self):
+        await self.ingest.stop()
+        await async_database.dispose()
+
+    async def finish(self, request, status, body, headers):
+        """Apply what the Flask after_request hooks would: compression and CORS"""
+        content_type = next((value for name, value in headers if name == 'Content-Type'), None)
+        if (
+            self.app.config['COMPRESS_ENABLED']
+            and content_type
+            and parse_options_header(content_type)[0] in COMPRESSIBLE_TYPES
+            and 200 <= status < 300
+            and status != 204
+        ):
+            headers.append(('Vary', 'Accept-Encoding'))
+            accepted = parse_accept_header(request.headers.get('accept-encoding'))
+            encoding = negotiate_encoding(accepted=accepted) if len(body) >= compressor.min_size else None
+            if encoding is not None:
+                if len(body) >= OFFLOAD_COMPRESS_SIZE:
+                    loop = asyncio.get_running_loop()
+                    body = await loop.run_in_executor(None, compress, body, encoding, compressor.level)
+                else:
+                    body = compress(body, encoding, compressor.level)
+                # The compressed bytes differ from the identity representation
+                headers = [('ETag', f'W/{value}') if name == 'ETag' else (name, value) for name, value in headers]
+                headers.append(('Content-Encoding', encoding))
+
+        # flask-cors echoes the request's Origin and otherwise allows any
+        origin = request.headers.get('origin')
+        headers.append(('Access-Control-Allow-Origin', origin or '*'))
+        if origin:
+            headers.append(('Vary', 'Origin'))
+        if status != 304:
+            headers.append(('Content-Length', str(len(body))))
+        return status, body, headers
+
+    async def read_content(self, request, endpoint, view_args):
+        """Answer a tagged GET from the version row or the response cache; None to run the view"""
+        view = self.app.view_functions.get(endpoint)
+        collection = getattr(view, 'conditional_collection', None)
+        namespace = getattr(view, 'cache_namespace', None)
+        if collection is None and namespace is None:
+            return None
+
+        headers = []
+        version = None
+        if collection is not None:
+            version, updated_at = await async_database.collection_version(collection)
+            etag = etag_for(collection, version, view_args)
+            last_modified = last_modified_for(updated_at)
+            validators = [('ETag', quote_etag(etag))]
+            if last_modified:
+                validators.append(('Last-Modified', http_date(last_modified)))
+
+            if_none_match = parse_etags(request.headers.get('if-none-match'))
+            if_modified_since = parse_date(request.headers.get('if-modified-since'))
+            if is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+                return 304, b'', validators
+            headers = validators + [('Cache-Control', 'no-cache')]
+
+        # A Redis lookup would block the loop; leave those to the thread pool
+        if namespace is None or not isinstance(response_cache.backend, MemoryCacheBackend):
+            return None
+        arg_pairs = parse_qsl(request.query_string, keep_blank_values=True)
+        # Keyed like the Flask view's entry, on the version the ETag above was built from
+        entry = response_cache.lookup(
+            namespace, endpoint, view_args, arg_pairs, version if collection == namespace else None
+        )
+        if entry is None:
+            return None
+        body, status, content_type = entry
+        return status, body, [('Content-Type', content_type), *headers, ('X-Cache', 'HIT')]
+
+    async def track_pageview(self, request):
+        data = request.json()
+        if data is None:
+            return None
+        if 'page_url' not in data:
+            return json_reply({
+                'success': False,
+                'error': 'Missing required field: page_url'
+            }, 400)
+
+        try:
+            row = pageview_row(data, request.ip_address, request.headers.get('user-agent'))
+        except InvalidEvent as e:
+            return json_reply({'success': False, 'error': str(e)}, 400)
+        return await self._track(PageView, row, 'Page view tracked successfully')
+
+    async def track_interaction(self, request):
+        data = request.json()
+        if data is None:
+            return None
+        for field in ('event_type', 'page_url'):
+            if field not in data:
+                return json_reply({
+                    'success': False,
+                    'error': f'Missing required field: {field}'
+                }, 400)
+
+        try:
+            row = interaction_row(data, request.ip_address)
+        except InvalidEvent as e:
+            return json_reply({'success': False, 'error': str(e)}, 400)
+        return await self._track(Interaction, row, 'Interaction tracked successfully')
+
+    async def _track(self, model, row, message):
+        try:
+            await self.ingest.put(model, row)
+        except IngestQueueFull as e:
+            return json_reply({'success': False, 'error': str(e)}, 503, [('Retry-After', '1')])
+        except Exception:
+            # With ingest disabled the row is written through, and a driver error would echo SQL
+            logger.exception('Failed to record analytics event')
+            return json_reply({'success': False, 'error': 'Failed to record analytics event'}, 500)
+        return json_reply({'success': True, 'message': message}, 202)
+
+    async def track_batch(self, request):
+        try:
+            events = parse_batch_body(request.body.decode('utf-8', 'replace'), request.mimetype)
+            if events is None:
+                return json_reply({
+                    'success': False,
+                    'error': 'Body must be a JSON array or newline-delimited JSON'
+                }, 400)
+
+            max_events = self.app.config.get('ANALYTICS_BATCH_MAX_EVENTS', 1000)
+            if len(events) > max_events:
+                return json_reply({
+                    'success': False,
+                    'error': f'Batch exceeds maximum of {max_events} events'
+                }, 413)
+
+            pageview_rows, interaction_rows, results = split_batch(
+                events, request.ip_address, request.headers.get('user-agent')
+            )
+            by_model = {model: rows for model, rows in ((PageView, pageview_rows), (Interaction, interaction_rows)) if rows}
+            if by_model:
+                await write_rows(async_database, by_model)
+
+            accepted = len(pageview_rows) + len(interaction_rows)
+            return json_reply({
+                'success': True,
+                'accepted': accepted,
+                'rejected': len(results) - accepted,
+                'results': results
+            })
+        except Exception:
+            logger.exception('Failed to record analytics batch')
+            return json_reply({'success': False, 'error': 'Failed to record analytics batch'}, 500)
+
+
+application = AsyncApplication(app)
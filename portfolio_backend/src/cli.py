@@ -0,0 +1,172 @@
+"""Flask CLI commands, registered on the app in ``src/main.py``.
+
+Run them with ``flask --app src.main <group> <command>``.
+"""
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from src.migrations import run_migrations
+from src.models.user import db
+from src.services.partitions import (
+    PARTITIONED_MODELS, add_months, apply_retention, compact_partition, drop_partition, parse_month,
+    partition_months, partition_stats
+)
+from src.services.purchases import apply_purchases, expire_reservations, rebuild_sales_counts
+from src.services.query_monitor import check_route_queries
+from src.services.query_plans import ROUTE_PLAN_CHECKS, check_route_plans
+from src.services.rollups import compact_rollups, reset_rollups, rollup_watermark
+from src.services.search import rebuild_search_index
+from src.services.static_files import precompress
+from src.services.tags import rebuild_tag_index
+
+analytics_cli = AppGroup('analytics', help='Analytics maintenance commands.')
+db_cli = AppGroup('db', help='Database maintenance commands.')
+shop_cli = AppGroup('shop', help='Shop maintenance commands.')
+static_cli = AppGroup('static', help='Static asset commands.')
+partitions_cli = AppGroup('partitions', help='Monthly page view and interaction partitions.')
+analytics_cli.add_command(partitions_cli)
+
+
+@analytics_cli.command('compact')
+@click.option('--settle-seconds', type=int, default=None,
+              help='Only compact hours that ended at least this long ago.')
+@click.option('--rebuild', is_flag=True,
+              help='Discard existing rollups and sketches and rebuild them from raw rows.')
+def compact_command(settle_seconds, rebuild):
+    """Fold raw page views and interactions into hour/day rollups."""
+    if rebuild:
+        reset_rollups()
+    hours = compact_rollups(settle_seconds=settle_seconds)
+    click.echo(f'Compacted {hours} hour(s) of analytics rollups')
+
+
+@partitions_cli.command('list')
+def list_partitions_command():
+    """Show every partition with its row count and date range."""
+    for model in PARTITIONED_MODELS:
+        for stats in partition_stats(model):
+            click.echo(f"{stats['table']:<24} {stats['rows']:>10} rows  {stats['first'] or '-'} .. {stats['last'] or '-'}")
+
+
+@partitions_cli.command('compact')
+@click.option('--month', 'months', multiple=True, type=parse_month,
+              help='Only compact this month (YYYY-MM); repeatable. Defaults to every closed month.')
+@click.option('--vacuum', is_flag=True,
+              help='VACUUM afterwards to return pages freed by dropped partitions to the OS.')
+def compact_partitions_command(months, vacuum):
+    """Rebuild closed partitions' indexes and refresh their statistics."""
+    current = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    for model in PARTITIONED_MODELS:
+        for month in partition_months(model):
+            if (months and month not in months) or (not months and month >= current):
+                continue
+            click.echo(f'Compacted {compact_partition(model, month)}')
+    if vacuum:
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('VACUUM')
+        click.echo('Vacuumed the database')
+
+
+@partitions_cli.command('archive')
+@click.option('--before', type=parse_month, required=True,
+              help='Archive and drop every partition older than this month (YYYY-MM).')
+@click.option('--dest', type=click.Path(file_okay=False), default=None,
+              help='Archive directory; defaults to ANALYTICS_ARCHIVE_DIR.')
+@click.option('--no-archive', is_flag=True,
+              help='Drop the partitions without writing archive files.')
+def archive_partitions_command(before, dest, no_archive):
+    """Copy old partitions to standalone SQLite files and drop them."""
+    archive_dir = None if no_archive else dest or current_app.config['ANALYTICS_ARCHIVE_DIR']
+    watermark = rollup_watermark()
+    for model in PARTITIONED_MODELS:
+        for month in partition_months(model):
+            if month >= before:
+                continue
+            if watermark is None or add_months(month, 1) > watermark:
+                click.echo(f'Skipping {month:%Y-%m}: not rolled up yet (run analytics compact first)')
+                continue
+            path = drop_partition(model, month, archive_dir)
+            click.echo(f'Dropped {model.__tablename__} {month:%Y-%m}' + (f' -> {path}' if path else ''))
+
+
+@partitions_cli.command('retention')
+@click.option('--dry-run', is_flag=True, help='List the partitions that would be dropped.')
+def retention_command(dry_run):
+    """Apply ANALYTICS_RETENTION_MONTHS now."""
+    affected = apply_retention(rollup_watermark(), dry_run=dry_run)
+    verb = 'Would drop' if dry_run else 'Dropped'
+    click.echo(f'{verb} {len(affected)} partition(s)' + ''.join(f'\n  {name}' for name in affected))
+
+
+@db_cli.command('migrate')
+def migrate_command():
+    """Apply pending schema migrations."""
+    run_migrations()
+    click.echo('Migrations applied')
+
+
+@db_cli.command('check-plans')
+def check_plans_command():
+    """Fail if any list endpoint query scans a table or sorts in a temp B-tree."""
+    failures = check_route_plans(current_app._get_current_object())
+    for path, problems in failures.items():
+        click.echo(f'{path}')
+        for problem in problems:
+            click.echo(f'  - {problem}')
+    if failures:
+        raise SystemExit(1)
+    click.echo('All route query plans use indexes')
+
+
+@db_cli.command('check-queries')
+def check_queries_command():
+    """Fail if any read endpoint exceeds its query budget or repeats a statement."""
+    failures = check_route_queries(current_app._get_current_object(), ROUTE_PLAN_CHECKS)
+    for path, problems in failures.items():
+        click.echo(f'{path}')
+        for problem in problems:
+            click.echo(f'  - {problem}')
+    if failures:
+        raise SystemExit(1)
+    click.echo('All routes are within their query budgets')
+
+
+@db_cli.command('rebuild-search')
+def rebuild_search_command():
+    """Re-index every post, project and product for /api/search."""
+    documents = rebuild_search_index()
+    click.echo(f'Indexed {documents} document(s)')
+
+
+@db_cli.command('rebuild-tags')
+def rebuild_tags_command():
+    """Rebuild the tag, tech-stack and gallery-image index from the JSON columns."""
+    items = rebuild_tag_index()
+    click.echo(f'Indexed tags for {items} item(s)')
+
+
+@shop_cli.command('apply-purchases')
+@click.option('--replay', is_flag=True,
+              help='Recompute every sales count from the whole purchase ledger.')
+def apply_purchases_command(replay):
+    """Fold pending purchase ledger rows into product sales counts."""
+    expired = expire_reservations()
+    if replay:
+        rebuild_sales_counts()
+        click.echo(f'Replayed the purchase ledger; expired {expired} reservation(s)')
+    else:
+        applied = apply_purchases()
+        click.echo(f'Applied {applied} purchase(s); expired {expired} reservation(s)')
+
+
+@static_cli.command('compress')
+@click.option('--min-size', type=int, default=1024,
+              help='Skip files smaller than this many bytes.')
+def compress_static_command(min_size):
+    """Write .gz/.br siblings next to the built static files."""
+    written = precompress(current_app.static_folder, min_size)
+    current_app.extensions['static_files'].reload()
+    click.echo(f'Wrote {written} precompressed file(s)')
@@ -0,0 +1,120 @@
+"""Environment-driven database configuration.
+
+``database_config()`` returns the Flask-SQLAlchemy settings for the
+configured backend:
+
+``DATABASE_URL``              SQLAlchemy URI; defaults to ``src/database/app.db``
+``DATABASE_REPLICA_URLS``     comma-separated read-replica URIs (see
+                              ``services.replicas``); empty disables routing
+``ASYNC_DATABASE_URL``        async-driver URI for the ASGI entry point (see
+                              ``services.async_database``); defaults to
+                              ``DATABASE_URL`` with its async driver
+
+SQLite profile (file databases), applied as pragmas on every new connection
+by ``services.database.configure_engine``:
+
+``SQLITE_JOURNAL_MODE``       default ``WAL`` (readers never block the writer)
+``SQLITE_SYNCHRONOUS``        default ``NORMAL`` (durable at checkpoints under WAL)
+``SQLITE_BUSY_TIMEOUT_MS``    default ``5000`` (wait for the write lock instead of
+                              failing with "database is locked")
+``SQLITE_MMAP_SIZE``          default ``268435456`` (256 MiB memory-mapped reads)
+``SQLITE_CACHE_SIZE``         default ``-20000`` (about 20 MB page cache)
+
+Pool settings (every file or server database):
+
+``DB_POOL_SIZE``              default ``5`` for SQLite, ``10`` otherwise
+``DB_MAX_OVERFLOW``           default ``10`` for SQLite, ``20`` otherwise
+``DB_POOL_TIMEOUT``           seconds to wait for a free connection, default ``30``
+``DB_POOL_RECYCLE``           seconds before a connection is replaced, default ``1800``
+``DB_POOL_PRE_PING``          default off for SQLite, on otherwise
+"""
+import os
+
+from sqlalchemy.engine import make_url
+
+DEFAULT_DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'database', 'app.db')
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def sqlite_pragmas():
+    """Pragmas applied to every new SQLite connection, in order"""
+    return {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'mmap_size': _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        'cache_size': _env_int('SQLITE_CACHE_SIZE', -20000),
+        'temp_store': 'MEMORY',
+    }
+
+
+def engine_options(uri):
+    """``create_engine`` keyword arguments for ``uri``"""
+    url = make_url(uri)
+    sqlite = url.get_backend_name() == 'sqlite'
+    if sqlite and url.database in (None, '', ':memory:'):
+        # In-memory databases live in a single connection; pool settings do not apply
+        return {}
+
+    options = {
+        'pool_size': _env_int('DB_POOL_SIZE', 5 if sqlite else 10),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10 if sqlite else 20),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', not sqlite),
+    }
+    if sqlite:
+        # The pysqlite driver's own lock wait, in seconds; busy_timeout covers the rest
+        options['connect_args'] = {'timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000}
+    return options
+
+
+def _normalize_uri(uri):
+    if uri.startswith('postgres://'):
+        # Heroku-style URLs use a scheme SQLAlchemy no longer accepts
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+ASYNC_DRIVERS = {
+    'sqlite': 'aiosqlite',
+    'postgresql': 'asyncpg',
+    'mysql': 'aiomysql',
+}
+
+
+def async_database_uri(uri):
+    """``uri`` rewritten for its backend's async driver, or None if there is none"""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if url.get_driver_name() == ASYNC_DRIVERS.get(backend):
+        return uri
+    if backend not in ASYNC_DRIVERS:
+        return None
+    return url.set(drivername=f'{backend}+{ASYNC_DRIVERS[backend]}').render_as_string(hide_password=False)
+
+
+def database_config():
+    """Flask config entries for the database selected by the environment"""
+    uri = _normalize_uri(os.environ.get('DATABASE_URL') or f'sqlite:///{DEFAULT_DATABASE_PATH}')
+    replicas = os.environ.get('DATABASE_REPLICA_URLS', '')
+    async_uri = os.environ.get('ASYNC_DATABASE_URL')
+    return {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLALCHEMY_REPLICA_URIS': [_normalize_uri(r.strip()) for r in replicas.split(',') if r.strip()],
+        'SQLALCHEMY_ASYNC_DATABASE_URI': _normalize_uri(async_uri) if async_uri else async_database_uri(uri),
+        'SQLALCHEMY_ENGINE_OPTIONS': engine_options(uri),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SQLITE_PRAGMAS': sqlite_pragmas(),
+    }
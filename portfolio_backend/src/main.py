@@ -3,7 +3,7 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
 from src.models.user import db
 from src.models.project import Project
@@ -11,12 +11,34 @@ from src.models.blog import BlogPost
 from src.models.product import Product
 from src.models.message import Message
 from src.models.analytics import PageView, Interaction
+from src.models.rollup import AnalyticsRollup, VisitorSketch
+from src.models.version import CollectionVersion
+from src.models.purchase import Purchase, StockReservation
+from src.models.tag import Tag, TaggedItem, ProductImage
+from src.models.replication import ReplicationHeartbeat
+from src.config import database_config
 from src.routes.user import user_bp
 from src.routes.projects import projects_bp
 from src.routes.blog import blog_bp
 from src.routes.shop import shop_bp
 from src.routes.contact import contact_bp
 from src.routes.analytics import analytics_bp
+from src.routes.search import search_bp
+from src.routes.tags import tags_bp
+from src.routes.system import system_bp
+from src.services.cache import response_cache
+from src.services.database import configure_engine
+from src.services.replicas import replica_router
+from src.services.metrics import request_metrics
+from src.services.query_monitor import query_monitor
+from src.services.ingest import ingest_queue
+from src.services.rollups import rollup_compactor
+from src.services.view_counter import view_counter
+from src.services.purchases import purchase_ledger
+from src.services.compression import compressor
+from src.services.static_files import static_files
+from src.migrations import create_schema, run_migrations
+from src.cli import analytics_cli, db_cli, shop_cli, static_cli
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -31,29 +53,58 @@ app.register_blueprint(blog_bp, url_prefix='/api')
 app.register_blueprint(shop_bp, url_prefix='/api')
 app.register_blueprint(contact_bp, url_prefix='/api')
 app.register_blueprint(analytics_bp, url_prefix='/api')
+app.register_blueprint(search_bp, url_prefix='/api')
+app.register_blueprint(tags_bp, url_prefix='/api')
+app.register_blueprint(system_bp, url_prefix='/api')
 
-# uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Database URI, pool and SQLite pragmas come from the environment (see src/config.py)
+app.config.update(database_config())
 db.init_app(app)
 with app.app_context():
-    db.create_all()
+    configure_engine(app, db.engine)
+    create_schema()
+    run_migrations()
+
+# Time requests, SQL and serialization for /api/metrics; registered first so its
+# after_request hook runs last and sees the final (compressed) response
+request_metrics.init_app(app)
+
+# Log slow statements with their plans and flag requests over their query budget
+query_monitor.init_app(app)
+
+# Send GET reads to healthy read replicas, writes and recent writers to the primary
+replica_router.init_app(app)
+
+# Cache public content responses until the next write
+response_cache.init_app(app)
+
+# Buffer analytics beacons and write them in bulk
+ingest_queue.init_app(app)
+
+# Keep the analytics dashboard rollups up to date
+rollup_compactor.init_app(app)
+
+# Batch blog view increments instead of committing on every read
+view_counter.init_app(app)
+
+# Fold the purchase ledger into sales counts and expire stale reservations
+purchase_ledger.init_app(app)
+
+# Compress API responses and serve the SPA from a cached file manifest
+compressor.init_app(app)
+static_files.init_app(app)
+app.cli.add_command(analytics_cli)
+app.cli.add_command(db_cli)
+app.cli.add_command(shop_cli)
+app.cli.add_command(static_cli)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
+    if app.static_folder is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+    return static_files.serve(path)
 
 
 if __name__ == '__main__':
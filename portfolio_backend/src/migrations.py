@@ -0,0 +1,156 @@
+"""Named, run-once schema migrations.
+
+``db.create_all()`` creates missing tables together with their indexes but
+never touches tables that already exist. Changes to existing tables go here
+as a ``@migration`` function; ``run_migrations`` applies the pending ones in
+order and records each name in ``schema_migration``.
+
+Every gunicorn worker runs this at import. A worker claims a migration by
+inserting its ``schema_migration`` row first, in the same transaction as
+the migration. Workers starting at the same time block on that row. Once
+the first worker commits they see the duplicate and skip the migration;
+if it rolls back, the next one applies it.
+"""
+import logging
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from src.models.user import db
+from src.models.version import CollectionVersion
+from src.models.purchase import Purchase
+from src.services.conditional import COLLECTIONS
+from src.services.partitions import migrate_to_partitions
+from src.services.purchases import opening_balance_rows
+from src.services.search import CREATE_SEARCH_INDEX, rebuild_search_index, search_available
+from src.services.tags import rebuild_tag_index
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = []
+
+# How long a worker waits for another worker's migration before giving up
+MIGRATION_WAIT_SECONDS = 600
+
+
+class SchemaMigration(db.Model):
+    name = db.Column(db.String(100), primary_key=True)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SchemaMigration {self.name}>'
+
+
+def migration(name):
+    """Register ``func(connection)`` as the migration called ``name``"""
+    def decorator(func):
+        MIGRATIONS.append((name, func))
+        return func
+    return decorator
+
+
+def create_schema():
+    """``db.create_all()``, tolerating a worker that creates the same tables concurrently"""
+    deadline = time.monotonic() + MIGRATION_WAIT_SECONDS
+    while True:
+        try:
+            db.create_all()
+            return
+        except OperationalError as e:
+            # Lost a CREATE TABLE race (or its lock); the next pass skips what now exists
+            message = str(e).lower()
+            if ('already exists' not in message and 'locked' not in message) or time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def run_migrations():
+    """Apply every registered migration that has not run yet"""
+    applied = {row.name for row in SchemaMigration.query.all()}
+    for name, func in MIGRATIONS:
+        if name not in applied:
+            _apply(name, func)
+
+
+def _apply(name, func):
+    """Claim ``name`` and run it, or skip it once another process has applied it"""
+    deadline = time.monotonic() + MIGRATION_WAIT_SECONDS
+    while True:
+        claimed = False
+        try:
+            with db.engine.begin() as connection:
+                # Writing the claim first takes the write lock before any of the migration's work
+                connection.execute(
+                    SchemaMigration.__table__.insert().values(name=name, applied_at=datetime.utcnow())
+                )
+                claimed = True
+                logger.info('Applying migration %s', name)
+                func(connection)
+            return
+        except IntegrityError:
+            if claimed:
+                raise
+            logger.info('Migration %s was applied by another process', name)
+            return
+        except OperationalError as e:
+            # SQLite gives up on a lock after busy_timeout; a long migration in another worker outlasts it
+            if claimed or 'locked' not in str(e).lower() or time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+def _create_declared_indexes(connection, tables):
+    for table_name in tables:
+        for index in db.metadata.tables[table_name].indexes:
+            index.create(connection, checkfirst=True)
+
+
+@migration('0001_query_indexes')
+def add_query_indexes(connection):
+    """Indexes backing the filter/order_by combinations used by the list endpoints"""
+    _create_declared_indexes(connection, [
+        'page_view', 'interaction', 'message', 'product', 'blog_post', 'project'
+    ])
+
+
+@migration('0002_collection_versions')
+def seed_collection_versions(connection):
+    """One version row per content collection so writes only ever UPDATE"""
+    existing = {row.name for row in connection.execute(select(CollectionVersion.name))}
+    rows = [{'name': name, 'version': 0, 'updated_at': datetime.utcnow()} for name in COLLECTIONS if name not in existing]
+    if rows:
+        connection.execute(insert(CollectionVersion), rows)
+
+
+@migration('0003_purchase_ledger')
+def seed_purchase_ledger(connection):
+    """Carry existing sales counts into the ledger so it can be replayed"""
+    rows = opening_balance_rows(connection)
+    if rows:
+        connection.execute(insert(Purchase), rows)
+
+
+@migration('0004_search_index')
+def create_search_index(connection):
+    """FTS5 index behind /api/search, filled from the existing content"""
+    if not search_available(connection):
+        logger.warning('Skipping the search index: FTS5 needs SQLite')
+        return
+    connection.exec_driver_sql(CREATE_SEARCH_INDEX)
+    rebuild_search_index(connection)
+
+
+@migration('0005_tag_index')
+def build_tag_index(connection):
+    """Fill tag, tagged_item and product_image from the JSON text columns"""
+    rebuild_tag_index(connection)
+
+
+@migration('0006_analytics_partitions')
+def partition_analytics(connection):
+    """Move existing page views and interactions into monthly partition tables"""
+    moved = migrate_to_partitions(connection)
+    logger.info('Moved %d analytics row(s) into monthly partitions', moved)
+
@@ -1,6 +1,8 @@
 from src.models.user import db
 from datetime import datetime
 
+# Rows live in monthly partition tables (see services/partitions.py); the
+# mapped page_view and interaction tables are their schema template
 class PageView(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     page_url = db.Column(db.String(500), nullable=False)
@@ -17,6 +19,11 @@ class PageView(db.Model):
     duration = db.Column(db.Integer, nullable=True)  # time spent on page in seconds
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_page_view_created_at', 'created_at'),
+        db.Index('ix_page_view_page_url_created_at', 'page_url', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<PageView {self.page_url}>'
     
@@ -50,6 +57,12 @@ class Interaction(db.Model):
     extra_data = db.Column(db.Text, nullable=True)  # JSON string for additional data
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_interaction_created_at', 'created_at'),
+        db.Index('ix_interaction_event_type_created_at', 'event_type', 'created_at'),
+        db.Index('ix_interaction_page_url_created_at', 'page_url', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<Interaction {self.event_type}>'
     
@@ -18,6 +18,11 @@ class BlogPost(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     published_at = db.Column(db.DateTime, nullable=True)
     
+    __table_args__ = (
+        db.Index('ix_blog_post_published_published_at', 'published', 'published_at', 'created_at'),
+        db.Index('ix_blog_post_category_published', 'category', 'published', 'published_at', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<BlogPost {self.title}>'
     
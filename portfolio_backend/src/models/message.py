@@ -20,6 +20,12 @@ class Message(db.Model):
     read_at = db.Column(db.DateTime, nullable=True)
     replied_at = db.Column(db.DateTime, nullable=True)
     
+    __table_args__ = (
+        db.Index('ix_message_created_at', 'created_at'),
+        db.Index('ix_message_status_created_at', 'status', 'created_at'),
+        db.Index('ix_message_priority_created_at', 'priority', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<Message from {self.name}>'
     
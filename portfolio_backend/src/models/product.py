@@ -23,6 +23,13 @@ class Product(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_product_active_created_at', 'active', 'created_at'),
+        db.Index('ix_product_active_price', 'active', 'price'),
+        db.Index('ix_product_active_sales_count', 'active', 'sales_count'),
+        db.Index('ix_product_category_active_created_at', 'category', 'active', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<Product {self.name}>'
     
@@ -17,6 +17,13 @@ class Project(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_project_created_at', 'created_at'),
+        db.Index('ix_project_category_created_at', 'category', 'created_at'),
+        db.Index('ix_project_status_created_at', 'status', 'created_at'),
+        db.Index('ix_project_featured_created_at', 'featured', 'created_at'),
+    )
+    
     def __repr__(self):
         return f'<Project {self.title}>'
     
@@ -0,0 +1,63 @@
+from src.models.user import db
+from datetime import datetime
+
+class Purchase(db.Model):
+    """Append-only sales ledger; Product.sales_count is folded from it in batches"""
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    unit_price = db.Column(db.Float, nullable=True)  # NULL for the opening balance rows
+    reservation_id = db.Column(db.Integer, db.ForeignKey('stock_reservation.id'), nullable=True)
+    source = db.Column(db.String(20), nullable=False, default='checkout')  # checkout, opening
+    applied = db.Column(db.Boolean, nullable=False, default=False)  # already counted in Product.sales_count
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_purchase_applied_id', 'applied', 'id'),
+        db.Index('ix_purchase_product_created_at', 'product_id', 'created_at'),
+        db.Index('ix_purchase_created_at', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<Purchase {self.product_id} x{self.quantity}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'quantity': self.quantity,
+            'unit_price': self.unit_price,
+            'reservation_id': self.reservation_id,
+            'source': self.source,
+            'applied': self.applied,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class StockReservation(db.Model):
+    """Units of limited stock held for a checkout until it completes or expires"""
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(64), unique=True, nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    holds_stock = db.Column(db.Boolean, nullable=False, default=True)  # False for unlimited products
+    status = db.Column(db.String(20), nullable=False, default='held')  # held, committed, released, expired
+    expires_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_stock_reservation_status_expires_at', 'status', 'expires_at'),
+    )
+
+    def __repr__(self):
+        return f'<StockReservation {self.token} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'token': self.token,
+            'product_id': self.product_id,
+            'quantity': self.quantity,
+            'status': self.status,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
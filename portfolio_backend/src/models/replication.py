@@ -0,0 +1,16 @@
+from src.models.user import db
+from datetime import datetime
+
+class ReplicationHeartbeat(db.Model):
+    """Single row the primary touches every second; replicas' copy shows their lag"""
+    id = db.Column(db.Integer, primary_key=True)
+    beat_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ReplicationHeartbeat {self.beat_at}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'beat_at': self.beat_at.isoformat() if self.beat_at else None
+        }
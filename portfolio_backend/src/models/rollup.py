@@ -0,0 +1,43 @@
+from src.models.user import db
+
+class AnalyticsRollup(db.Model):
+    """Pre-aggregated PageView/Interaction counts for one time bucket"""
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)  # hour, day
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    metric = db.Column(db.String(50), nullable=False)  # pageviews, interactions, page_url, device_type, browser, referrer, event_type
+    dimension = db.Column(db.String(500), nullable=True)  # grouped value, NULL for totals
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_analytics_rollup_lookup', 'granularity', 'metric', 'bucket_start'),
+    )
+
+    def __repr__(self):
+        return f'<AnalyticsRollup {self.granularity} {self.bucket_start} {self.metric}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'granularity': self.granularity,
+            'bucket_start': self.bucket_start.isoformat() if self.bucket_start else None,
+            'metric': self.metric,
+            'dimension': self.dimension,
+            'count': self.count
+        }
+
+class VisitorSketch(db.Model):
+    """Serialized HyperLogLog sketch of distinct visitors or sessions for one time bucket"""
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)  # hour, day
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # visitors (ip_address), sessions (session_id)
+    page_url = db.Column(db.String(500), nullable=True)  # NULL for the site-wide sketch
+    sketch = db.Column(db.LargeBinary, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_visitor_sketch_lookup', 'granularity', 'kind', 'page_url', 'bucket_start'),
+    )
+
+    def __repr__(self):
+        return f'<VisitorSketch {self.granularity} {self.bucket_start} {self.kind}>'
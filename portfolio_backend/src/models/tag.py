@@ -0,0 +1,55 @@
+from src.models.user import db
+from datetime import datetime
+
+class Tag(db.Model):
+    """A tag or technology name shared by projects, blog posts and products"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    key = db.Column(db.String(100), unique=True, nullable=False)  # lower-cased name used for lookups
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Tag {self.name}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class TaggedItem(db.Model):
+    """Association of a Tag with one project, blog post or product"""
+    tag_id = db.Column(db.Integer, db.ForeignKey('tag.id'), primary_key=True)
+    kind = db.Column(db.String(10), primary_key=True)  # tag, tech
+    item_type = db.Column(db.String(20), primary_key=True)  # project, blog, product
+    item_id = db.Column(db.Integer, primary_key=True)
+
+    __table_args__ = (
+        db.Index('ix_tagged_item_item', 'item_type', 'item_id'),
+    )
+
+    def __repr__(self):
+        return f'<TaggedItem {self.item_type}:{self.item_id} {self.kind}:{self.tag_id}>'
+
+class ProductImage(db.Model):
+    """One gallery image of a product, in display order"""
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0)
+    url = db.Column(db.String(500), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_product_image_product_position', 'product_id', 'position'),
+    )
+
+    def __repr__(self):
+        return f'<ProductImage {self.product_id}#{self.position}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'position': self.position,
+            'url': self.url
+        }
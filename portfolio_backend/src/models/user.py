@@ -1,6 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
+from src.services.replicas import RoutingSession
 
-db = SQLAlchemy()
+# GET reads on the content blueprints may be routed to a read replica (see services/replicas.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
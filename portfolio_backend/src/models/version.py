@@ -0,0 +1,18 @@
+from src.models.user import db
+from datetime import datetime
+
+class CollectionVersion(db.Model):
+    """Monotonic change counter for a content collection (projects, blog, shop)"""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CollectionVersion {self.name} v{self.version}>'
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'version': self.version,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
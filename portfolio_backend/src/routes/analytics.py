@@ -1,13 +1,38 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from src.models.user import db
 from src.models.analytics import PageView, Interaction
+from src.services.ingest import (
+    ingest_queue, pageview_row, interaction_row, parse_batch_body, split_batch, IngestQueueFull, InvalidEvent
+)
+from src.services.export import export_response, EXPORT_FORMATS
+from src.services.pagination import paginate, SortKey, InvalidCursor
+from src.services.projection import requested_fields, project, InvalidProjection
+from src.services.serialization import serialize_rows, json_response
+from src.services.rollups import dashboard_counts, approximate_uniques, exact_uniques
+from src.services.partitions import partition_rows, partition_selectable, partition_source
+from src.services.cache import response_cache
+from src.services.replicas import not_read_back
+from src.services.stats import STATS_CACHE_TTL
 from datetime import datetime, timedelta
-from sqlalchemy import func, desc
-import json
+from sqlalchemy import insert, select
+import logging
+
+logger = logging.getLogger(__name__)
 
 analytics_bp = Blueprint('analytics', __name__)
 
+def _ingest_unavailable(error):
+    """Shed load when the ingest buffer is full"""
+    response = jsonify({
+        'success': False,
+        'error': str(error)
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
 @analytics_bp.route('/analytics/pageview', methods=['POST'])
+@not_read_back
 def track_pageview():
     """Track a page view"""
     try:
@@ -24,38 +49,33 @@ def track_pageview():
         ip_address = request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR'))
         user_agent = request.headers.get('User-Agent')
         
-        # Create page view record
-        pageview = PageView(
-            page_url=data['page_url'],
-            page_title=data.get('page_title'),
-            referrer=data.get('referrer'),
-            user_agent=user_agent,
-            ip_address=ip_address,
-            session_id=data.get('session_id'),
-            device_type=data.get('device_type'),
-            browser=data.get('browser'),
-            os=data.get('os'),
-            country=data.get('country'),
-            city=data.get('city'),
-            duration=data.get('duration')
-        )
-        
-        db.session.add(pageview)
-        db.session.commit()
+        # Queue the page view; the ingest worker persists it in bulk
+        ingest_queue.enqueue(PageView, pageview_row(data, ip_address, user_agent))
         
         return jsonify({
             'success': True,
             'message': 'Page view tracked successfully'
-        })
+        }), 202
     
-    except Exception as e:
-        db.session.rollback()
+    except InvalidEvent as e:
         return jsonify({
             'success': False,
             'error': str(e)
+        }), 400
+    
+    except IngestQueueFull as e:
+        return _ingest_unavailable(e)
+    
+    except Exception:
+        # With ingest disabled the row is written through, and a driver error would echo SQL
+        logger.exception('Failed to record analytics event')
+        return jsonify({
+            'success': False,
+            'error': 'Failed to record analytics event'
         }), 500
 
 @analytics_bp.route('/analytics/interaction', methods=['POST'])
+@not_read_back
 def track_interaction():
     """Track a user interaction"""
     try:
@@ -73,34 +93,102 @@ def track_interaction():
         # Get client information
         ip_address = request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR'))
         
-        # Create interaction record
-        interaction = Interaction(
-            event_type=data['event_type'],
-            element_id=data.get('element_id'),
-            element_class=data.get('element_class'),
-            element_text=data.get('element_text'),
-            page_url=data['page_url'],
-            session_id=data.get('session_id'),
-            ip_address=ip_address,
-            extra_data=json.dumps(data.get('metadata', {}))
-        )
-        
-        db.session.add(interaction)
-        db.session.commit()
+        # Queue the interaction; the ingest worker persists it in bulk
+        ingest_queue.enqueue(Interaction, interaction_row(data, ip_address))
         
         return jsonify({
             'success': True,
             'message': 'Interaction tracked successfully'
+        }), 202
+    
+    except InvalidEvent as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    except IngestQueueFull as e:
+        return _ingest_unavailable(e)
+    
+    except Exception:
+        # With ingest disabled the row is written through, and a driver error would echo SQL
+        logger.exception('Failed to record analytics event')
+        return jsonify({
+            'success': False,
+            'error': 'Failed to record analytics event'
+        }), 500
+
+@analytics_bp.route('/analytics/batch', methods=['POST'])
+@not_read_back
+def track_batch():
+    """Track many page views and interactions in one request"""
+    try:
+        events = parse_batch_body(request.get_data(as_text=True), request.mimetype)
+        if events is None:
+            return jsonify({
+                'success': False,
+                'error': 'Body must be a JSON array or newline-delimited JSON'
+            }), 400
+        
+        max_events = current_app.config.get('ANALYTICS_BATCH_MAX_EVENTS', 1000)
+        if len(events) > max_events:
+            return jsonify({
+                'success': False,
+                'error': f'Batch exceeds maximum of {max_events} events'
+            }), 413
+        
+        # Get client information
+        ip_address = request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR'))
+        user_agent = request.headers.get('User-Agent')
+        
+        # Validate every event in one pass, splitting rows by table
+        pageview_rows, interaction_rows, results = split_batch(events, ip_address, user_agent)
+        
+        # Route rows to their month partitions before the session takes the write lock
+        by_table = {
+            **partition_rows(PageView, pageview_rows),
+            **partition_rows(Interaction, interaction_rows)
+        }
+        
+        # Persist everything accepted with one executemany per table in a single transaction
+        for table, rows in by_table.items():
+            db.session.execute(insert(table), rows)
+        if by_table:
+            db.session.commit()
+        
+        accepted = len(pageview_rows) + len(interaction_rows)
+        return jsonify({
+            'success': True,
+            'accepted': accepted,
+            'rejected': len(results) - accepted,
+            'results': results
         })
     
-    except Exception as e:
+    except Exception:
         db.session.rollback()
+        logger.exception('Failed to record analytics batch')
         return jsonify({
             'success': False,
-            'error': str(e)
+            'error': 'Failed to record analytics batch'
         }), 500
 
+@analytics_bp.route('/analytics/ingest/stats', methods=['GET'])
+def get_ingest_stats():
+    """Get counters for the buffered analytics ingest queue"""
+    stats = ingest_queue.stats()
+    
+    # Under the ASGI entry point the tracking beacons go through its event-loop buffer
+    async_ingest = current_app.extensions.get('async_analytics_ingest')
+    if async_ingest is not None:
+        stats['async'] = async_ingest.stats()
+    
+    return jsonify({
+        'success': True,
+        'data': stats
+    })
+
 @analytics_bp.route('/analytics/dashboard', methods=['GET'])
+@response_cache.cached('analytics', ttl=STATS_CACHE_TTL)
 def get_dashboard_stats():
     """Get dashboard analytics statistics"""
     try:
@@ -108,69 +196,42 @@ def get_dashboard_stats():
         days = request.args.get('days', 30, type=int)
         start_date = datetime.utcnow() - timedelta(days=days)
         
+        # Counts come from hour/day rollups, plus raw rows for the uncompacted edges
+        counts = dashboard_counts(start_date)
+        
         # Total page views
-        total_pageviews = PageView.query.filter(PageView.created_at >= start_date).count()
+        total_pageviews = counts['pageviews'][None]
         
-        # Unique visitors (based on IP address)
-        unique_visitors = db.session.query(func.count(func.distinct(PageView.ip_address))).filter(
-            PageView.created_at >= start_date
-        ).scalar()
+        # Unique visitors/sessions from HyperLogLog sketches; ?exact=true counts raw rows
+        exact = request.args.get('exact', 'false').lower() == 'true'
+        uniques = exact_uniques(start_date) if exact else approximate_uniques(start_date)
         
         # Most popular pages
-        popular_pages = db.session.query(
-            PageView.page_url,
-            func.count(PageView.id).label('views')
-        ).filter(
-            PageView.created_at >= start_date
-        ).group_by(PageView.page_url).order_by(desc('views')).limit(10).all()
+        popular_pages = counts['page_url'].most_common(10)
         
         # Device types
-        device_stats = db.session.query(
-            PageView.device_type,
-            func.count(PageView.id).label('count')
-        ).filter(
-            PageView.created_at >= start_date
-        ).group_by(PageView.device_type).all()
+        device_stats = counts['device_type'].most_common()
         
         # Browser stats
-        browser_stats = db.session.query(
-            PageView.browser,
-            func.count(PageView.id).label('count')
-        ).filter(
-            PageView.created_at >= start_date
-        ).group_by(PageView.browser).limit(10).all()
+        browser_stats = counts['browser'].most_common(10)
         
         # Top referrers
-        referrer_stats = db.session.query(
-            PageView.referrer,
-            func.count(PageView.id).label('count')
-        ).filter(
-            PageView.created_at >= start_date,
-            PageView.referrer.isnot(None),
-            PageView.referrer != ''
-        ).group_by(PageView.referrer).order_by(desc('count')).limit(10).all()
-        
-        # Daily page views for the last 30 days
-        daily_views = db.session.query(
-            func.date(PageView.created_at).label('date'),
-            func.count(PageView.id).label('views')
-        ).filter(
-            PageView.created_at >= start_date
-        ).group_by(func.date(PageView.created_at)).order_by('date').all()
+        referrer_stats = [(ref, count) for ref, count in counts['referrer'].most_common() if ref][:10]
+        
+        # Daily page views for the requested window
+        daily_views = sorted(counts['daily'].items())
         
         # Top interactions
-        top_interactions = db.session.query(
-            Interaction.event_type,
-            func.count(Interaction.id).label('count')
-        ).filter(
-            Interaction.created_at >= start_date
-        ).group_by(Interaction.event_type).order_by(desc('count')).all()
+        top_interactions = counts['event_type'].most_common()
         
         return jsonify({
             'success': True,
             'data': {
                 'total_pageviews': total_pageviews,
-                'unique_visitors': unique_visitors,
+                'unique_visitors': uniques['visitors'],
+                'unique_sessions': uniques['sessions'],
+                'uniques_mode': 'exact' if exact else 'approximate',
+                'uniques_error': uniques['error'],
                 'popular_pages': [{'url': page[0], 'views': page[1]} for page in popular_pages],
                 'device_stats': [{'device': device[0], 'count': device[1]} for device in device_stats],
                 'browser_stats': [{'browser': browser[0], 'count': browser[1]} for browser in browser_stats],
@@ -193,28 +254,47 @@ def get_pageviews():
         # Get query parameters
         page_url = request.args.get('page_url')
         days = request.args.get('days', 30, type=int)
-        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
         
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Build query
-        query = PageView.query.filter(PageView.created_at >= start_date)
+        # Build query over the monthly partitions the window touches
+        source = partition_source(PageView, start_date)
+        query = db.session.query(source).filter(source.created_at >= start_date)
         
         if page_url:
-            query = query.filter(PageView.page_url == page_url)
+            query = query.filter(source.page_url == page_url)
         
-        query = query.order_by(PageView.created_at.desc())
+        fields = requested_fields(PageView, 'pageviews')
         
-        if limit:
-            query = query.limit(limit)
+        # Newest first, one page at a time
+        keys = [
+            SortKey(source.created_at, descending=True),
+            SortKey(source.id, descending=True)
+        ]
+        pageviews, next_cursor = paginate(project(query, source, fields, keys), 'pageviews', keys, cursor)
         
-        pageviews = query.all()
-        
-        return jsonify({
+        response = {
             'success': True,
-            'data': [pageview.to_dict() for pageview in pageviews],
-            'count': len(pageviews)
-        })
+            'data': serialize_rows(pageviews, fields),
+            'count': len(pageviews),
+            'next_cursor': next_cursor
+        }
+        
+        # Optional distinct visitor/session counts for the same window and page
+        if request.args.get('uniques', 'false').lower() == 'true':
+            if request.args.get('exact', 'false').lower() == 'true':
+                response['uniques'] = exact_uniques(start_date, page_url=page_url)
+            else:
+                response['uniques'] = approximate_uniques(start_date, page_url=page_url)
+        
+        return json_response(response)
+    
+    except (InvalidCursor, InvalidProjection) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     
     except Exception as e:
         return jsonify({
@@ -230,35 +310,93 @@ def get_interactions():
         event_type = request.args.get('event_type')
         page_url = request.args.get('page_url')
         days = request.args.get('days', 30, type=int)
-        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
         
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Build query
-        query = Interaction.query.filter(Interaction.created_at >= start_date)
+        # Build query over the monthly partitions the window touches
+        source = partition_source(Interaction, start_date)
+        query = db.session.query(source).filter(source.created_at >= start_date)
         
         if event_type:
-            query = query.filter(Interaction.event_type == event_type)
+            query = query.filter(source.event_type == event_type)
         
         if page_url:
-            query = query.filter(Interaction.page_url == page_url)
-        
-        query = query.order_by(Interaction.created_at.desc())
+            query = query.filter(source.page_url == page_url)
         
-        if limit:
-            query = query.limit(limit)
+        fields = requested_fields(Interaction, 'interactions')
         
-        interactions = query.all()
+        # Newest first, one page at a time
+        keys = [
+            SortKey(source.created_at, descending=True),
+            SortKey(source.id, descending=True)
+        ]
+        interactions, next_cursor = paginate(project(query, source, fields, keys), 'interactions', keys, cursor)
         
-        return jsonify({
+        return json_response({
             'success': True,
-            'data': [interaction.to_dict() for interaction in interactions],
-            'count': len(interactions)
+            'data': serialize_rows(interactions, fields),
+            'count': len(interactions),
+            'next_cursor': next_cursor
         })
     
+    except (InvalidCursor, InvalidProjection) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@analytics_bp.route('/analytics/pageviews/export', methods=['GET'])
+def export_pageviews():
+    """Stream raw page views as NDJSON or CSV"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({
+            'success': False,
+            'error': f'Unsupported export format: {fmt}'
+        }), 400
+    
+    # Same filters as get_pageviews
+    page_url = request.args.get('page_url')
+    days = request.args.get('days', 30, type=int)
+    start_date = datetime.utcnow() - timedelta(days=days)
+    
+    source = partition_selectable(PageView, start_date)
+    statement = select(source).where(source.c.created_at >= start_date)
+    if page_url:
+        statement = statement.where(source.c.page_url == page_url)
+    statement = statement.order_by(source.c.created_at.desc(), source.c.id.desc())
+    
+    return export_response(statement, fmt, 'pageviews')
+
+@analytics_bp.route('/analytics/interactions/export', methods=['GET'])
+def export_interactions():
+    """Stream raw interactions as NDJSON or CSV"""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({
+            'success': False,
+            'error': f'Unsupported export format: {fmt}'
+        }), 400
+    
+    # Same filters as get_interactions
+    event_type = request.args.get('event_type')
+    page_url = request.args.get('page_url')
+    days = request.args.get('days', 30, type=int)
+    start_date = datetime.utcnow() - timedelta(days=days)
+    
+    source = partition_selectable(Interaction, start_date)
+    statement = select(source).where(source.c.created_at >= start_date)
+    if event_type:
+        statement = statement.where(source.c.event_type == event_type)
+    if page_url:
+        statement = statement.where(source.c.page_url == page_url)
+    statement = statement.order_by(source.c.created_at.desc(), source.c.id.desc())
+    
+    return export_response(statement, fmt, 'interactions')
@@ -1,12 +1,22 @@
 from flask import Blueprint, request, jsonify
 from src.models.user import db
 from src.models.blog import BlogPost
+from src.services.cache import response_cache
+from src.services.conditional import conditional, bump_collection_version
+from src.services.search import index_document, remove_document
+from src.services.tags import filter_by_tag, sync_item, remove_item
+from src.services.view_counter import view_counter
+from src.services.pagination import paginate, SortKey, InvalidCursor
+from src.services.projection import requested_fields, project, InvalidProjection
+from src.services.serialization import serialize_rows, json_response
 import json
 from datetime import datetime
 
 blog_bp = Blueprint('blog', __name__)
 
 @blog_bp.route('/blog/posts', methods=['GET'])
+@conditional('blog')
+@response_cache.cached('blog')
 def get_blog_posts():
     """Get all blog posts with optional filtering"""
     try:
@@ -14,7 +24,8 @@ def get_blog_posts():
         category = request.args.get('category')
         featured = request.args.get('featured')
         published = request.args.get('published', 'true')
-        limit = request.args.get('limit', type=int)
+        tag = request.args.get('tag')
+        cursor = request.args.get('cursor')
         
         # Build query
         query = BlogPost.query
@@ -30,20 +41,32 @@ def get_blog_posts():
             published_bool = published.lower() == 'true'
             query = query.filter(BlogPost.published == published_bool)
         
-        # Order by publication date (newest first)
-        query = query.order_by(BlogPost.published_at.desc().nullslast(), BlogPost.created_at.desc())
+        if tag:
+            query = filter_by_tag(query, BlogPost, 'blog', tag)
         
-        if limit:
-            query = query.limit(limit)
+        fields = requested_fields(BlogPost, 'blog')
         
-        posts = query.all()
+        # Order by publication date (newest first), one page at a time
+        keys = [
+            SortKey(BlogPost.published_at, descending=True, nulls_last=True),
+            SortKey(BlogPost.created_at, descending=True),
+            SortKey(BlogPost.id, descending=True)
+        ]
+        posts, next_cursor = paginate(project(query, BlogPost, fields, keys), 'blog_posts', keys, cursor)
         
-        return jsonify({
+        return json_response({
             'success': True,
-            'data': [post.to_dict() for post in posts],
-            'count': len(posts)
+            'data': serialize_rows(posts, fields),
+            'count': len(posts),
+            'next_cursor': next_cursor
         })
     
+    except (InvalidCursor, InvalidProjection) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
     except Exception as e:
         return jsonify({
             'success': False,
@@ -56,13 +79,14 @@ def get_blog_post_by_slug(slug):
     try:
         post = BlogPost.query.filter_by(slug=slug).first_or_404()
         
-        # Increment view count
-        post.views += 1
-        db.session.commit()
+        # Count the view; the write-behind counter flushes it in bulk
+        view_counter.record(post.id)
+        data = post.to_dict()
+        data['views'] = view_counter.current_views(post)
         
         return jsonify({
             'success': True,
-            'data': post.to_dict()
+            'data': data
         })
     
     except Exception as e:
@@ -72,6 +96,8 @@ def get_blog_post_by_slug(slug):
         }), 500
 
 @blog_bp.route('/blog/posts/<int:post_id>', methods=['GET'])
+@conditional('blog')
+@response_cache.cached('blog')
 def get_blog_post(post_id):
     """Get a specific blog post by ID"""
     try:
@@ -130,7 +156,11 @@ def create_blog_post():
         )
         
         db.session.add(post)
+        index_document('blog', post)
+        sync_item('blog', post)
+        bump_collection_version('blog')
         db.session.commit()
+        response_cache.invalidate('blog')
         
         return jsonify({
             'success': True,
@@ -184,7 +214,11 @@ def update_blog_post(post_id):
         if 'featured' in data:
             post.featured = data['featured']
         
+        index_document('blog', post)
+        sync_item('blog', post)
+        bump_collection_version('blog')
         db.session.commit()
+        response_cache.invalidate('blog')
         
         return jsonify({
             'success': True,
@@ -204,8 +238,12 @@ def delete_blog_post(post_id):
     """Delete a blog post"""
     try:
         post = BlogPost.query.get_or_404(post_id)
+        remove_document('blog', post.id)
+        remove_item('blog', post.id)
         db.session.delete(post)
+        bump_collection_version('blog')
         db.session.commit()
+        response_cache.invalidate('blog')
         
         return jsonify({
             'success': True,
@@ -220,6 +258,8 @@ def delete_blog_post(post_id):
         }), 500
 
 @blog_bp.route('/blog/categories', methods=['GET'])
+@conditional('blog')
+@response_cache.cached('blog')
 def get_blog_categories():
     """Get all unique blog categories"""
     try:
@@ -1,6 +1,13 @@
 from flask import Blueprint, request, jsonify
 from src.models.user import db
 from src.models.message import Message
+from src.services.pagination import paginate, SortKey, InvalidCursor
+from src.services.projection import requested_fields, project, InvalidProjection
+from src.services.serialization import serialize_rows, json_response
+from src.services.cache import response_cache
+from src.services.query_monitor import query_budget
+from src.services.replicas import not_read_back
+from src.services.stats import message_stats, UnknownCounter, STATS_CACHE_TTL
 from datetime import datetime
 
 contact_bp = Blueprint('contact', __name__)
@@ -12,7 +19,7 @@ def get_messages():
         # Get query parameters
         status = request.args.get('status')
         priority = request.args.get('priority')
-        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
         
         # Build query
         query = Message.query
@@ -23,20 +30,28 @@ def get_messages():
         if priority:
             query = query.filter(Message.priority == priority)
         
-        # Order by creation date (newest first)
-        query = query.order_by(Message.created_at.desc())
+        fields = requested_fields(Message, 'messages')
         
-        if limit:
-            query = query.limit(limit)
+        # Order by creation date (newest first), one page at a time
+        keys = [
+            SortKey(Message.created_at, descending=True),
+            SortKey(Message.id, descending=True)
+        ]
+        messages, next_cursor = paginate(project(query, Message, fields, keys), 'messages', keys, cursor)
         
-        messages = query.all()
-        
-        return jsonify({
+        return json_response({
             'success': True,
-            'data': [message.to_dict() for message in messages],
-            'count': len(messages)
+            'data': serialize_rows(messages, fields),
+            'count': len(messages),
+            'next_cursor': next_cursor
         })
     
+    except (InvalidCursor, InvalidProjection) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
     except Exception as e:
         return jsonify({
             'success': False,
@@ -54,6 +69,7 @@ def get_message(message_id):
             message.status = 'read'
             message.read_at = datetime.utcnow()
             db.session.commit()
+            response_cache.invalidate('messages')
         
         return jsonify({
             'success': True,
@@ -67,6 +83,7 @@ def get_message(message_id):
         }), 500
 
 @contact_bp.route('/contact/messages', methods=['POST'])
+@not_read_back
 def create_message():
     """Create a new contact message"""
     try:
@@ -103,6 +120,7 @@ def create_message():
         
         db.session.add(message)
         db.session.commit()
+        response_cache.invalidate('messages')
         
         return jsonify({
             'success': True,
@@ -134,6 +152,7 @@ def update_message(message_id):
             message.priority = data['priority']
         
         db.session.commit()
+        response_cache.invalidate('messages')
         
         return jsonify({
             'success': True,
@@ -155,6 +174,7 @@ def delete_message(message_id):
         message = Message.query.get_or_404(message_id)
         db.session.delete(message)
         db.session.commit()
+        response_cache.invalidate('messages')
         
         return jsonify({
             'success': True,
@@ -169,30 +189,25 @@ def delete_message(message_id):
         }), 500
 
 @contact_bp.route('/contact/stats', methods=['GET'])
+@response_cache.cached('messages', ttl=STATS_CACHE_TTL)
+@query_budget(1)
 def get_contact_stats():
     """Get contact message statistics"""
     try:
-        total_messages = Message.query.count()
-        new_messages = Message.query.filter_by(status='new').count()
-        read_messages = Message.query.filter_by(status='read').count()
-        replied_messages = Message.query.filter_by(status='replied').count()
-        
-        # Get messages by priority
-        high_priority = Message.query.filter_by(priority='high').count()
-        urgent_priority = Message.query.filter_by(priority='urgent').count()
+        # Every counter (or just ?counters=a,b) in a single statement
+        names = [name for name in request.args.get('counters', '').split(',') if name]
         
         return jsonify({
             'success': True,
-            'data': {
-                'total_messages': total_messages,
-                'new_messages': new_messages,
-                'read_messages': read_messages,
-                'replied_messages': replied_messages,
-                'high_priority': high_priority,
-                'urgent_priority': urgent_priority
-            }
+            'data': message_stats(names)
         })
     
+    except UnknownCounter as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
     except Exception as e:
         return jsonify({
             'success': False,
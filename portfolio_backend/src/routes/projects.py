@@ -1,11 +1,20 @@
 from flask import Blueprint, request, jsonify
 from src.models.user import db
 from src.models.project import Project
+from src.services.cache import response_cache
+from src.services.conditional import conditional, bump_collection_version
+from src.services.search import index_document, remove_document
+from src.services.tags import filter_by_tag, sync_item, remove_item
+from src.services.pagination import paginate, SortKey, InvalidCursor
+from src.services.projection import requested_fields, project, InvalidProjection
+from src.services.serialization import serialize_rows, json_response
 import json
 
 projects_bp = Blueprint('projects', __name__)
 
 @projects_bp.route('/projects', methods=['GET'])
+@conditional('projects')
+@response_cache.cached('projects')
 def get_projects():
     """Get all projects with optional filtering"""
     try:
@@ -13,7 +22,9 @@ def get_projects():
         category = request.args.get('category')
         featured = request.args.get('featured')
         status = request.args.get('status')
-        limit = request.args.get('limit', type=int)
+        tag = request.args.get('tag')
+        tech = request.args.get('tech')
+        cursor = request.args.get('cursor')
         
         # Build query
         query = Project.query
@@ -28,20 +39,34 @@ def get_projects():
         if status:
             query = query.filter(Project.status == status)
         
-        # Order by creation date (newest first)
-        query = query.order_by(Project.created_at.desc())
+        if tag:
+            query = filter_by_tag(query, Project, 'project', tag)
         
-        if limit:
-            query = query.limit(limit)
+        if tech:
+            query = filter_by_tag(query, Project, 'project', tech, kind='tech')
         
-        projects = query.all()
+        fields = requested_fields(Project, 'projects')
         
-        return jsonify({
+        # Order by creation date (newest first), one page at a time
+        keys = [
+            SortKey(Project.created_at, descending=True),
+            SortKey(Project.id, descending=True)
+        ]
+        projects, next_cursor = paginate(project(query, Project, fields, keys), 'projects', keys, cursor)
+        
+        return json_response({
             'success': True,
-            'data': [project.to_dict() for project in projects],
-            'count': len(projects)
+            'data': serialize_rows(projects, fields),
+            'count': len(projects),
+            'next_cursor': next_cursor
         })
     
+    except (InvalidCursor, InvalidProjection) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
     except Exception as e:
         return jsonify({
             'success': False,
@@ -49,6 +74,8 @@ def get_projects():
         }), 500
 
 @projects_bp.route('/projects/<int:project_id>', methods=['GET'])
+@conditional('projects')
+@response_cache.cached('projects')
 def get_project(project_id):
     """Get a specific project by ID"""
     try:
@@ -95,7 +122,11 @@ def create_project():
         )
         
         db.session.add(project)
+        index_document('project', project)
+        sync_item('project', project)
+        bump_collection_version('projects')
         db.session.commit()
+        response_cache.invalidate('projects')
         
         return jsonify({
             'success': True,
@@ -141,7 +172,11 @@ def update_project(project_id):
         if 'status' in data:
             project.status = data['status']
         
+        index_document('project', project)
+        sync_item('project', project)
+        bump_collection_version('projects')
         db.session.commit()
+        response_cache.invalidate('projects')
         
         return jsonify({
             'success': True,
@@ -161,8 +196,12 @@ def delete_project(project_id):
     """Delete a project"""
     try:
         project = Project.query.get_or_404(project_id)
+        remove_document('project', project.id)
+        remove_item('project', project.id)
         db.session.delete(project)
+        bump_collection_version('projects')
         db.session.commit()
+        response_cache.invalidate('projects')
         
         return jsonify({
             'success': True,
@@ -177,6 +216,8 @@ def delete_project(project_id):
         }), 500
 
 @projects_bp.route('/projects/categories', methods=['GET'])
+@conditional('projects')
+@response_cache.cached('projects')
 def get_project_categories():
     """Get all unique project categories"""
     try:
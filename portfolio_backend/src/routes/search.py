@@ -0,0 +1,56 @@
+from flask import Blueprint, request, jsonify
+from src.services.pagination import page_size, InvalidCursor
+from src.services.search import search, search_available, SEARCH_KINDS
+
+search_bp = Blueprint('search', __name__)
+
+@search_bp.route('/search', methods=['GET'])
+def search_content():
+    """Search published posts, projects and active products"""
+    try:
+        query = request.args.get('q', '').strip()
+        types = request.args.get('type')
+        cursor = request.args.get('cursor')
+        
+        if not query:
+            return jsonify({
+                'success': False,
+                'error': 'Missing required parameter: q'
+            }), 400
+        
+        kinds = None
+        if types:
+            kinds = [kind.strip() for kind in types.split(',') if kind.strip()]
+            unknown = [kind for kind in kinds if kind not in SEARCH_KINDS]
+            if unknown:
+                return jsonify({
+                    'success': False,
+                    'error': f'Unknown search type: {", ".join(unknown)}'
+                }), 400
+        
+        if not search_available():
+            return jsonify({
+                'success': False,
+                'error': 'Search requires the SQLite FTS5 backend'
+            }), 503
+        
+        results, next_cursor = search(query, kinds, page_size(), cursor)
+        
+        return jsonify({
+            'success': True,
+            'data': results,
+            'count': len(results),
+            'next_cursor': next_cursor
+        })
+    
+    except InvalidCursor as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
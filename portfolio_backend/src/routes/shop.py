@@ -1,11 +1,25 @@
 from flask import Blueprint, request, jsonify
 from src.models.user import db
 from src.models.product import Product
+from src.services.cache import response_cache
+from src.services.conditional import conditional, bump_collection_version
+from src.services.search import index_document, remove_document
+from src.services.tags import filter_by_tag, sync_item, remove_item, product_images
+from src.services.pagination import paginate, SortKey, InvalidCursor
+from src.services.projection import requested_fields, project, InvalidProjection
+from src.services.serialization import serialize_rows, json_response
+from src.services.purchases import (
+    purchase_ledger, record_sale, reserve_stock, release_reservation, sales_summary,
+    ProductNotFound, OutOfStock, ReservationError
+)
 import json
+from datetime import datetime, timedelta
 
 shop_bp = Blueprint('shop', __name__)
 
 @shop_bp.route('/shop/products', methods=['GET'])
+@conditional('shop')
+@response_cache.cached('shop')
 def get_products():
     """Get all products with optional filtering"""
     try:
@@ -13,7 +27,8 @@ def get_products():
         category = request.args.get('category')
         featured = request.args.get('featured')
         active = request.args.get('active', 'true')
-        limit = request.args.get('limit', type=int)
+        tag = request.args.get('tag')
+        cursor = request.args.get('cursor')
         sort_by = request.args.get('sort_by', 'created_at')  # created_at, price, sales_count
         order = request.args.get('order', 'desc')  # asc, desc
         
@@ -31,34 +46,40 @@ def get_products():
             active_bool = active.lower() == 'true'
             query = query.filter(Product.active == active_bool)
         
-        # Apply sorting
+        if tag:
+            query = filter_by_tag(query, Product, 'product', tag)
+        
+        # Apply sorting, with id as the tie-breaker so pages never overlap
         if sort_by == 'price':
-            if order == 'asc':
-                query = query.order_by(Product.price.asc())
-            else:
-                query = query.order_by(Product.price.desc())
+            sort_column = Product.price
         elif sort_by == 'sales_count':
-            if order == 'asc':
-                query = query.order_by(Product.sales_count.asc())
-            else:
-                query = query.order_by(Product.sales_count.desc())
+            sort_column = Product.sales_count
         else:  # created_at
-            if order == 'asc':
-                query = query.order_by(Product.created_at.asc())
-            else:
-                query = query.order_by(Product.created_at.desc())
+            sort_by = 'created_at'
+            sort_column = Product.created_at
+        descending = order != 'asc'
         
-        if limit:
-            query = query.limit(limit)
+        fields = requested_fields(Product, 'shop')
         
-        products = query.all()
+        keys = [
+            SortKey(sort_column, descending=descending),
+            SortKey(Product.id, descending=descending)
+        ]
+        products, next_cursor = paginate(project(query, Product, fields, keys), f'products:{sort_by}:{"desc" if descending else "asc"}', keys, cursor)
         
-        return jsonify({
+        return json_response({
             'success': True,
-            'data': [product.to_dict() for product in products],
-            'count': len(products)
+            'data': serialize_rows(products, fields),
+            'count': len(products),
+            'next_cursor': next_cursor
         })
     
+    except (InvalidCursor, InvalidProjection) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
     except Exception as e:
         return jsonify({
             'success': False,
@@ -66,6 +87,8 @@ def get_products():
         }), 500
 
 @shop_bp.route('/shop/products/<int:product_id>', methods=['GET'])
+@conditional('shop')
+@response_cache.cached('shop')
 def get_product(product_id):
     """Get a specific product by ID"""
     try:
@@ -81,6 +104,26 @@ def get_product(product_id):
             'error': str(e)
         }), 500
 
+@shop_bp.route('/shop/products/<int:product_id>/images', methods=['GET'])
+@conditional('shop')
+@response_cache.cached('shop')
+def get_product_images(product_id):
+    """Get a product's gallery images in display order"""
+    try:
+        Product.query.get_or_404(product_id)
+        images = product_images(product_id)
+        return jsonify({
+            'success': True,
+            'data': [image.to_dict() for image in images],
+            'count': len(images)
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @shop_bp.route('/shop/products', methods=['POST'])
 def create_product():
     """Create a new product"""
@@ -117,7 +160,11 @@ def create_product():
         )
         
         db.session.add(product)
+        index_document('product', product)
+        sync_item('product', product)
+        bump_collection_version('shop')
         db.session.commit()
+        response_cache.invalidate('shop')
         
         return jsonify({
             'success': True,
@@ -173,7 +220,11 @@ def update_product(product_id):
         if 'stripe_price_id' in data:
             product.stripe_price_id = data['stripe_price_id']
         
+        index_document('product', product)
+        sync_item('product', product)
+        bump_collection_version('shop')
         db.session.commit()
+        response_cache.invalidate('shop')
         
         return jsonify({
             'success': True,
@@ -193,8 +244,12 @@ def delete_product(product_id):
     """Delete a product"""
     try:
         product = Product.query.get_or_404(product_id)
+        remove_document('product', product.id)
+        remove_item('product', product.id)
         db.session.delete(product)
+        bump_collection_version('shop')
         db.session.commit()
+        response_cache.invalidate('shop')
         
         return jsonify({
             'success': True,
@@ -209,6 +264,8 @@ def delete_product(product_id):
         }), 500
 
 @shop_bp.route('/shop/categories', methods=['GET'])
+@conditional('shop')
+@response_cache.cached('shop')
 def get_product_categories():
     """Get all unique product categories"""
     try:
@@ -226,31 +283,131 @@ def get_product_categories():
             'error': str(e)
         }), 500
 
+def _requested_quantity(data):
+    quantity = data.get('quantity', 1)
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+        raise ValueError('quantity must be a positive integer')
+    return quantity
+
 @shop_bp.route('/shop/products/<int:product_id>/purchase', methods=['POST'])
 def record_purchase(product_id):
-    """Record a product purchase (increment sales count)"""
+    """Record a product purchase against stock or a held reservation"""
     try:
-        product = Product.query.get_or_404(product_id)
+        data = request.get_json(silent=True) or {}
+        quantity = _requested_quantity(data)
         
-        # Increment sales count
-        product.sales_count += 1
+        # One conditional UPDATE takes the stock; the sale goes to the ledger
+        product, purchase, sales_count = record_sale(product_id, quantity, data.get('reservation'))
+        purchase_ledger.after_sale()
         
-        # Decrease stock if not unlimited
-        if product.stock_quantity > 0:
-            product.stock_quantity -= 1
+        return jsonify({
+            'success': True,
+            'data': {**product.to_dict(), 'sales_count': sales_count},
+            'purchase': purchase.to_dict(),
+            'message': 'Purchase recorded successfully'
+        })
+    
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    except ProductNotFound as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    
+    except (OutOfStock, ReservationError) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 409
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@shop_bp.route('/shop/products/<int:product_id>/reservations', methods=['POST'])
+def create_reservation(product_id):
+    """Hold stock for a checkout until it is purchased, released or expires"""
+    try:
+        data = request.get_json(silent=True) or {}
+        quantity = _requested_quantity(data)
+        reservation, product = reserve_stock(product_id, quantity)
         
-        db.session.commit()
+        return jsonify({
+            'success': True,
+            'data': reservation.to_dict(),
+            'stock_quantity': product.stock_quantity,
+            'message': 'Stock reserved successfully'
+        }), 201
+    
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    except ProductNotFound as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    
+    except OutOfStock as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 409
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@shop_bp.route('/shop/reservations/<token>', methods=['DELETE'])
+def cancel_reservation(token):
+    """Release a held reservation and return its stock"""
+    try:
+        release_reservation(token)
         
         return jsonify({
             'success': True,
-            'data': product.to_dict(),
-            'message': 'Purchase recorded successfully'
+            'message': 'Reservation released successfully'
         })
     
+    except ReservationError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
+    
     except Exception as e:
-        db.session.rollback()
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@shop_bp.route('/shop/sales', methods=['GET'])
+def get_sales():
+    """Get orders, units and revenue per product from the purchase ledger"""
+    try:
+        days = request.args.get('days', type=int)
+        product_id = request.args.get('product_id', type=int)
+        since = datetime.utcnow() - timedelta(days=days) if days else None
+        
+        return jsonify({
+            'success': True,
+            'data': sales_summary(since, product_id)
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
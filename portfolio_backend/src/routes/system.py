@@ -0,0 +1,60 @@
+from flask import Blueprint, Response, jsonify, current_app
+from src.services.cache import response_cache
+from src.services.view_counter import view_counter
+from src.services.replicas import replica_router
+from src.services.metrics import request_metrics, CONTENT_TYPE
+from src.services.query_monitor import query_monitor
+
+system_bp = Blueprint('system', __name__)
+
+@system_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get response cache hit/miss/eviction counters"""
+    return jsonify({
+        'success': True,
+        'data': response_cache.stats()
+    })
+
+@system_bp.route('/blog/views/stats', methods=['GET'])
+def get_view_counter_stats():
+    """Get write-behind blog view counter state"""
+    return jsonify({
+        'success': True,
+        'data': view_counter.stats()
+    })
+
+@system_bp.route('/db/pool', methods=['GET'])
+def get_pool_stats():
+    """Get database connection pool gauges and counters"""
+    metrics = current_app.extensions.get('db_pool_metrics')
+    if metrics is None:
+        return jsonify({
+            'success': False,
+            'error': 'Pool metrics are not configured'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': metrics.snapshot()
+    })
+
+@system_bp.route('/db/replicas', methods=['GET'])
+def get_replica_stats():
+    """Get read replica health, lag and routed read counts"""
+    return jsonify({
+        'success': True,
+        'data': replica_router.stats()
+    })
+
+@system_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Get request, SQL and pool metrics in Prometheus text format"""
+    return Response(request_metrics.render(), content_type=CONTENT_TYPE)
+
+@system_bp.route('/db/queries', methods=['GET'])
+def get_query_monitor_stats():
+    """Get recent slow queries and query budget violations"""
+    return jsonify({
+        'success': True,
+        'data': query_monitor.stats()
+    })
@@ -0,0 +1,38 @@
+from flask import Blueprint, request, jsonify
+from src.services.tags import tag_counts, TAG_KINDS, TAGGED_TYPES
+
+tags_bp = Blueprint('tags', __name__)
+
+@tags_bp.route('/tags', methods=['GET'])
+def get_tags():
+    """Get tag usage counts, optionally for one kind (tag, tech) or item type"""
+    try:
+        kind = request.args.get('kind')
+        item_type = request.args.get('type')
+        limit = request.args.get('limit', type=int)
+        
+        if kind and kind not in TAG_KINDS:
+            return jsonify({
+                'success': False,
+                'error': f'Unknown tag kind: {kind}'
+            }), 400
+        
+        if item_type and item_type not in TAGGED_TYPES:
+            return jsonify({
+                'success': False,
+                'error': f'Unknown item type: {item_type}'
+            }), 400
+        
+        tags = tag_counts(kind, item_type, limit)
+        
+        return jsonify({
+            'success': True,
+            'data': tags,
+            'count': len(tags)
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
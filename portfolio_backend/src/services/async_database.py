@@ -0,0 +1,96 @@
+"""Async database access for the ASGI entry point (``src/asgi.py``).
+
+``async_database.init_app(app)`` picks an async driver for the configured
+database: ``SQLALCHEMY_ASYNC_DATABASE_URI`` from ``ASYNC_DATABASE_URL`` if
+set, otherwise ``DATABASE_URL`` rewritten to ``sqlite+aiosqlite`` or
+``postgresql+asyncpg``. ``connect()`` creates the engine once the server's
+event loop is running. Pool options and SQLite pragmas are the same as for
+the sync engine (see ``config`` and ``services.database``).
+
+Only the handlers that run on the event loop use this engine. Everything
+else, including schema changes and partition DDL, stays on the sync
+engine. ``run_sync`` runs such calls in the loop's thread pool inside an
+application context.
+"""
+import asyncio
+import functools
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.config import async_database_uri, engine_options
+from src.models.version import CollectionVersion
+from src.services.database import configure_engine
+
+
+class AsyncDatabase:
+    """Async engine plus the few queries the event-loop handlers need"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.engine = None
+        self.pool_metrics = None
+        self._version_reads = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault(
+            'SQLALCHEMY_ASYNC_DATABASE_URI', async_database_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+        )
+        self.app = app
+        app.extensions['async_database'] = self
+
+    def connect(self):
+        """Create the engine; call from the serving event loop"""
+        if self.engine is not None:
+            return self.engine
+        uri = self.app.config['SQLALCHEMY_ASYNC_DATABASE_URI']
+        if not uri:
+            raise RuntimeError(
+                f'No async driver for {self.app.config["SQLALCHEMY_DATABASE_URI"]!r}; set ASYNC_DATABASE_URL'
+            )
+        self.engine = create_async_engine(uri, **engine_options(uri))
+        self.pool_metrics = configure_engine(self.app, self.engine.sync_engine, register=False)
+        return self.engine
+
+    async def dispose(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+
+    async def run_sync(self, func, *args):
+        """Run a blocking ``func(*args)`` in the loop's thread pool, inside an app context"""
+        def call():
+            with self.app.app_context():
+                return func(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(call))
+
+    async def collection_version(self, name):
+        """Async ``conditional.collection_version``: ``(version, updated_at)`` for ``name``
+
+        Concurrent calls for the same collection share one query, so a burst
+        of revalidations needs one pooled connection instead of one each.
+        """
+        pending = self._version_reads.get(name)
+        if pending is None:
+            pending = self._version_reads[name] = asyncio.ensure_future(self._read_version(name))
+            pending.add_done_callback(lambda _: self._version_reads.pop(name, None))
+        # Shielded so a client that disconnects does not cancel the query for the others
+        return await asyncio.shield(pending)
+
+    async def _read_version(self, name):
+        async with self.engine.connect() as connection:
+            row = (await connection.execute(
+                select(CollectionVersion.version, CollectionVersion.updated_at).where(CollectionVersion.name == name)
+            )).first()
+        return (row.version, row.updated_at) if row else (0, None)
+
+    async def insert_many(self, by_table):
+        """One executemany ``INSERT`` per table, all in a single transaction"""
+        async with self.engine.begin() as connection:
+            for table, rows in by_table.items():
+                await connection.execute(insert(table), rows)
+
+
+async_database = AsyncDatabase()
@@ -0,0 +1,287 @@
+"""Read-through response cache for the public content endpoints.
+
+Views opt in with ``@response_cache.cached('<namespace>')``. Entries are
+keyed on the namespace's current generation, the endpoint, its URL
+arguments and the normalized query string. Under ``@conditional`` the key
+also carries the collection version the ETag was built from. That version
+is shared through the database, so a write made by another worker is seen
+here too. Write handlers call
+``response_cache.invalidate('<namespace>')`` after committing, which bumps
+the generation so every older entry in that namespace is skipped and left
+to age out.
+
+Two backends are available through ``RESPONSE_CACHE_BACKEND``:
+
+``memory``  per-process LRU with TTL plus entry-count and byte-size limits
+``redis``   shared across gunicorn workers (needs the ``redis`` package and
+            ``RESPONSE_CACHE_REDIS_URL``)
+
+With the memory backend each worker invalidates only its own copy; other
+workers catch up within ``RESPONSE_CACHE_TTL`` seconds.
+
+Backends also remember when each namespace was last invalidated. A
+response built from replica reads (``g.db_replica_as_of``, see
+``replicas``) is only stored when the replica had caught up past that
+moment. Otherwise the write it lags behind would be cached under the new
+generation.
+"""
+import functools
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from flask import g, request, make_response
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+except ImportError:  # optional shared backend
+    redis = None
+
+
+class MemoryCacheBackend:
+    """Thread-safe LRU with per-entry TTL and entry/byte limits"""
+
+    def __init__(self, max_entries=1024, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._generations = {}
+        self._invalidated_at = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, value, size, ttl):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def generation(self, namespace):
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def bump(self, namespace):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._invalidated_at[namespace] = time.time()
+
+    def invalidated_at(self, namespace):
+        with self._lock:
+            return self._invalidated_at.get(namespace, 0.0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def info(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'evictions': self.evictions}
+
+    def _remove(self, key):
+        expires_at, size, value = self._entries.pop(key)
+        self._bytes -= size
+
+
+class RedisCacheBackend:
+    """Shared backend; eviction is left to Redis' own maxmemory policy"""
+
+    def __init__(self, url, prefix='portfolio:cache:'):
+        if redis is None:
+            raise RuntimeError('RESPONSE_CACHE_BACKEND=redis requires the redis package')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return pickle.loads(data) if data is not None else None
+
+    def set(self, key, value, size, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), px=int(ttl * 1000))
+
+    def generation(self, namespace):
+        return int(self.client.get(f'{self.prefix}gen:{namespace}') or 0)
+
+    def bump(self, namespace):
+        pipeline = self.client.pipeline()
+        pipeline.incr(f'{self.prefix}gen:{namespace}')
+        pipeline.set(f'{self.prefix}at:{namespace}', time.time())
+        pipeline.execute()
+
+    def invalidated_at(self, namespace):
+        return float(self.client.get(f'{self.prefix}at:{namespace}') or 0)
+
+    def clear(self):
+        for key in self.client.scan_iter(f'{self.prefix}*'):
+            self.client.delete(key)
+
+    def info(self):
+        stats = self.client.info('stats')
+        return {'evictions': stats.get('evicted_keys', 0)}
+
+
+class ResponseCache:
+    """Caches successful GET responses per namespace"""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.default_ttl = 60
+        self._counters = {'hits': 0, 'misses': 0, 'stores': 0, 'invalidations': 0, 'errors': 0}
+        self._counter_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_ENABLED', True)
+        app.config.setdefault('RESPONSE_CACHE_BACKEND', 'memory')
+        app.config.setdefault('RESPONSE_CACHE_TTL', 60)
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)
+        app.config.setdefault('RESPONSE_CACHE_REDIS_URL', None)
+
+        self.default_ttl = app.config['RESPONSE_CACHE_TTL']
+        app.extensions['response_cache'] = self
+        if not app.config['RESPONSE_CACHE_ENABLED']:
+            self.backend = None
+        elif app.config['RESPONSE_CACHE_BACKEND'] == 'redis':
+            self.backend = RedisCacheBackend(app.config['RESPONSE_CACHE_REDIS_URL'])
+        else:
+            self.backend = MemoryCacheBackend(
+                max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+                max_bytes=app.config['RESPONSE_CACHE_MAX_BYTES']
+            )
+
+    def cached(self, namespace, ttl=None):
+        """Decorate a GET view so its 200 responses are served from the cache"""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None or request.method != 'GET':
+                    return view(*args, **kwargs)
+
+                try:
+                    key = self._key(namespace)
+                    entry = self.backend.get(key)
+                except Exception:
+                    logger.exception('Response cache lookup failed')
+                    self._count('errors')
+                    return view(*args, **kwargs)
+
+                if entry is not None:
+                    self._count('hits')
+                    body, status, content_type = entry
+                    response = make_response(body, status)
+                    response.content_type = content_type
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self._count('misses')
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    body = response.get_data()
+                    try:
+                        if self._current(namespace):
+                            self.backend.set(key, (body, 200, response.content_type), len(body), ttl or self.default_ttl)
+                            self._count('stores')
+                    except Exception:
+                        logger.exception('Response cache store failed')
+                        self._count('errors')
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            # Read by the ASGI entry point, which serves hits without running the view
+            wrapper.cache_namespace = namespace
+            return wrapper
+        return decorator
+
+    def lookup(self, namespace, endpoint, view_args, arg_pairs, version=None):
+        """Cached ``(body, status, content_type)`` for a request described outside Flask, or None.
+
+        ``version`` is the collection version read for ``@conditional`` views.
+        Only hits are counted; a miss is counted by the view that runs next.
+        """
+        if self.backend is None:
+            return None
+        try:
+            entry = self.backend.get(self.key_for(namespace, endpoint, view_args, arg_pairs, version))
+        except Exception:
+            logger.exception('Response cache lookup failed')
+            self._count('errors')
+            return None
+        if entry is not None:
+            self._count('hits')
+        return entry
+
+    def invalidate(self, *namespaces):
+        """Drop every cached response in ``namespaces``"""
+        if self.backend is None:
+            return
+        for namespace in namespaces:
+            try:
+                self.backend.bump(namespace)
+                self._count('invalidations')
+            except Exception:
+                logger.exception('Response cache invalidation failed for %s', namespace)
+                self._count('errors')
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        with self._counter_lock:
+            stats = dict(self._counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['enabled'] = self.backend is not None
+        if self.backend is not None:
+            stats.update(self.backend.info())
+        return stats
+
+    def key_for(self, namespace, endpoint, view_args, arg_pairs, version=None):
+        """Cache key for ``endpoint`` with its URL arguments, ``(name, value)`` query pairs and collection version"""
+        args = urlencode(sorted(arg_pairs))
+        view_args = urlencode(sorted((view_args or {}).items()))
+        generation = self.backend.generation(namespace)
+        if version is not None:
+            generation = f'{generation}.v{version}'
+        return f'{namespace}:{generation}:{endpoint}:{view_args}:{args}'
+
+    def _current(self, namespace):
+        """False when this request read a replica that predates the namespace's last invalidation"""
+        as_of = g.get('db_replica_as_of')
+        return as_of is None or as_of >= self.backend.invalidated_at(namespace)
+
+    def _key(self, namespace):
+        arg_pairs = [(key, value) for key, values in request.args.lists() for value in values]
+        version = g.get('collection_versions', {}).get(namespace)
+        return self.key_for(namespace, request.endpoint, request.view_args, arg_pairs, version)
+
+    def _count(self, key, amount=1):
+        with self._counter_lock:
+            self._counters[key] += amount
+
+
+response_cache = ResponseCache()
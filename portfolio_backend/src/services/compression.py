@@ -0,0 +1,131 @@
+"""Response compression.
+
+``compressor.init_app(app)`` registers an ``after_request`` hook that
+compresses buffered responses of a compressible type once they exceed
+``COMPRESS_MIN_SIZE`` bytes. It uses brotli when the client accepts it
+and the ``brotli`` package is installed, and gzip otherwise. Streamed
+responses (exports, static files) are left alone: exports compress
+themselves through ``compress_stream``, and static files are served from
+precompressed siblings by ``static_files``.
+"""
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/javascript',
+    'application/x-ndjson',
+    'application/xml',
+    'image/svg+xml',
+    'text/css',
+    'text/csv',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+    'text/xml',
+}
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(encodings=None, accepted=None):
+    """Best of ``encodings`` (server preference order) the client accepts, or None
+
+    ``accepted`` defaults to the current request's parsed ``Accept-Encoding``.
+    """
+    if accepted is None:
+        accepted = request.accept_encodings
+    for encoding in encodings or available_encodings():
+        if accepted[encoding]:
+            return encoding
+    return None
+
+
+def compress(data, encoding, level=None):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5 if level is None else level)
+    compressor = zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of byte chunks incrementally"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=4)
+        for chunk in chunks:
+            compressed = compressor.process(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.finish()
+        return
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _add_vary(response):
+    response.vary.add('Accept-Encoding')
+
+
+class Compressor:
+    """Compresses eligible responses after the view has run"""
+
+    def __init__(self, app=None):
+        self.min_size = 1024
+        self.level = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_LEVEL', None)
+
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.level = app.config['COMPRESS_LEVEL']
+        app.extensions['compressor'] = self
+        if app.config['COMPRESS_ENABLED']:
+            app.after_request(self.after_request)
+
+    def after_request(self, response):
+        if (
+            response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES
+            or not 200 <= response.status_code < 300
+            or response.status_code == 204
+            or request.method == 'HEAD'
+        ):
+            return response
+
+        _add_vary(response)
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        encoding = negotiate_encoding()
+        if encoding is None:
+            return response
+
+        response.set_data(compress(data, encoding, self.level))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # The compressed bytes differ from the identity representation
+            response.set_etag(etag, weak=True)
+        return response
+
+
+compressor = Compressor()
@@ -0,0 +1,89 @@
+"""Conditional GET support for the content collections.
+
+Every write to a collection bumps its row in ``collection_version`` inside
+the same transaction. ``@conditional('<collection>')`` reads that one row
+(a primary-key lookup) before the view runs and answers a matching
+``If-None-Match`` or ``If-Modified-Since`` with ``304 Not Modified``, so the
+view's own queries and serialization are skipped entirely.
+
+The version it read is left in ``g.collection_versions`` for the response
+cache, which keys entries on it. A body cached by one worker is then never
+served under an ETag for a version another worker has since written.
+"""
+import functools
+from datetime import datetime, timezone
+
+from flask import Response, g, request, make_response
+from sqlalchemy import select, update
+
+from src.models.user import db
+from src.models.version import CollectionVersion
+
+COLLECTIONS = ('projects', 'blog', 'shop')
+
+
+def bump_collection_version(name):
+    """Record a change to ``name``; call before the handler commits"""
+    db.session.execute(
+        update(CollectionVersion)
+        .where(CollectionVersion.name == name)
+        .values(version=CollectionVersion.version + 1, updated_at=datetime.utcnow())
+    )
+
+
+def collection_version(name):
+    """Return ``(version, updated_at)`` for ``name``"""
+    row = db.session.execute(
+        select(CollectionVersion.version, CollectionVersion.updated_at).where(CollectionVersion.name == name)
+    ).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+
+def etag_for(collection, version, view_args):
+    """Strong ETag for a collection version and the view's URL arguments"""
+    return '-'.join([collection, str(version)] + [str(view_args[key]) for key in sorted(view_args)])
+
+
+def last_modified_for(updated_at):
+    return updated_at.replace(microsecond=0, tzinfo=timezone.utc) if updated_at else None
+
+
+def is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+    """True when the client's validators (parsed werkzeug values) match the current version"""
+    if if_none_match:
+        return if_none_match.contains_weak(etag)
+    return bool(last_modified and if_modified_since and last_modified <= if_modified_since)
+
+
+def _not_modified(etag, last_modified):
+    response = Response(status=304)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    return response
+
+
+def conditional(collection):
+    """Decorate a GET view with strong ETag / Last-Modified validation"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            version, updated_at = collection_version(collection)
+            g.setdefault('collection_versions', {})[collection] = version
+            etag = etag_for(collection, version, kwargs)
+            last_modified = last_modified_for(updated_at)
+
+            if is_not_modified(etag, last_modified, request.if_none_match, request.if_modified_since):
+                return _not_modified(etag, last_modified)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                if last_modified:
+                    response.last_modified = last_modified
+                response.headers.setdefault('Cache-Control', 'no-cache')
+            return response
+        # Read by the ASGI entry point, which answers revalidations without running the view
+        wrapper.conditional_collection = collection
+        return wrapper
+    return decorator
@@ -0,0 +1,92 @@
+"""Engine tuning and connection-pool metrics.
+
+``configure_engine`` runs once the Flask-SQLAlchemy engine exists. It
+installs the SQLite pragmas from ``SQLITE_PRAGMAS`` on every new DBAPI
+connection and attaches ``PoolMetrics`` listeners so ``/api/db/pool``
+can report connects, checkouts and invalidations alongside the pool's
+own size/checked-in/overflow gauges.
+"""
+import threading
+
+from sqlalchemy import event
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+class PoolMetrics:
+    """Counters fed by pool events; gauges read straight from the pool"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._counters = {
+            'connects': 0,
+            'checkouts': 0,
+            'checkins': 0,
+            'invalidations': 0,
+            'max_checked_out': 0,
+        }
+        self._checked_out = 0
+
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine.pool, 'checkout', self._on_checkout)
+        event.listen(engine.pool, 'checkin', self._on_checkin)
+        event.listen(engine.pool, 'invalidate', self._on_invalidate)
+
+    def snapshot(self):
+        pool = self.engine.pool
+        with self._lock:
+            stats = dict(self._counters)
+            stats['checked_out'] = self._checked_out
+        stats['pool_class'] = type(pool).__name__
+        for gauge in ('size', 'checkedin', 'overflow'):
+            reader = getattr(pool, gauge, None)
+            if callable(reader):
+                stats[f'pool_{gauge}'] = reader()
+        stats['status'] = pool.status()
+        return stats
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._counters['connects'] += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self._counters['checkouts'] += 1
+            self._checked_out += 1
+            self._counters['max_checked_out'] = max(self._counters['max_checked_out'], self._checked_out)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self._counters['checkins'] += 1
+            self._checked_out = max(self._checked_out - 1, 0)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self._counters['invalidations'] += 1
+
+
+def configure_engine(app, engine, register=True):
+    """Install SQLite pragmas and pool metrics on ``engine``; returns the metrics
+
+    Only the primary engine is registered as ``db_pool_metrics``; replica
+    engines keep their metrics on the replica router.
+    """
+    if engine.dialect.name == 'sqlite':
+        pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+    metrics = PoolMetrics(engine)
+    if register:
+        app.extensions['db_pool_metrics'] = metrics
+    return metrics
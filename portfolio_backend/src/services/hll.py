@@ -0,0 +1,127 @@
+"""HyperLogLog sketches for approximate distinct counts.
+
+A sketch with precision ``p`` keeps ``m = 2**p`` one-byte registers and
+estimates cardinality with a relative standard error of ``1.04 / sqrt(m)``:
+
+    p=10  ~3.25%    p=12  ~1.63%    p=14  ~0.81%    p=16  ~0.41%
+
+Roughly 95% of estimates land within two standard errors of the true
+count. Sketches are mergeable (register-wise max), so per-hour or per-day
+sketches can be combined into any window. Sketches of different precision
+are merged by folding the finer one down to the coarser precision.
+"""
+import hashlib
+import math
+import struct
+
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+
+_DENSE = 0
+_SPARSE = 1
+_POWERS = [2.0 ** -rank for rank in range(65)]
+
+
+def relative_error(precision):
+    """Relative standard error of a sketch with ``precision``"""
+    return 1.04 / math.sqrt(1 << precision)
+
+
+def _hash64(value):
+    if not isinstance(value, bytes):
+        value = str(value).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch"""
+
+    def __init__(self, precision=12, registers=None):
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(f'HyperLogLog precision must be between {MIN_PRECISION} and {MAX_PRECISION}')
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+        if len(self.registers) != self.m:
+            raise ValueError('Register count does not match precision')
+
+    def __len__(self):
+        return self.count()
+
+    def add(self, value):
+        if value is None:
+            return
+        hashed = _hash64(value)
+        width = 64 - self.precision
+        index = hashed >> width
+        rank = width - (hashed & ((1 << width) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        """Fold ``other`` into this sketch in place"""
+        if other.precision > self.precision:
+            other = other.fold(self.precision)
+        elif other.precision < self.precision:
+            folded = self.fold(other.precision)
+            self.precision, self.m, self.registers = folded.precision, folded.m, folded.registers
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def fold(self, precision):
+        """Return a copy of this sketch reduced to a coarser ``precision``"""
+        if precision > self.precision:
+            raise ValueError('Cannot fold a sketch to a finer precision')
+        if precision == self.precision:
+            return HyperLogLog(self.precision, self.registers)
+
+        shift = self.precision - precision
+        low_mask = (1 << shift) - 1
+        folded = bytearray(1 << precision)
+        for index, rank in enumerate(self.registers):
+            if not rank:
+                continue
+            # The dropped index bits become the leading bits of the hash suffix
+            low = index & low_mask
+            new_rank = shift - low.bit_length() + 1 if low else shift + rank
+            target = index >> shift
+            if new_rank > folded[target]:
+                folded[target] = new_rank
+        return HyperLogLog(precision, folded)
+
+    def count(self):
+        m = self.m
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+
+        estimate = alpha * m * m / sum(map(_POWERS.__getitem__, self.registers))
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        """Serialize, using a sparse (index, rank) encoding when it is smaller"""
+        filled = [(index, rank) for index, rank in enumerate(self.registers) if rank]
+        if len(filled) * 3 < self.m:
+            body = b''.join(struct.pack('>HB', index, rank) for index, rank in filled)
+            return bytes([self.precision, _SPARSE]) + body
+        return bytes([self.precision, _DENSE]) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        precision, encoding = data[0], data[1]
+        if encoding == _DENSE:
+            return cls(precision, data[2:])
+        sketch = cls(precision)
+        for index, rank in struct.iter_unpack('>HB', data[2:]):
+            sketch.registers[index] = rank
+        return sketch
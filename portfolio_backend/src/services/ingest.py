@@ -0,0 +1,465 @@
+"""Buffered ingestion for analytics events.
+
+The tracking endpoints hand rows to ``ingest_queue`` and return straight
+away. A background worker drains the queue and writes each batch with a
+single executemany ``INSERT`` per model, so a burst of beacons costs one
+commit instead of one commit per event. Rows are routed to their month's
+partition table (see ``partitions``) when they are queued.
+
+Flushes leave the ``analytics`` response cache alone. Under traffic they
+run about once a second, and invalidating each time would mean the
+dashboard cache never hits. Cached totals age out after
+``STATS_CACHE_TTL`` seconds, and ``RollupCompactor`` invalidates them when
+it advances the rollups.
+
+``AsyncIngestBuffer`` does the same on an asyncio event loop for the ASGI
+entry point, writing through ``services.async_database``.
+"""
+import asyncio
+import atexit
+import json
+import logging
+import queue
+import threading
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from src.models.user import db
+from src.services.partitions import partition_for, partition_rows
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_REQUIRED_FIELDS = {
+    'pageview': ['page_url'],
+    'interaction': ['event_type', 'page_url']
+}
+
+
+class IngestQueueFull(Exception):
+    """Raised when the ingest buffer is at capacity and the event was dropped."""
+
+
+class InvalidEvent(ValueError):
+    """Raised when a tracking payload has a missing or wrongly typed field."""
+
+
+def _text(data, field, required=False):
+    """A string field from a beacon; numbers are coerced, anything else is rejected"""
+    value = data.get(field)
+    if value is None or value == '':
+        if required:
+            raise InvalidEvent(f'Missing required field: {field}')
+        return None if value is None else value
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise InvalidEvent(f'Field {field} must be a string')
+    return value if isinstance(value, str) else str(value)
+
+
+def _seconds(data, field):
+    """A whole number of seconds from a beacon, accepting numeric strings"""
+    value = data.get(field)
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise InvalidEvent(f'Field {field} must be a number')
+    try:
+        return value if isinstance(value, int) else int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        raise InvalidEvent(f'Field {field} must be a number')
+
+
+def pageview_row(data, ip_address=None, user_agent=None):
+    """Build a PageView insert row from a tracking payload; raises ``InvalidEvent``"""
+    return {
+        'page_url': _text(data, 'page_url', required=True),
+        'page_title': _text(data, 'page_title'),
+        'referrer': _text(data, 'referrer'),
+        'user_agent': user_agent,
+        'ip_address': ip_address,
+        'session_id': _text(data, 'session_id'),
+        'device_type': _text(data, 'device_type'),
+        'browser': _text(data, 'browser'),
+        'os': _text(data, 'os'),
+        'country': _text(data, 'country'),
+        'city': _text(data, 'city'),
+        'duration': _seconds(data, 'duration'),
+        'created_at': datetime.utcnow()
+    }
+
+
+def interaction_row(data, ip_address=None):
+    """Build an Interaction insert row from a tracking payload; raises ``InvalidEvent``"""
+    metadata = data.get('metadata', {})
+    if metadata is not None and not isinstance(metadata, (dict, list)):
+        raise InvalidEvent('Field metadata must be an object')
+    return {
+        'event_type': _text(data, 'event_type', required=True),
+        'element_id': _text(data, 'element_id'),
+        'element_class': _text(data, 'element_class'),
+        'element_text': _text(data, 'element_text'),
+        'page_url': _text(data, 'page_url', required=True),
+        'session_id': _text(data, 'session_id'),
+        'ip_address': ip_address,
+        'extra_data': json.dumps(metadata if metadata is not None else {}),
+        'created_at': datetime.utcnow()
+    }
+
+
+def parse_batch_body(body, mimetype):
+    """Decode a batch body as a JSON array or newline-delimited JSON; None if malformed"""
+    if not body.strip():
+        return []
+
+    if mimetype != 'application/x-ndjson':
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        if isinstance(payload, list):
+            return payload
+        if isinstance(payload, dict):
+            return payload.get('events') if isinstance(payload.get('events'), list) else None
+
+    events = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            # Keep the slot so per-event results line up with the input
+            events.append(None)
+    return events
+
+
+def split_batch(events, ip_address=None, user_agent=None):
+    """Validate batch events in one pass; returns ``(pageview_rows, interaction_rows, results)``"""
+    pageview_rows = []
+    interaction_rows = []
+    results = []
+    for index, event in enumerate(events):
+        if not isinstance(event, dict):
+            results.append({'index': index, 'status': 'rejected', 'error': 'Event must be a JSON object'})
+            continue
+
+        event_type = event.get('type') or ('interaction' if 'event_type' in event else 'pageview')
+        if not isinstance(event_type, str):
+            results.append({'index': index, 'status': 'rejected', 'error': 'Field type must be a string'})
+            continue
+        if event_type not in BATCH_REQUIRED_FIELDS:
+            results.append({'index': index, 'status': 'rejected', 'error': f'Unknown event type: {event_type}'})
+            continue
+
+        missing = [field for field in BATCH_REQUIRED_FIELDS[event_type] if not event.get(field)]
+        if missing:
+            results.append({'index': index, 'status': 'rejected', 'error': f'Missing required field: {missing[0]}'})
+            continue
+
+        try:
+            if event_type == 'pageview':
+                row = pageview_row(event, ip_address, user_agent)
+            else:
+                row = interaction_row(event, ip_address)
+        except InvalidEvent as e:
+            results.append({'index': index, 'status': 'rejected', 'error': str(e)})
+            continue
+
+        (pageview_rows if event_type == 'pageview' else interaction_rows).append(row)
+        results.append({'index': index, 'status': 'accepted', 'type': event_type})
+    return pageview_rows, interaction_rows, results
+
+
+def group_rows(batch):
+    """``[(key, row)]`` pairs as ``{key: rows}``, keeping arrival order within each key"""
+    grouped = {}
+    for key, row in batch:
+        grouped.setdefault(key, []).append(row)
+    return grouped
+
+
+class IngestQueue:
+    """Bounded in-memory queue flushed to the database in bulk.
+
+    A flush is triggered when ``ANALYTICS_INGEST_BATCH_SIZE`` events are
+    waiting or every ``ANALYTICS_INGEST_FLUSH_INTERVAL`` seconds, whichever
+    comes first. When the queue is full ``enqueue`` blocks for at most
+    ``ANALYTICS_INGEST_PUT_TIMEOUT`` seconds and then raises
+    ``IngestQueueFull`` so the caller can shed load.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = None
+        self._worker = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'flushed': 0,
+            'dropped': 0,
+            'failed': 0,
+            'batches': 0
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ANALYTICS_INGEST_ENABLED', True)
+        app.config.setdefault('ANALYTICS_INGEST_MAX_QUEUE', 10000)
+        app.config.setdefault('ANALYTICS_INGEST_BATCH_SIZE', 500)
+        app.config.setdefault('ANALYTICS_INGEST_FLUSH_INTERVAL', 1.0)
+        app.config.setdefault('ANALYTICS_INGEST_PUT_TIMEOUT', 0.05)
+
+        self.app = app
+        self.enabled = app.config['ANALYTICS_INGEST_ENABLED']
+        self.batch_size = app.config['ANALYTICS_INGEST_BATCH_SIZE']
+        self.flush_interval = app.config['ANALYTICS_INGEST_FLUSH_INTERVAL']
+        self.put_timeout = app.config['ANALYTICS_INGEST_PUT_TIMEOUT']
+        self._queue = queue.Queue(maxsize=app.config['ANALYTICS_INGEST_MAX_QUEUE'])
+        app.extensions['analytics_ingest'] = self
+
+        if self.enabled:
+            self.start()
+            atexit.register(self.stop)
+
+    def start(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._stopping.clear()
+        self._worker = threading.Thread(target=self._run, name='analytics-ingest', daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        """Stop the worker and flush whatever is still buffered"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join(timeout=max(self.flush_interval * 2, 5))
+            self._worker = None
+        self.flush()
+
+    def enqueue(self, model, row):
+        """Queue one row for ``model``; writes through when the worker is disabled"""
+        table = partition_for(model, row.get('created_at'))
+        if not self.enabled:
+            self._write(table, [row])
+            return
+
+        try:
+            self._queue.put((table, row), timeout=self.put_timeout)
+        except queue.Full:
+            self._count('dropped')
+            raise IngestQueueFull('Analytics ingest queue is full')
+
+        self._count('enqueued')
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Drain the queue, writing one bulk INSERT per table per batch"""
+        if self._queue is None:
+            return 0
+
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._drain(self.batch_size)
+                if not batch:
+                    break
+                flushed, failed = self._write_batch(batch)
+                if failed:
+                    logger.error('Dropped %d of %d analytics events that failed to insert', failed, len(batch))
+                    self._count('failed', failed)
+                if flushed:
+                    self._count('flushed', flushed)
+                    self._count('batches')
+                written += flushed
+        return written
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize() if self._queue is not None else 0
+        stats['capacity'] = self._queue.maxsize if self._queue is not None else 0
+        stats['running'] = self._worker is not None and self._worker.is_alive()
+        return stats
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch):
+        """Write ``[(table, row)]`` pairs, halving the batch on failure; returns ``(flushed, failed)``
+
+        One bad row then costs about log2(batch) extra transactions and only
+        itself is dropped, instead of the whole batch.
+        """
+        try:
+            self._write_many(group_rows(batch))
+            return len(batch), 0
+        except Exception:
+            if len(batch) == 1:
+                logger.warning('Analytics event failed to insert: %r', batch[0][1], exc_info=True)
+                return 0, 1
+        middle = len(batch) // 2
+        first = self._write_batch(batch[:middle])
+        second = self._write_batch(batch[middle:])
+        return first[0] + second[0], first[1] + second[1]
+
+    def _write(self, table, rows):
+        self._write_many({table: rows})
+
+    def _write_many(self, by_table):
+        with self.app.app_context():
+            try:
+                for table, rows in by_table.items():
+                    db.session.execute(insert(table), rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+
+class AsyncIngestBuffer:
+    """Event-loop counterpart of ``IngestQueue``, configured by the same keys.
+
+    ``put`` never waits: when ``ANALYTICS_INGEST_MAX_QUEUE`` events are
+    buffered it raises ``IngestQueueFull`` at once, since blocking would
+    stall every request on the loop. A flusher task writes batches through
+    the async engine. Partition routing happens per batch in the thread
+    pool, because it may create tables through the sync engine.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self._queue = None
+        self._task = None
+        self._wakeup = None
+        self._stopping = False
+        self._stats = {
+            'enqueued': 0,
+            'flushed': 0,
+            'dropped': 0,
+            'failed': 0,
+            'batches': 0
+        }
+
+    def start(self, app):
+        """Create the buffer and its flusher task; call from the serving event loop"""
+        if self._queue is not None:
+            return
+        self.enabled = app.config['ANALYTICS_INGEST_ENABLED']
+        self.batch_size = app.config['ANALYTICS_INGEST_BATCH_SIZE']
+        self.flush_interval = app.config['ANALYTICS_INGEST_FLUSH_INTERVAL']
+        self._queue = asyncio.Queue(maxsize=app.config['ANALYTICS_INGEST_MAX_QUEUE'])
+        self._wakeup = asyncio.Event()
+        if self.enabled:
+            self._task = asyncio.create_task(self._run(), name='analytics-ingest')
+
+    async def stop(self):
+        """Let the flusher finish its current batch, then write whatever is still buffered"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def put(self, model, row):
+        """Buffer one row for ``model``; writes through when ingest is disabled"""
+        if not self.enabled:
+            await write_rows(self.database, {model: [row]})
+            return
+
+        try:
+            self._queue.put_nowait((model, row))
+        except asyncio.QueueFull:
+            self._stats['dropped'] += 1
+            raise IngestQueueFull('Analytics ingest queue is full')
+
+        self._stats['enqueued'] += 1
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        """Drain the buffer, one transaction per batch"""
+        if self._queue is None:
+            return 0
+
+        written = 0
+        while not self._queue.empty():
+            batch = [self._queue.get_nowait() for _ in range(min(self.batch_size, self._queue.qsize()))]
+            flushed, failed = await self._write_batch(batch)
+            if failed:
+                logger.error('Dropped %d of %d analytics events that failed to insert', failed, len(batch))
+                self._stats['failed'] += failed
+            if flushed:
+                self._stats['flushed'] += flushed
+                self._stats['batches'] += 1
+            written += flushed
+        return written
+
+    async def _write_batch(self, batch):
+        """Write ``[(model, row)]`` pairs, halving the batch on failure like ``IngestQueue``"""
+        try:
+            await write_rows(self.database, group_rows(batch))
+            return len(batch), 0
+        except Exception:
+            if len(batch) == 1:
+                logger.warning('Analytics event failed to insert: %r', batch[0][1], exc_info=True)
+                return 0, 1
+        middle = len(batch) // 2
+        first = await self._write_batch(batch[:middle])
+        second = await self._write_batch(batch[middle:])
+        return first[0] + second[0], first[1] + second[1]
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['queued'] = self._queue.qsize() if self._queue is not None else 0
+        stats['capacity'] = self._queue.maxsize if self._queue is not None else 0
+        stats['running'] = self._task is not None and not self._task.done()
+        return stats
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+
+async def write_rows(database, by_model):
+    """Insert ``{model: rows}`` through the async engine in one transaction"""
+    def route():
+        by_table = {}
+        for model, rows in by_model.items():
+            by_table.update(partition_rows(model, rows))
+        return by_table
+
+    # Partition DDL runs first, on the sync engine, before the insert takes the write lock
+    by_table = await database.run_sync(route)
+    await database.insert_many(by_table)
+
+
+ingest_queue = IngestQueue()
@@ -0,0 +1,276 @@
+"""Request, SQL and serialization metrics in Prometheus text format.
+
+``request_metrics.init_app`` times every request between ``before_request``
+and the last ``after_request`` hook, so compressed sizes are the ones on the
+wire. It also records, labelled by blueprint and endpoint (the URL rule's
+view name, never the raw path):
+
+``http_request_duration_seconds``        latency histogram
+``http_requests_total``                  count by method and status
+``http_response_size_bytes``             histogram of bodies with a known length
+``http_request_sql_queries``              histogram of statements per request
+``http_request_sql_duration_seconds``    histogram of SQL time per request
+``http_serialization_duration_seconds``  histogram of JSON encoding time per request
+
+SQL statements are timed with ``before/after_cursor_execute`` listeners on
+every ``Engine``, including the read replicas and the background workers.
+Statements outside a request only feed ``db_statement_duration_seconds``,
+which is labelled by operation (SELECT, INSERT, ...). JSON encoding is timed
+in ``serialization.json_response`` and in the app's JSON provider, which is
+what ``jsonify`` uses.
+
+Per-request state lives in ``g`` and needs no locking. Each finished
+request takes the registry lock once to fold its numbers in, and each SQL
+statement takes it once more, so the overhead is a few microseconds.
+``GET /api/metrics`` renders the registry.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+POOL_COUNTERS = ('connects', 'checkouts', 'checkins', 'invalidations')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Cumulative-on-render histogram with fixed upper bounds"""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricFamily:
+    """One metric name and its labelled children"""
+
+    def __init__(self, name, kind, help_text, labelnames, bounds=None):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.labelnames = labelnames
+        self.bounds = bounds
+        self.children = {}
+
+    def child(self, labels):
+        child = self.children.get(labels)
+        if child is None:
+            child = Histogram(self.bounds) if self.kind == 'histogram' else [0]
+            self.children[labels] = child
+        return child
+
+    def render(self, lines):
+        lines.append(f'# HELP {self.name} {self.help}')
+        lines.append(f'# TYPE {self.name} {self.kind}')
+        for labels, child in sorted(self.children.items()):
+            pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+            if self.kind != 'histogram':
+                lines.append(f'{self.name}{_labels(pairs)} {_number(child[0])}')
+                continue
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float('inf'),), child.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _number(bound)
+                bucket_pairs = pairs + [f'le="{le}"']
+                lines.append(f'{self.name}_bucket{_labels(bucket_pairs)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(pairs)} {_number(child.sum)}')
+            lines.append(f'{self.name}_count{_labels(pairs)} {child.count}')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _operation(statement):
+    word = statement.lstrip()[:8].split(None, 1)
+    return word[0].upper() if word else 'OTHER'
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """``jsonify`` provider that reports its encoding time to ``request_metrics``"""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            record_serialization(time.perf_counter() - started)
+
+
+def record_serialization(seconds):
+    """Add ``seconds`` of JSON encoding to the current request's total"""
+    if has_request_context() and 'metrics_started' in g:
+        g.metrics_serialize_time += seconds
+
+
+class RequestMetrics:
+    """Registry plus the Flask hooks and engine listeners that fill it"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._families = {}
+        self._collectors = []
+        self._in_flight = 0
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_LATENCY_BUCKETS', LATENCY_BUCKETS)
+
+        self.app = app
+        self.enabled = app.config['METRICS_ENABLED']
+        latency = tuple(app.config['METRICS_LATENCY_BUCKETS'])
+        route = ('blueprint', 'endpoint')
+        self._families = {
+            family.name: family for family in (
+                MetricFamily('http_request_duration_seconds', 'histogram',
+                             'Time from before_request to the last after_request hook.', route + ('method',), latency),
+                MetricFamily('http_requests_total', 'counter',
+                             'Requests handled.', route + ('method', 'status')),
+                MetricFamily('http_response_size_bytes', 'histogram',
+                             'Response body size as sent, for bodies with a known length.', route, SIZE_BUCKETS),
+                MetricFamily('http_request_sql_queries', 'histogram',
+                             'SQL statements executed per request.', route, QUERY_COUNT_BUCKETS),
+                MetricFamily('http_request_sql_duration_seconds', 'histogram',
+                             'Total SQL execution time per request.', route, latency),
+                MetricFamily('http_serialization_duration_seconds', 'histogram',
+                             'Total JSON encoding time per request.', route, latency),
+                MetricFamily('db_statement_duration_seconds', 'histogram',
+                             'Execution time of each SQL statement.', ('operation',), latency),
+            )
+        }
+        app.extensions['request_metrics'] = self
+        self._collectors = [self._pool_gauges]
+        if not self.enabled:
+            return
+
+        app.json = TimedJSONProvider(app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._listening = True
+
+    def add_collector(self, collector):
+        """Register ``collector()`` returning ``[(name, kind, help, value)]`` gauges read at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self):
+        """The whole registry in Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for family in self._families.values():
+                if family.children:
+                    family.render(lines)
+            in_flight = self._in_flight
+        lines.append('# HELP http_requests_in_flight Requests currently being handled.')
+        lines.append('# TYPE http_requests_in_flight gauge')
+        lines.append(f'http_requests_in_flight {in_flight}')
+        for collector in self._collectors:
+            for name, kind, help_text, value in collector():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.append(f'{name} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def observe(self, blueprint, endpoint, method, status, elapsed, size=None):
+        """Record a request answered outside Flask (the ASGI entry point's event-loop handlers)"""
+        if not self.enabled:
+            return
+        route = (blueprint, endpoint)
+        families = self._families
+        with self._lock:
+            families['http_request_duration_seconds'].child(route + (method,)).observe(elapsed)
+            families['http_requests_total'].child(route + (method, str(status)))[0] += 1
+            if size is not None:
+                families['http_response_size_bytes'].child(route).observe(size)
+
+    def _pool_gauges(self):
+        metrics = self.app.extensions.get('db_pool_metrics')
+        if metrics is None:
+            return []
+        snapshot = metrics.snapshot()
+        gauges = []
+        for key, value in snapshot.items():
+            if not isinstance(value, int) or isinstance(value, bool):
+                continue
+            if key in POOL_COUNTERS:
+                gauges.append((f'db_pool_{key}_total', 'counter', f'Primary pool {key} since startup.', value))
+            else:
+                gauges.append((f'db_pool_{key}', 'gauge', f'Primary pool {key.replace("_", " ")}.', value))
+        return gauges
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql_count = 0
+        g.metrics_sql_time = 0.0
+        g.metrics_serialize_time = 0.0
+        with self._lock:
+            self._in_flight += 1
+
+    def _after_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        route = (request.blueprint or 'app', request.endpoint or 'none')
+        size = response.content_length if not response.is_streamed else None
+        families = self._families
+        with self._lock:
+            self._in_flight -= 1
+            families['http_request_duration_seconds'].child(route + (request.method,)).observe(elapsed)
+            families['http_requests_total'].child(route + (request.method, str(response.status_code)))[0] += 1
+            if size is not None:
+                families['http_response_size_bytes'].child(route).observe(size)
+            families['http_request_sql_queries'].child(route).observe(g.metrics_sql_count)
+            families['http_request_sql_duration_seconds'].child(route).observe(g.metrics_sql_time)
+            families['http_serialization_duration_seconds'].child(route).observe(g.metrics_serialize_time)
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('metrics_query_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        if has_request_context() and 'metrics_started' in g:
+            g.metrics_sql_count += 1
+            g.metrics_sql_time += elapsed
+        with self._lock:
+            self._families['db_statement_duration_seconds'].child((_operation(statement),)).observe(elapsed)
+
+
+request_metrics = RequestMetrics()
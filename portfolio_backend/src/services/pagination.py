@@ -0,0 +1,137 @@
+"""Keyset (cursor) pagination for the list endpoints.
+
+Instead of ``OFFSET`` the next page is selected with a range predicate on
+the sort columns, so page 1000 costs the same index seek as page one. The
+cursor handed to clients is an opaque base64 token holding the sort key
+values of the last row returned plus the name of the ordering it belongs to.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import and_, false, or_, tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor cannot be decoded or belongs to another ordering."""
+
+
+class SortKey:
+    """One column of a keyset ordering"""
+
+    def __init__(self, column, descending=False, nulls_last=False):
+        self.column = column
+        self.descending = descending
+        self.nulls_last = nulls_last
+
+    def order_by(self):
+        clause = self.column.desc() if self.descending else self.column.asc()
+        return clause.nullslast() if self.nulls_last else clause
+
+    def after(self, value):
+        """Non-NULL rows strictly after ``value`` in this column's order"""
+        if value is None:
+            # NULLs sort last, so nothing comes after them in this column
+            return false()
+        return self.column < value if self.descending else self.column > value
+
+    def equals(self, value):
+        return self.column.is_(None) if value is None else self.column == value
+
+
+def page_size():
+    """Requested ``limit`` clamped to the configured maximum page size"""
+    default = current_app.config.get('PAGINATION_DEFAULT_SIZE', DEFAULT_PAGE_SIZE)
+    maximum = current_app.config.get('PAGINATION_MAX_SIZE', MAX_PAGE_SIZE)
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, maximum))
+
+
+def encode_cursor(name, values):
+    payload = json.dumps({'k': name, 'v': [_encode_value(value) for value in values]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(name, token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = [_decode_value(value) for value in payload['v']]
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise InvalidCursor('Malformed cursor')
+    if payload.get('k') != name:
+        raise InvalidCursor('Cursor does not match the requested ordering')
+    return values
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def keyset_filter(keys, values):
+    """Predicate selecting rows that sort after ``values`` under ``keys``.
+
+    When the leading key is ``nulls_last`` and its cursor value is not NULL
+    the predicate only covers the non-NULL rows; ``paginate`` continues into
+    the NULL section with a second seek so neither needs an OR.
+    """
+    if len(values) != len(keys):
+        raise InvalidCursor('Cursor does not match the requested ordering')
+
+    lead = keys[0]
+    if lead.nulls_last and values[0] is None:
+        # Already inside the trailing NULL section of the leading column
+        return and_(lead.column.is_(None), keyset_filter(keys[1:], values[1:]))
+
+    uniform = len({key.descending for key in keys}) == 1
+    if uniform and None not in values and not any(key.nulls_last for key in keys[1:]):
+        # A single row-value comparison lets SQLite seek straight into the index
+        columns = tuple_(*(key.column for key in keys))
+        bound = tuple_(*values)
+        return columns < bound if lead.descending else columns > bound
+
+    clauses = []
+    for index, key in enumerate(keys):
+        prefix = [keys[i].equals(values[i]) for i in range(index)]
+        clauses.append(and_(*prefix, key.after(values[index])))
+    return or_(*clauses)
+
+
+def paginate(query, name, keys, cursor=None, limit=None):
+    """Apply keyset ordering and paging to ``query``.
+
+    ``keys`` must end in a unique column (normally the primary key) so the
+    ordering is total. Returns ``(rows, next_cursor)``; ``next_cursor`` is
+    None on the last page.
+    """
+    limit = limit or page_size()
+    ordered = query.order_by(*(key.order_by() for key in keys))
+
+    if not cursor:
+        rows = ordered.limit(limit + 1).all()
+    else:
+        values = decode_cursor(name, cursor)
+        rows = ordered.filter(keyset_filter(keys, values)).limit(limit + 1).all()
+        if keys[0].nulls_last and values[0] is not None and len(rows) <= limit:
+            # Ran off the end of the non-NULL rows; continue into the NULLs that sort after them
+            rows += ordered.filter(keys[0].column.is_(None)).limit(limit + 1 - len(rows)).all()
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(name, [getattr(last, key.column.key) for key in keys])
@@ -0,0 +1,393 @@
+"""Monthly partitions for PageView and Interaction.
+
+Raw analytics rows live in one table per calendar month, named after the
+model's table: ``page_view_p202610``, ``interaction_p202610`` and so on.
+The mapped ``page_view``/``interaction`` tables stay as the schema template
+and as the empty source used when a window has no partitions.
+
+Writers call ``partition_rows`` (or ``partition_for`` for a single row) to
+route rows to their month's table. Missing tables are created on first use,
+with the template's columns and indexes. Readers call ``partition_source``
+with the requested date window. It returns an ORM alias over only the
+months that overlap the window: the month's table itself, or a UNION ALL
+when the window spans several months.
+
+Each partition's ids start at ``yyyymm * 10**9``, so ids stay unique across
+months and never collide with rows from before partitioning.
+
+Expiring a month drops its table instead of DELETE-ing its rows one by one.
+The month can be copied to a standalone SQLite file in
+``ANALYTICS_ARCHIVE_DIR`` first. The copy is written to a temporary file
+and only moved into place once its row count matches the table. An
+existing archive is never overwritten, so a rerun or a concurrent worker
+cannot destroy the only copy of a month that is already dropped. ``apply_retention`` does this for every
+month older than ``ANALYTICS_RETENTION_MONTHS``, but only once the rollups
+cover it, so dashboard totals survive the raw rows. The rollup compactor
+runs it after every compaction, and ``flask --app src.main analytics
+partitions ...`` lists, compacts and archives partitions by hand.
+
+The list of partitions is cached per process. A statement that fails
+because another process dropped one of them clears the cache, so only
+that one request fails and the next one reads the current tables.
+"""
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import Column, Identity, Index, MetaData, Table, event, func, inspect, insert, select, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import aliased
+
+from src.models.analytics import PageView, Interaction
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_MODELS = (PageView, Interaction)
+
+# Ids in a partition start at yyyymm * ID_SPAN, leaving room for a billion rows a month
+ID_SPAN = 10 ** 9
+
+partition_metadata = MetaData()
+
+_catalog = {}
+_catalog_lock = threading.Lock()
+
+# Driver errors for a missing table (SQLite, PostgreSQL/MySQL) and partition names inside them
+MISSING_TABLE = re.compile(r"no such table|does not exist|doesn't exist", re.IGNORECASE)
+PARTITION_NAME = re.compile(
+    r'\b(?:%s)_p\d{6}\b' % '|'.join(re.escape(model.__tablename__) for model in PARTITIONED_MODELS)
+)
+
+
+class ArchiveConflict(RuntimeError):
+    """Raised when an archive file already exists and does not match the partition."""
+
+
+def month_start(value):
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def parse_month(value):
+    """``YYYY-MM`` to the first instant of that month"""
+    return datetime.strptime(value, '%Y-%m')
+
+
+def partition_name(model, month):
+    return f'{model.__tablename__}_p{month:%Y%m}'
+
+
+def _name_pattern(model):
+    return re.compile(rf'^{re.escape(model.__tablename__)}_p(\d{{4}})(\d{{2}})$')
+
+
+def partition_table(model, month):
+    """``Table`` for ``model``'s partition of ``month``, built from the mapped table"""
+    name = partition_name(model, month)
+    if name in partition_metadata.tables:
+        return partition_metadata.tables[name]
+
+    template = model.__table__
+    seed = int(f'{month:%Y%m}') * ID_SPAN
+    columns = []
+    for column in template.columns:
+        if column.primary_key:
+            # SQLite honours sqlite_sequence below; other backends use the identity start
+            columns.append(Column(column.name, column.type, Identity(start=seed), primary_key=True))
+        else:
+            columns.append(column._copy())
+    table = Table(name, partition_metadata, *columns, sqlite_autoincrement=True)
+    for index in template.indexes:
+        Index(
+            index.name.replace(template.name, name, 1),
+            *(table.c[column.name] for column in index.columns)
+        )
+    return table
+
+
+def create_partition(connection, model, month):
+    """Create ``month``'s partition on ``connection`` if it is missing; returns the table"""
+    table = partition_table(model, month)
+    if inspect(connection).has_table(table.name):
+        return table
+    table.create(connection)
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql(
+            'INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)',
+            (table.name, int(f'{month:%Y%m}') * ID_SPAN)
+        )
+    logger.info('Created analytics partition %s', table.name)
+    return table
+
+
+def partition_months(model):
+    """Sorted months that have a partition, cached for ``ANALYTICS_PARTITION_CATALOG_TTL`` seconds"""
+    ttl = current_app.config.get('ANALYTICS_PARTITION_CATALOG_TTL', 60)
+    key = (id(db.engine), model.__tablename__)
+    with _catalog_lock:
+        cached = _catalog.get(key)
+        if cached is not None and time.monotonic() - cached[0] < ttl:
+            return cached[1]
+
+    pattern = _name_pattern(model)
+    months = sorted(
+        datetime(int(match.group(1)), int(match.group(2)), 1)
+        for match in map(pattern.match, inspect(db.engine).get_table_names())
+        if match
+    )
+    with _catalog_lock:
+        _catalog[key] = (time.monotonic(), months)
+    return months
+
+
+def forget_partitions():
+    """Drop the cached partition lists after creating or dropping tables"""
+    with _catalog_lock:
+        _catalog.clear()
+
+
+@event.listens_for(Engine, 'handle_error')
+def _forget_missing_partition(context):
+    """Another process dropped a partition this one still had cached; rescan on the next call"""
+    message = str(context.original_exception)
+    if MISSING_TABLE.search(message) and PARTITION_NAME.search(message):
+        logger.info('Analytics partition missing; refreshing the partition catalog')
+        forget_partitions()
+
+
+def ensure_partition(model, month):
+    """Partition table for ``month``, created in its own transaction if needed.
+
+    Call this before the session holds the write lock: on SQLite the DDL
+    runs on another connection and would wait for it.
+    """
+    month = month_start(month)
+    if month not in partition_months(model):
+        with db.engine.begin() as connection:
+            create_partition(connection, model, month)
+        forget_partitions()
+    return partition_table(model, month)
+
+
+def partition_for(model, created_at=None):
+    """Partition table a row created at ``created_at`` belongs in"""
+    return ensure_partition(model, created_at or datetime.utcnow())
+
+
+def partition_rows(model, rows):
+    """Group insert ``rows`` by destination partition, creating tables as needed"""
+    by_month = {}
+    for row in rows:
+        row.setdefault('created_at', datetime.utcnow())
+        by_month.setdefault(month_start(row['created_at']), []).append(row)
+    return {ensure_partition(model, month): month_rows for month, month_rows in by_month.items()}
+
+
+def partition_selectable(model, start=None, end=None):
+    """Core selectable over the partitions overlapping ``[start, end)``"""
+    months = [
+        month for month in partition_months(model)
+        if (start is None or add_months(month, 1) > start) and (end is None or month < end)
+    ]
+    if not months:
+        return model.__table__
+    tables = [partition_table(model, month) for month in months]
+    if len(tables) == 1:
+        return tables[0]
+    return union_all(*(select(table) for table in tables)).subquery(model.__tablename__)
+
+
+def partition_source(model, start=None, end=None):
+    """ORM entity for ``model`` reading only the partitions overlapping ``[start, end)``"""
+    selectable = partition_selectable(model, start, end)
+    if selectable is model.__table__:
+        return model
+    # Partition columns are copies, not proxies, of the template columns; match them by name
+    return aliased(model, selectable, name=model.__name__, adapt_on_names=True)
+
+
+def partition_stats(model):
+    """Row counts and date ranges for every partition of ``model``"""
+    stats = []
+    for month in partition_months(model):
+        table = partition_table(model, month)
+        rows, first, last = db.session.execute(
+            select(func.count(), func.min(table.c.created_at), func.max(table.c.created_at))
+        ).one()
+        stats.append({
+            'table': table.name,
+            'month': f'{month:%Y-%m}',
+            'rows': rows,
+            'first': str(first) if first else None,
+            'last': str(last) if last else None
+        })
+    return stats
+
+
+def _archived_rows(path, name):
+    """Row count of ``name`` in an archive file, or None when the file does not hold it"""
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        return connection.execute(f'SELECT count(*) FROM "{name}"').fetchone()[0]
+    except sqlite3.Error:
+        return None
+    finally:
+        connection.close()
+
+
+def archive_partition(model, month, directory):
+    """Copy a partition into ``directory/<table>.db``; returns the archive path.
+
+    The copy goes to a temporary file that replaces nothing: it is moved into
+    place only when its row count matches the table. An archive that already
+    exists is kept as is when it has the table's row count, and otherwise
+    raises ``ArchiveConflict``.
+    """
+    table = partition_table(model, month)
+    if db.engine.dialect.name != 'sqlite':
+        raise RuntimeError('Partition archives are SQLite files; dump the table with your database tools instead')
+    if not inspect(db.engine).has_table(table.name):
+        raise LookupError(f'Partition {table.name} does not exist')
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.abspath(os.path.join(directory, f'{table.name}.db'))
+    staging = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+    try:
+        with db.engine.connect() as connection:
+            # ATTACH cannot run inside a transaction, so attach before the copy begins
+            connection.exec_driver_sql('ATTACH DATABASE ? AS archive', (staging,))
+            connection.commit()
+            try:
+                with connection.begin():
+                    archived = table.to_metadata(MetaData(), schema='archive')
+                    archived.create(connection)
+                    connection.exec_driver_sql(f'INSERT INTO archive."{table.name}" SELECT * FROM main."{table.name}"')
+                    expected = connection.exec_driver_sql(f'SELECT count(*) FROM main."{table.name}"').scalar()
+                    copied = connection.exec_driver_sql(f'SELECT count(*) FROM archive."{table.name}"').scalar()
+            finally:
+                connection.exec_driver_sql('DETACH DATABASE archive')
+                connection.commit()
+        if copied != expected:
+            raise RuntimeError(f'Archive of {table.name} has {copied} rows, expected {expected}')
+
+        if os.path.exists(path):
+            existing = _archived_rows(path, table.name)
+            if existing != expected:
+                raise ArchiveConflict(
+                    f'{path} already exists with {existing} rows; {table.name} has {expected}. '
+                    'Move the old archive aside before archiving again'
+                )
+            return path
+        os.replace(staging, path)
+    finally:
+        if os.path.exists(staging):
+            os.remove(staging)
+    return path
+
+
+def drop_partition(model, month, archive_dir=None):
+    """Drop a partition, archiving it first when ``archive_dir`` is set; a missing one is skipped"""
+    table = partition_table(model, month)
+    if not inspect(db.engine).has_table(table.name):
+        # Dropped by another worker since the catalog was read
+        forget_partitions()
+        return None
+    path = archive_partition(model, month, archive_dir) if archive_dir else None
+    with db.engine.begin() as connection:
+        table.drop(connection, checkfirst=True)
+    forget_partitions()
+    logger.info('Dropped analytics partition %s%s', table.name, f' (archived to {path})' if path else '')
+    return path
+
+
+def compact_partition(model, month):
+    """Rebuild a partition's indexes densely and refresh its planner statistics"""
+    table = partition_table(model, month)
+    with db.engine.begin() as connection:
+        if connection.dialect.name == 'sqlite':
+            connection.exec_driver_sql(f'REINDEX "{table.name}"')
+        connection.exec_driver_sql(f'ANALYZE "{table.name}"')
+    return table.name
+
+
+def expired_months(model, now=None, retention_months=None, watermark=None):
+    """Months older than the retention window whose rows the rollups already cover"""
+    if retention_months is None:
+        retention_months = current_app.config.get('ANALYTICS_RETENTION_MONTHS')
+    if not retention_months or watermark is None:
+        # With nothing rolled up yet, dropping a month would lose its counts
+        return []
+    cutoff = min(add_months(month_start(now or datetime.utcnow()), -retention_months), month_start(watermark))
+    return [month for month in partition_months(model) if add_months(month, 1) <= cutoff]
+
+
+def apply_retention(watermark, now=None, archive_dir=None, dry_run=False):
+    """Drop (and archive) every expired partition; returns the table names affected"""
+    if archive_dir is None:
+        archive_dir = current_app.config.get('ANALYTICS_ARCHIVE_DIR') or None
+    affected = []
+    for model in PARTITIONED_MODELS:
+        for month in expired_months(model, now, watermark=watermark):
+            if not dry_run:
+                drop_partition(model, month, archive_dir)
+            affected.append(partition_name(model, month))
+    return affected
+
+
+def ensure_upcoming_partitions(now=None):
+    """Create this month's and next month's partitions ahead of the first insert"""
+    month = month_start(now or datetime.utcnow())
+    for model in PARTITIONED_MODELS:
+        for upcoming in (month, add_months(month, 1)):
+            ensure_partition(model, upcoming)
+
+
+def migrate_to_partitions(connection, now=None):
+    """Move rows still in the unpartitioned tables into their month partitions.
+
+    Rows without a ``created_at`` go to the earliest month's partition (the
+    current month's when every row lacks one) with the column left NULL, so
+    nothing stays behind in the template table.
+    """
+    moved = 0
+    for model in PARTITIONED_MODELS:
+        template = model.__table__
+        names = [column.name for column in template.columns]
+        months = connection.execute(
+            select(func.min(template.c.created_at), func.max(template.c.created_at))
+        ).one()
+        first, last = (datetime.fromisoformat(value) if isinstance(value, str) else value for value in months)
+        if first is not None:
+            month = month_start(first)
+            while month <= last:
+                table = create_partition(connection, model, month)
+                moved += connection.execute(
+                    insert(table).from_select(names, select(*template.c).where(
+                        template.c.created_at >= month,
+                        template.c.created_at < add_months(month, 1)
+                    ))
+                ).rowcount
+                month = add_months(month, 1)
+
+        undated = connection.execute(
+            select(func.count()).select_from(template).where(template.c.created_at.is_(None))
+        ).scalar()
+        if undated:
+            table = create_partition(connection, model, month_start(first or now or datetime.utcnow()))
+            moved += connection.execute(
+                insert(table).from_select(names, select(*template.c).where(template.c.created_at.is_(None)))
+            ).rowcount
+            logger.warning('Moved %d %s row(s) without created_at into %s', undated, template.name, table.name)
+        connection.execute(template.delete())
+    forget_partitions()
+    return moved
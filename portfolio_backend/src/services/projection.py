@@ -0,0 +1,72 @@
+"""Column projection for the list endpoints.
+
+``?fields=id,title,slug`` returns only the named fields and ``?view=summary``
+returns each collection's compact field set (no article bodies, long
+descriptions or raw tracking strings). The projection is applied to the
+SELECT itself: ``project`` swaps the ORM entity for just the needed
+columns, so unrequested Text columns are never read, and rows come back as
+plain tuples for ``serialization.serialize_rows`` instead of ORM objects.
+"""
+from flask import request
+
+from src.services.serialization import model_fields
+
+VIEWS = ('full', 'summary')
+
+# list name -> fields returned by ?view=summary
+SUMMARY_FIELDS = {
+    'projects': [
+        'id', 'title', 'short_description', 'category', 'tags', 'image_url',
+        'featured', 'status', 'created_at'
+    ],
+    'blog': [
+        'id', 'title', 'slug', 'excerpt', 'category', 'tags', 'featured_image',
+        'featured', 'reading_time', 'views', 'published_at'
+    ],
+    'shop': [
+        'id', 'name', 'short_description', 'price', 'original_price', 'category',
+        'image_url', 'featured', 'stock_quantity', 'sales_count'
+    ],
+    'messages': [
+        'id', 'name', 'email', 'subject', 'status', 'priority', 'source', 'created_at'
+    ],
+    'pageviews': [
+        'id', 'page_url', 'session_id', 'device_type', 'browser', 'country', 'created_at'
+    ],
+    'interactions': [
+        'id', 'event_type', 'element_id', 'page_url', 'session_id', 'created_at'
+    ],
+}
+
+
+class InvalidProjection(ValueError):
+    """Raised for an unknown ``view`` or a ``fields`` entry that is not a column."""
+
+
+def requested_fields(model, summary):
+    """Field names asked for by ``fields``/``view``; every column by default"""
+    view = request.args.get('view', 'full')
+    if view not in VIEWS:
+        raise InvalidProjection(f'Unknown view: {view}')
+
+    fields = request.args.get('fields')
+    if fields:
+        names = list(dict.fromkeys(name.strip() for name in fields.split(',') if name.strip()))
+        columns = model.__table__.columns
+        unknown = [name for name in names if name not in columns]
+        if unknown:
+            raise InvalidProjection(f'Unknown field(s): {", ".join(unknown)}')
+        return names
+    if view == 'summary':
+        return list(SUMMARY_FIELDS[summary])
+    return list(model_fields(model))
+
+
+def project(query, model, fields, keys=()):
+    """Select only ``fields`` plus the sort ``keys`` needed for the next cursor"""
+    names = list(fields)
+    for key in keys:
+        if key.column.key not in names:
+            names.append(key.column.key)
+    return query.with_entities(*(getattr(model, name) for name in names))
+
@@ -0,0 +1,420 @@
+"""Contention-safe purchase recording for the shop.
+
+Stock is only ever changed by conditional UPDATEs evaluated inside the
+database, so two concurrent checkouts can never both take the last unit:
+
+- ``reserve_stock`` moves units out of ``Product.stock_quantity`` into a
+  ``StockReservation`` with ``UPDATE ... WHERE stock_quantity >= :n
+  RETURNING``. Held units come back when the reservation is released or
+  expires.
+- ``record_sale`` either commits a held reservation or takes the units
+  directly with the same conditional UPDATE, and appends a ``Purchase``
+  ledger row.
+
+A limited-stock sale bumps ``Product.sales_count`` in the same UPDATE
+that takes the units, since that row is written anyway. Sales that do not
+touch the product row (committed reservations, unlimited stock) stay
+unapplied in the ledger: ``apply_purchases`` folds them into
+``sales_count`` with one grouped UPDATE per batch, and
+``rebuild_sales_counts`` replays the whole ledger. Products with
+``stock_quantity == -1`` have unlimited stock; selling them only writes
+the ledger.
+"""
+import atexit
+import logging
+import secrets
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import bindparam, func, select, update
+
+from src.models.user import db
+from src.models.product import Product
+from src.models.purchase import Purchase, StockReservation
+from src.services.cache import response_cache
+from src.services.conditional import bump_collection_version
+
+logger = logging.getLogger(__name__)
+
+UNLIMITED_STOCK = -1
+
+
+class ProductNotFound(LookupError):
+    """Raised when a purchase or reservation names a product that does not exist."""
+
+
+class OutOfStock(Exception):
+    """Raised when not enough unreserved stock is left for the requested quantity."""
+
+
+class ReservationError(Exception):
+    """Raised when a reservation is unknown, expired or already used."""
+
+
+def _take_stock(product_id, quantity, sold=False):
+    """Atomically remove ``quantity`` units, counting them as sold if ``sold``; returns the Product or None"""
+    values = {'stock_quantity': Product.stock_quantity - quantity}
+    if sold:
+        values['sales_count'] = func.coalesce(Product.sales_count, 0) + quantity
+    statement = (
+        update(Product)
+        .where(Product.id == product_id, Product.stock_quantity >= quantity)
+        .values(**values)
+        .returning(Product)
+        .execution_options(populate_existing=True, synchronize_session=False)
+    )
+    return db.session.execute(statement).scalar_one_or_none()
+
+
+def _claim_stock(product_id, quantity, sold=False):
+    """Take limited stock or confirm the product is unlimited.
+
+    Returns ``(product, holds_stock)``. The common limited-stock case is a
+    single UPDATE ... RETURNING; only a miss falls back to reading the row
+    to tell unlimited, missing and sold-out products apart.
+    """
+    product = _take_stock(product_id, quantity, sold)
+    if product is not None:
+        return product, True
+
+    product = db.session.get(Product, product_id)
+    if product is None:
+        raise ProductNotFound(f'Product {product_id} not found')
+    if product.stock_quantity == UNLIMITED_STOCK:
+        return product, False
+    raise OutOfStock(f'Only {max(product.stock_quantity or 0, 0)} unit(s) of product {product_id} available')
+
+
+def _return_stock(released):
+    """Give the units of released reservations back to their products"""
+    totals = Counter()
+    for product_id, quantity, holds_stock in released:
+        if holds_stock:
+            totals[product_id] += quantity
+    if not totals:
+        return
+    table = Product.__table__
+    db.session.execute(
+        update(table)
+        .where(table.c.id == bindparam('product_id'), table.c.stock_quantity != UNLIMITED_STOCK)
+        .values(stock_quantity=table.c.stock_quantity + bindparam('quantity')),
+        [{'product_id': product_id, 'quantity': quantity} for product_id, quantity in totals.items()]
+    )
+
+
+def _changed():
+    bump_collection_version('shop')
+
+
+def reserve_stock(product_id, quantity=1, ttl=None):
+    """Hold ``quantity`` units of a product for ``ttl`` seconds"""
+    ttl = ttl or current_app.config.get('SHOP_RESERVATION_TTL', 900)
+    try:
+        product, holds_stock = _claim_stock(product_id, quantity)
+        reservation = StockReservation(
+            token=secrets.token_urlsafe(24),
+            product_id=product_id,
+            quantity=quantity,
+            holds_stock=holds_stock,
+            expires_at=datetime.utcnow() + timedelta(seconds=ttl)
+        )
+        db.session.add(reservation)
+        if holds_stock:
+            _changed()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if holds_stock:
+        response_cache.invalidate('shop')
+    return reservation, product
+
+
+def release_reservation(token):
+    """Cancel a held reservation and return its units"""
+    try:
+        released = db.session.execute(
+            update(StockReservation)
+            .where(StockReservation.token == token, StockReservation.status == 'held')
+            .values(status='released')
+            .returning(StockReservation.product_id, StockReservation.quantity, StockReservation.holds_stock)
+        ).all()
+        if not released:
+            raise ReservationError('Reservation not found or no longer held')
+        _return_stock(released)
+        if released[0].holds_stock:
+            _changed()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if released[0].holds_stock:
+        response_cache.invalidate('shop')
+
+
+def expire_reservations(now=None):
+    """Release every held reservation past its expiry; returns how many"""
+    now = now or datetime.utcnow()
+    try:
+        # A read served by ix_stock_reservation_status_expires_at; only take the
+        # writer lock when something is actually due
+        due = db.session.execute(
+            select(StockReservation.id)
+            .where(StockReservation.status == 'held', StockReservation.expires_at <= now)
+            .limit(1)
+        ).first()
+        if due is None:
+            db.session.rollback()
+            return 0
+        expired = db.session.execute(
+            update(StockReservation)
+            .where(StockReservation.status == 'held', StockReservation.expires_at <= now)
+            .values(status='expired')
+            .returning(StockReservation.product_id, StockReservation.quantity, StockReservation.holds_stock)
+        ).all()
+        if not expired:
+            db.session.rollback()
+            return 0
+        _return_stock(expired)
+        _changed()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    response_cache.invalidate('shop')
+    return len(expired)
+
+
+def _pending_sales(product_id):
+    """Units sold of a product that are not yet folded into its sales_count"""
+    return db.session.execute(
+        select(func.coalesce(func.sum(Purchase.quantity), 0))
+        .where(Purchase.applied.is_(False), Purchase.product_id == product_id)
+    ).scalar()
+
+
+def record_sale(product_id, quantity=1, reservation_token=None):
+    """Record a sale and append it to the ledger.
+
+    Returns ``(product, purchase, sales_count)``; ``sales_count`` includes
+    this sale even when the ledger has not been applied yet.
+    """
+    try:
+        reservation_id = None
+        if reservation_token:
+            committed = db.session.execute(
+                update(StockReservation)
+                .where(
+                    StockReservation.token == reservation_token,
+                    StockReservation.product_id == product_id,
+                    StockReservation.status == 'held',
+                    StockReservation.expires_at > datetime.utcnow()
+                )
+                .values(status='committed')
+                .returning(StockReservation.id, StockReservation.quantity)
+            ).first()
+            if committed is None:
+                raise ReservationError('Reservation not found, expired or already used')
+            reservation_id, quantity = committed
+            product = db.session.get(Product, product_id)
+            if product is None:
+                raise ProductNotFound(f'Product {product_id} not found')
+            holds_stock = False
+        else:
+            product, holds_stock = _claim_stock(product_id, quantity, sold=True)
+
+        # A limited-stock sale was already counted by the UPDATE ... RETURNING
+        purchase = Purchase(
+            product_id=product_id,
+            quantity=quantity,
+            unit_price=product.price,
+            reservation_id=reservation_id,
+            source='checkout',
+            applied=holds_stock
+        )
+        db.session.add(purchase)
+        sales_count = product.sales_count or 0
+        if not holds_stock:
+            sales_count += _pending_sales(product_id)
+        if holds_stock:
+            _changed()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if holds_stock:
+        response_cache.invalidate('shop')
+    return product, purchase, sales_count
+
+
+def apply_purchases():
+    """Fold unapplied ledger rows into Product.sales_count; returns rows applied"""
+    try:
+        last_id = db.session.execute(
+            select(func.max(Purchase.id)).where(Purchase.applied.is_(False))
+        ).scalar()
+        if last_id is None:
+            db.session.rollback()
+            return 0
+
+        pending = Purchase.applied.is_(False) & (Purchase.id <= last_id)
+        totals = db.session.execute(
+            select(Purchase.product_id, func.sum(Purchase.quantity), func.count())
+            .where(pending)
+            .group_by(Purchase.product_id)
+        ).all()
+
+        table = Product.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('product_id'))
+            .values(
+                sales_count=func.coalesce(table.c.sales_count, 0) + bindparam('quantity'),
+                updated_at=table.c.updated_at
+            ),
+            [{'product_id': product_id, 'quantity': quantity} for product_id, quantity, _ in totals]
+        )
+        db.session.execute(update(Purchase).where(pending).values(applied=True))
+        _changed()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    response_cache.invalidate('shop')
+    return sum(count for _, _, count in totals)
+
+
+def rebuild_sales_counts():
+    """Recompute every Product.sales_count from the full ledger"""
+    table = Product.__table__
+    totals = (
+        select(func.coalesce(func.sum(Purchase.quantity), 0))
+        .where(Purchase.product_id == table.c.id)
+        .scalar_subquery()
+    )
+    try:
+        db.session.execute(update(table).values(sales_count=totals, updated_at=table.c.updated_at))
+        db.session.execute(update(Purchase).where(Purchase.applied.is_(False)).values(applied=True))
+        _changed()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    response_cache.invalidate('shop')
+
+
+def sales_summary(since=None, product_id=None):
+    """Units, orders and revenue per product from the ledger"""
+    query = (
+        select(
+            Purchase.product_id,
+            func.count().label('orders'),
+            func.sum(Purchase.quantity).label('units'),
+            func.sum(Purchase.quantity * Purchase.unit_price).label('revenue')
+        )
+        .where(Purchase.source == 'checkout')
+        .group_by(Purchase.product_id)
+    )
+    if since is not None:
+        query = query.where(Purchase.created_at >= since)
+    if product_id is not None:
+        query = query.where(Purchase.product_id == product_id)
+    return [
+        {
+            'product_id': row.product_id,
+            'orders': row.orders,
+            'units': row.units or 0,
+            'revenue': round(row.revenue or 0, 2)
+        }
+        for row in db.session.execute(query)
+    ]
+
+
+def opening_balance_rows(connection):
+    """Ledger rows carrying each product's pre-ledger sales_count"""
+    now = datetime.utcnow()
+    return [
+        {
+            'product_id': product_id,
+            'quantity': sales_count,
+            'unit_price': None,
+            'source': 'opening',
+            'applied': True,
+            'created_at': now
+        }
+        for product_id, sales_count in connection.execute(
+            select(Product.id, Product.sales_count).where(Product.sales_count > 0)
+        )
+    ]
+
+
+class PurchaseLedger:
+    """Background job that applies the ledger and expires stale reservations"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.interval = 5.0
+        self.reservation_ttl = 900
+        self._worker = None
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SHOP_LEDGER_ENABLED', True)
+        app.config.setdefault('SHOP_LEDGER_APPLY_INTERVAL', 5.0)
+        app.config.setdefault('SHOP_RESERVATION_TTL', 900)
+
+        self.app = app
+        self.enabled = app.config['SHOP_LEDGER_ENABLED']
+        self.interval = app.config['SHOP_LEDGER_APPLY_INTERVAL']
+        self.reservation_ttl = app.config['SHOP_RESERVATION_TTL']
+        app.extensions['shop_ledger'] = self
+
+        if self.enabled:
+            self.start()
+            atexit.register(self.stop)
+
+    def start(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._stopping.clear()
+        self._worker = threading.Thread(target=self._run, name='shop-ledger', daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        """Stop the worker and apply whatever is still pending"""
+        self._stopping.set()
+        if self._worker is not None:
+            self._worker.join(timeout=max(self.interval * 2, 5))
+            self._worker = None
+        self.run_once()
+
+    def after_sale(self):
+        """Apply immediately when there is no background worker"""
+        if not self.enabled:
+            apply_purchases()
+
+    def run_once(self):
+        with self.app.app_context():
+            try:
+                expire_reservations()
+                return apply_purchases()
+            except Exception:
+                logger.exception('Applying the purchase ledger failed')
+                return 0
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.run_once()
+
+
+purchase_ledger = PurchaseLedger()
@@ -0,0 +1,276 @@
+"""Slow-query log, N+1 detection and per-endpoint query budgets.
+
+``query_monitor.init_app`` listens to every ``Engine``'s cursor events:
+
+- A statement slower than ``QUERY_SLOW_MS`` milliseconds is logged on the
+  ``src.services.query_monitor`` logger with its bound parameters and, on
+  SQLite, its ``EXPLAIN QUERY PLAN``. The plan runs on a separate DBAPI
+  cursor, so the original result is left untouched.
+- Each request's statements are fingerprinted: whitespace is collapsed and
+  expanded ``IN (?, ?, ...)`` lists are folded. After the response, the
+  request is flagged when its count exceeds the endpoint's budget, or when
+  one fingerprint ran ``QUERY_REPEAT_THRESHOLD`` times or more (the N+1
+  pattern). A budget comes from ``@query_budget(n)`` on the view, then
+  ``QUERY_BUDGETS[endpoint]``, then ``QUERY_BUDGET_DEFAULT``.
+
+Violations are logged and kept in a short ring buffer for
+``GET /api/db/queries``. With ``QUERY_MONITOR_RAISE`` (meant for
+development and test runs) they raise ``QueryBudgetExceeded`` instead.
+``QUERY_MONITOR_HEADERS`` adds ``X-Query-Count`` to every response.
+
+Tests can assert budgets directly:
+
+    with assert_max_queries(2):
+        client.get('/api/projects')
+
+and ``flask --app src.main db check-queries`` runs the same check over
+``query_plans.ROUTE_PLAN_CHECKS``.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.exceptions import HTTPException
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)|\(\s*%\(\w+\)s(?:\s*,\s*%\(\w+\)s)+\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a request or block runs more statements than it is allowed."""
+
+
+def fingerprint(statement):
+    """Statement text with whitespace collapsed and expanded IN lists folded"""
+    return IN_LIST.sub('(?...)', WHITESPACE.sub(' ', statement).strip())
+
+
+def query_budget(max_queries):
+    """Declare the most statements a view may run per request.
+
+    Decorators built on ``functools.wraps`` copy the attribute outwards, so
+    this can sit anywhere under ``@route``.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def _short(parameters, limit=500):
+    text = repr(parameters)
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+def explain_plan(conn, statement, parameters):
+    """``EXPLAIN QUERY PLAN`` details for a SQLite statement, on a fresh cursor"""
+    # The DBAPI connection rather than ``cursor.connection``, which aiosqlite's adapted cursor lacks
+    explain = conn.connection.dbapi_connection.cursor()
+    try:
+        explain.execute(f'EXPLAIN QUERY PLAN {statement}', parameters or ())
+        return [row[-1] for row in explain.fetchall()]
+    finally:
+        explain.close()
+
+
+class QueryMonitor:
+    """Engine listeners plus the per-request budget check"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.slow_seconds = None
+        self.repeat_threshold = 5
+        self._lock = threading.Lock()
+        self._violations = deque(maxlen=100)
+        self._slow = deque(maxlen=100)
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('QUERY_MONITOR_ENABLED', True)
+        app.config.setdefault('QUERY_SLOW_MS', 250)
+        app.config.setdefault('QUERY_EXPLAIN_SLOW', True)
+        app.config.setdefault('QUERY_BUDGETS', {})
+        app.config.setdefault('QUERY_BUDGET_DEFAULT', 25)
+        app.config.setdefault('QUERY_REPEAT_THRESHOLD', 5)
+        app.config.setdefault('QUERY_MONITOR_RAISE', app.testing)
+        app.config.setdefault('QUERY_MONITOR_HEADERS', app.debug)
+
+        self.app = app
+        self.enabled = app.config['QUERY_MONITOR_ENABLED']
+        slow_ms = app.config['QUERY_SLOW_MS']
+        self.slow_seconds = slow_ms / 1000 if slow_ms else None
+        self.repeat_threshold = app.config['QUERY_REPEAT_THRESHOLD']
+        app.extensions['query_monitor'] = self
+        if not self.enabled:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._listening = True
+
+    def budget_for(self, endpoint):
+        """Statement budget for ``endpoint``, or None for unlimited"""
+        view = current_app.view_functions.get(endpoint) if endpoint else None
+        budget = getattr(view, 'query_budget', None)
+        if budget is None:
+            budget = current_app.config['QUERY_BUDGETS'].get(endpoint, current_app.config['QUERY_BUDGET_DEFAULT'])
+        return budget
+
+    def check(self, endpoint, statements):
+        """Problems with one request's ``statements`` (a fingerprint Counter)"""
+        problems = []
+        total = sum(statements.values())
+        budget = self.budget_for(endpoint)
+        if budget is not None and total > budget:
+            problems.append(f'{total} statements, budget is {budget}')
+        for statement, count in statements.most_common():
+            if count < self.repeat_threshold:
+                break
+            problems.append(f'repeated {count}x (possible N+1): {statement}')
+        return problems
+
+    def stats(self):
+        with self._lock:
+            return {
+                'slow_threshold_ms': self.slow_seconds * 1000 if self.slow_seconds else None,
+                'repeat_threshold': self.repeat_threshold,
+                'slow_queries': list(self._slow),
+                'violations': list(self._violations)
+            }
+
+    def _before_request(self):
+        g.query_fingerprints = Counter()
+
+    def _after_request(self, response):
+        statements = g.pop('query_fingerprints', None)
+        if statements is None:
+            return response
+        if current_app.config['QUERY_MONITOR_HEADERS']:
+            response.headers['X-Query-Count'] = str(sum(statements.values()))
+        problems = self.check(request.endpoint, statements)
+        if problems:
+            violation = {
+                'at': datetime.utcnow().isoformat(),
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'endpoint': request.endpoint,
+                'queries': sum(statements.values()),
+                'problems': problems
+            }
+            with self._lock:
+                self._violations.append(violation)
+            logger.warning('Query budget exceeded on %s %s: %s', request.method, violation['path'], '; '.join(problems))
+            if current_app.config['QUERY_MONITOR_RAISE']:
+                raise QueryBudgetExceeded(f'{request.endpoint}: ' + '; '.join(problems))
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_monitor_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('query_monitor_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        if has_request_context() and 'query_fingerprints' in g:
+            g.query_fingerprints[fingerprint(statement)] += 1
+        if self.slow_seconds is not None and elapsed >= self.slow_seconds:
+            self._log_slow(conn, statement, parameters, executemany, elapsed)
+
+    def _log_slow(self, conn, statement, parameters, executemany, elapsed):
+        plan = None
+        if conn.dialect.name == 'sqlite' and not executemany and self.app.config['QUERY_EXPLAIN_SLOW']:
+            try:
+                plan = explain_plan(conn, statement, parameters)
+            except Exception as e:
+                plan = [f'EXPLAIN failed: {e}']
+        entry = {
+            'at': datetime.utcnow().isoformat(),
+            'ms': round(elapsed * 1000, 2),
+            'endpoint': request.endpoint if has_request_context() else None,
+            'statement': WHITESPACE.sub(' ', statement).strip(),
+            'parameters': _short(parameters),
+            'plan': plan
+        }
+        with self._lock:
+            self._slow.append(entry)
+        logger.warning(
+            'Slow query (%.1f ms) on %s: %s\n  parameters: %s%s',
+            entry['ms'], entry['endpoint'] or 'background', entry['statement'], entry['parameters'],
+            ''.join(f'\n  plan: {detail}' for detail in plan or ())
+        )
+
+
+query_monitor = QueryMonitor()
+
+
+@contextmanager
+def capture_queries():
+    """Collect the statements this thread runs on any engine inside the block, in order.
+
+    Background workers (ingest, rollups, view counter, ledger, replica
+    heartbeat) share the engines, so statements from other threads are
+    ignored.
+    """
+    statements = []
+    thread = threading.get_ident()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == thread:
+            statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+
+
+@contextmanager
+def assert_max_queries(max_queries, repeat_threshold=None):
+    """Raise ``QueryBudgetExceeded`` if the block runs too many or repeated statements"""
+    with capture_queries() as statements:
+        yield statements
+    problems = []
+    if len(statements) > max_queries:
+        problems.append(f'{len(statements)} statements, budget is {max_queries}')
+    if repeat_threshold is not None:
+        for statement, count in Counter(map(fingerprint, statements)).most_common():
+            if count < repeat_threshold:
+                break
+            problems.append(f'repeated {count}x: {statement}')
+    if problems:
+        raise QueryBudgetExceeded('; '.join(problems) + ''.join(f'\n  {fingerprint(s)}' for s in statements))
+
+
+def check_route_queries(app, paths):
+    """Return ``{path: [problem, ...]}`` for paths over budget or repeating statements"""
+    failures = {}
+    with app.app_context():
+        client = app.test_client()
+        for path in paths:
+            with capture_queries() as statements:
+                client.get(path)
+            try:
+                endpoint = app.url_map.bind('localhost').match(path.split('?')[0], method='GET')[0]
+            except HTTPException:
+                endpoint = None
+            problems = query_monitor.check(endpoint, Counter(map(fingerprint, statements)))
+            if problems:
+                failures[path] = problems
+    return failures
@@ -0,0 +1,120 @@
+"""Query-plan regression checks for the read endpoints.
+
+``check_route_plans`` drives each path in ``ROUTE_PLAN_CHECKS`` through the
+Flask test client, captures every SELECT the handler issues, runs
+``EXPLAIN QUERY PLAN`` on it with the same parameters and reports any plan
+that scans a whole table or sorts through a temporary B-tree. Paginated
+responses are followed to their second page so the keyset predicate is
+checked as well. Run it with
+``flask --app src.main db check-plans``.
+"""
+from sqlalchemy import event
+
+from src.models.user import db
+
+# GET paths whose queries must be served from indexes
+ROUTE_PLAN_CHECKS = [
+    '/api/projects',
+    '/api/projects?category=web',
+    '/api/projects?status=completed',
+    '/api/projects?featured=true',
+    '/api/projects/categories',
+    '/api/blog/posts',
+    '/api/blog/posts?category=AI',
+    '/api/blog/posts?published=false',
+    '/api/blog/posts?view=summary',
+    '/api/blog/categories',
+    '/api/shop/products',
+    '/api/shop/products?sort_by=price&order=asc',
+    '/api/shop/products?sort_by=sales_count',
+    '/api/shop/products?category=software',
+    '/api/shop/products?fields=id,name,price&sort_by=price',
+    '/api/shop/categories',
+    '/api/contact/messages',
+    '/api/contact/messages?status=new',
+    '/api/contact/messages?priority=high',
+    '/api/contact/stats',
+    '/api/analytics/dashboard',
+    '/api/analytics/pageviews?limit=50',
+    '/api/analytics/pageviews?page_url=/&limit=50',
+    '/api/analytics/interactions?limit=50',
+    '/api/analytics/interactions?event_type=click&limit=50',
+    '/api/analytics/interactions?page_url=/&limit=50',
+]
+
+
+def explain(connection, statement, parameters):
+    """Return the detail column of ``EXPLAIN QUERY PLAN`` for a statement"""
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    return [row[-1] for row in rows]
+
+
+def plan_problems(details):
+    """List the full scans and temp sorts in a query plan"""
+    problems = []
+    for detail in details:
+        if detail.startswith('SCAN ') and ' INDEX ' not in f'{detail} ' and 'CONSTANT ROW' not in detail:
+            if not detail.startswith('SCAN (subquery') and not detail.startswith('SCAN anon_'):
+                problems.append(f'full scan: {detail}')
+        if 'TEMP B-TREE FOR ORDER BY' in detail or 'TEMP B-TREE FOR RIGHT PART OF ORDER BY' in detail:
+            problems.append(f'temp sort: {detail}')
+    return problems
+
+
+def collect_route_plans(app, paths=None):
+    """Map each path to ``[(statement, plan_details)]`` for the SELECTs it ran"""
+    paths = paths or ROUTE_PLAN_CHECKS
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not executemany:
+            # Schema lookups (the partition catalog) read sqlite_master, which has no indexes
+            if 'sqlite_master' not in statement:
+                captured.append((statement, parameters))
+
+    results = {}
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'sqlite':
+            raise RuntimeError('Query plan checks use SQLite EXPLAIN QUERY PLAN output')
+
+        client = app.test_client()
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            for path in paths:
+                captured.clear()
+                response = client.get(path)
+                results[path] = list(captured)
+
+                # Keyset pages after the first add a range predicate; check that plan too
+                next_cursor = (response.get_json(silent=True) or {}).get('next_cursor')
+                if next_cursor:
+                    captured.clear()
+                    separator = '&' if '?' in path else '?'
+                    client.get(f'{path}{separator}cursor={next_cursor}')
+                    results[f'{path} (next page)'] = list(captured)
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+
+        with engine.connect() as connection:
+            # EXPLAIN never reads a table, so a pooled connection would plan against the
+            # schema it cached before migrations added indexes; reading sqlite_master reloads it
+            connection.exec_driver_sql('SELECT count(*) FROM sqlite_master').scalar()
+            for path, statements in results.items():
+                results[path] = [
+                    (statement, explain(connection, statement, parameters))
+                    for statement, parameters in statements
+                ]
+    return results
+
+
+def check_route_plans(app, paths=None):
+    """Return ``{path: [problem, ...]}`` for every path with a bad plan"""
+    failures = {}
+    for path, statements in collect_route_plans(app, paths).items():
+        problems = []
+        for statement, details in statements:
+            problems.extend(f'{problem}\n      {" ".join(statement.split())}' for problem in plan_problems(details))
+        if problems:
+            failures[path] = problems
+    return failures
@@ -0,0 +1,285 @@
+"""Read-replica routing.
+
+``RoutingSession`` is the session class behind ``db.session``. A SELECT
+is sent to a replica only when every one of these holds:
+
+- replicas are configured (``SQLALCHEMY_REPLICA_URIS``, read from
+  ``DATABASE_REPLICA_URLS``),
+- the request is a GET or HEAD on one of ``REPLICA_READ_BLUEPRINTS``,
+- this session has not written anything yet, and
+- the client did not write within the last ``REPLICA_STICKY_SECONDS``.
+  A successful mutating request sets a short-lived cookie that pins the
+  client's reads to the primary, so the client always reads its own
+  writes. Views whose writes are never read back, such as the analytics
+  beacons, opt out with ``@not_read_back``.
+
+Everything else, including flushes, DML and background jobs outside a
+request, uses the primary. Replication itself is external (LiteFS,
+Litestream, streaming replication and so on). To measure it, a heartbeat
+thread updates ``replication_heartbeat`` on the primary every
+``REPLICA_HEARTBEAT_INTERVAL`` seconds and reads each replica's copy. A
+replica whose copy is more than ``REPLICA_MAX_LAG_SECONDS`` old, or
+cannot be read, is taken out of rotation until it catches up. With no
+healthy replica, reads fall back to the primary.
+
+The replica is chosen on a request's first eligible read and kept in
+``g.db_replica``, so every statement of that request sees the same
+snapshot; a request that found no healthy replica stays on the primary.
+The heartbeat that replica showed when chosen is recorded in
+``g.db_replica_as_of``. The response cache uses it to avoid storing stale
+replica data under a generation bumped after that heartbeat.
+"""
+import atexit
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import column, create_engine, event, insert, select, table, update
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import TextClause
+
+from src.config import engine_options
+from src.services.database import configure_engine
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = ('GET', 'HEAD')
+STICKY_COOKIE = 'db_primary_until'
+
+heartbeat_table = table('replication_heartbeat', column('id'), column('beat_at'))
+
+
+def not_read_back(view):
+    """Mark a mutating view whose client never reads its write back, so it does not pin reads to the primary"""
+    view.read_back = False
+    return view
+
+
+def _is_read(clause):
+    if isinstance(clause, Select):
+        return True
+    return isinstance(clause, TextClause) and clause.text.lstrip()[:6].upper() == 'SELECT'
+
+
+class Replica:
+    """One replica engine and its last measured health"""
+
+    def __init__(self, name, engine, metrics):
+        self.name = name
+        self.engine = engine
+        self.metrics = metrics
+        self.healthy = False
+        self.lag = None
+        self.as_of = None  # primary time (epoch seconds) of the last heartbeat seen on this replica
+        self.last_error = None
+        self.reads = 0
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'url': self.engine.url.render_as_string(hide_password=True),
+            'healthy': self.healthy,
+            'lag_seconds': round(self.lag, 3) if self.lag is not None else None,
+            'last_error': self.last_error,
+            'reads': self.reads,
+            'pool': self.metrics.snapshot()
+        }
+
+
+class ReplicaRouter:
+    """Owns the replica engines, their health and the sticky-primary cookie"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.replicas = []
+        self.read_blueprints = frozenset()
+        self.max_lag = 5.0
+        self.sticky_seconds = 5
+        self.heartbeat_interval = 1.0
+        self.primary_reads = 0
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    @property
+    def enabled(self):
+        return bool(self.replicas)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_READ_BLUEPRINTS', ('projects', 'blog', 'shop', 'analytics', 'search', 'tags'))
+        app.config.setdefault('REPLICA_MAX_LAG_SECONDS', 5.0)
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+        app.config.setdefault('REPLICA_HEARTBEAT_INTERVAL', 1.0)
+
+        self.app = app
+        self.read_blueprints = frozenset(app.config['REPLICA_READ_BLUEPRINTS'])
+        self.max_lag = app.config['REPLICA_MAX_LAG_SECONDS']
+        self.sticky_seconds = app.config['REPLICA_STICKY_SECONDS']
+        self.heartbeat_interval = app.config['REPLICA_HEARTBEAT_INTERVAL']
+        self.replicas = []
+        for index, uri in enumerate(app.config['SQLALCHEMY_REPLICA_URIS']):
+            engine = create_engine(uri, **engine_options(uri))
+            metrics = configure_engine(app, engine, register=False)
+            self.replicas.append(Replica(f'replica{index + 1}', engine, metrics))
+        app.extensions['replica_router'] = self
+
+        if not self.replicas:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        self._tick()
+        self.start()
+        atexit.register(self.stop)
+
+    def start(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._stopping.clear()
+        self._worker = threading.Thread(target=self._run, name='replica-heartbeat', daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+            self._worker = None
+
+    def wants_replica(self, session, clause):
+        """True when ``clause`` may be answered by a replica in this context"""
+        return (
+            self.enabled
+            and has_request_context()
+            and request.method in READ_METHODS
+            and request.blueprint in self.read_blueprints
+            and not session.info.get('wrote')
+            and not g.get('db_read_primary', False)
+            and _is_read(clause)
+        )
+
+    def choose(self):
+        """This request's replica engine, or None to use the primary.
+
+        The first call picks a random healthy replica and pins it to the
+        request; later calls reuse it even if it has since left rotation,
+        so one response never mixes snapshots from different replicas.
+        """
+        if 'db_replica' not in g:
+            healthy = [replica for replica in self.replicas if replica.healthy]
+            g.db_replica = random.choice(healthy) if healthy else None
+            if g.db_replica is not None and g.db_replica.as_of is not None:
+                g.db_replica_as_of = g.db_replica.as_of
+        replica = g.db_replica
+        with self._lock:
+            if replica is None:
+                self.primary_reads += 1
+                return None
+            replica.reads += 1
+        return replica.engine
+
+    def beat(self):
+        """Touch the heartbeat row on the primary"""
+        from src.models.user import db  # db imports this module for RoutingSession
+
+        now = datetime.utcnow()
+        with db.engine.begin() as connection:
+            updated = connection.execute(
+                update(heartbeat_table).where(heartbeat_table.c.id == 1).values(beat_at=now)
+            ).rowcount
+            if not updated:
+                connection.execute(insert(heartbeat_table).values(id=1, beat_at=now))
+
+    def check(self):
+        """Measure every replica's lag against the wall clock"""
+        now = datetime.utcnow()
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as connection:
+                    beat_at = connection.execute(
+                        select(heartbeat_table.c.beat_at).where(heartbeat_table.c.id == 1)
+                    ).scalar()
+                if isinstance(beat_at, str):
+                    beat_at = datetime.fromisoformat(beat_at)
+                replica.lag = (now - beat_at).total_seconds() if beat_at else None
+                replica.as_of = beat_at.replace(tzinfo=timezone.utc).timestamp() if beat_at else None
+                replica.last_error = None if beat_at else 'no heartbeat yet'
+            except Exception as e:
+                replica.lag = None
+                replica.as_of = None
+                replica.last_error = str(e)
+            healthy = replica.lag is not None and replica.lag <= self.max_lag
+            if healthy != replica.healthy:
+                logger.warning('Replica %s is now %s (lag %s)', replica.name,
+                               'healthy' if healthy else 'out of rotation', replica.lag)
+            replica.healthy = healthy
+
+    def stats(self):
+        with self._lock:
+            primary_reads = self.primary_reads
+        return {
+            'enabled': self.enabled,
+            'max_lag_seconds': self.max_lag,
+            'sticky_seconds': self.sticky_seconds,
+            'primary_fallback_reads': primary_reads,
+            'replicas': [replica.to_dict() for replica in self.replicas]
+        }
+
+    def _before_request(self):
+        until = request.cookies.get(STICKY_COOKIE, type=float)
+        g.db_read_primary = until is not None and until > time.time()
+
+    def _after_request(self, response):
+        view = self.app.view_functions.get(request.endpoint)
+        if (
+            request.method not in READ_METHODS
+            and response.status_code < 400
+            and getattr(view, 'read_back', True)
+        ):
+            response.set_cookie(
+                STICKY_COOKIE, f'{time.time() + self.sticky_seconds:.3f}',
+                max_age=self.sticky_seconds, httponly=True, samesite='Lax'
+            )
+        return response
+
+    def _tick(self):
+        with self.app.app_context():
+            try:
+                self.beat()
+            except Exception:
+                logger.exception('Replication heartbeat failed')
+        self.check()
+
+    def _run(self):
+        while not self._stopping.wait(self.heartbeat_interval):
+            self._tick()
+
+
+replica_router = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends eligible SELECTs to a replica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and replica_router.wants_replica(self, clause):
+            engine = replica_router.choose()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _remember_dml(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _remember_flush(session, flush_context):
+    session.info['wrote'] = True
@@ -0,0 +1,516 @@
+"""Hourly and daily rollups of PageView and Interaction counts.
+
+``compact_rollups`` folds settled hours of raw rows into ``AnalyticsRollup``
+hour buckets, and every finished day into a day bucket. Alongside the counts
+it stores HyperLogLog sketches of distinct visitors and sessions per bucket,
+site-wide and per page, in ``VisitorSketch``.
+
+``dashboard_counts`` and ``approximate_uniques`` answer a ``days`` window
+from the day and hour buckets it fully covers and only scan raw rows for
+the partial edges that are not compacted yet. The compacted buckets and raw
+edges are all read with one UNION ALL statement. Raw rows are read through
+``partitions.partition_source`` so only the months in range are scanned;
+after each compaction the compactor also pre-creates next month's
+partitions and applies the partition retention policy.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import String, and_, cast, delete, func, insert, literal, null, or_, select, union_all
+
+from src.models.analytics import PageView, Interaction
+from src.models.rollup import AnalyticsRollup, VisitorSketch
+from src.models.user import db
+from src.services.cache import response_cache
+from src.services.hll import HyperLogLog, relative_error
+from src.services.partitions import add_months, apply_retention, ensure_upcoming_partitions, partition_months, partition_source
+
+logger = logging.getLogger(__name__)
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+# metric name -> (model, grouped column name); a column of None means the bucket total
+ROLLUP_METRICS = {
+    'pageviews': (PageView, None),
+    'page_url': (PageView, 'page_url'),
+    'device_type': (PageView, 'device_type'),
+    'browser': (PageView, 'browser'),
+    'referrer': (PageView, 'referrer'),
+    'interactions': (Interaction, None),
+    'event_type': (Interaction, 'event_type'),
+}
+
+# sketch kind -> PageView column name whose distinct values it counts
+SKETCH_KINDS = {
+    'visitors': 'ip_address',
+    'sessions': 'session_id',
+}
+
+DEFAULT_HLL_PRECISION = 12
+
+
+def floor_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(value):
+    floored = floor_hour(value)
+    return floored if floored == value else floored + HOUR
+
+
+def floor_day(value):
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def ceil_day(value):
+    floored = floor_day(value)
+    return floored if floored == value else floored + DAY
+
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _hour_bucket(column):
+    """SQL expression truncating ``column`` to the start of its hour"""
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return func.strftime('%Y-%m-%d %H:00:00', column)
+    return func.date_trunc('hour', column)
+
+
+def rollup_watermark():
+    """End of the last compacted hour, or None if nothing is compacted yet"""
+    last = db.session.execute(
+        select(func.max(AnalyticsRollup.bucket_start)).where(
+            AnalyticsRollup.granularity == 'hour',
+            AnalyticsRollup.metric == 'pageviews'
+        )
+    ).scalar()
+    return _as_datetime(last) + HOUR if last else None
+
+
+def compact_rollups(now=None, settle_seconds=None):
+    """Roll settled raw rows up into hour and day buckets.
+
+    Hours are only compacted once they ended ``settle_seconds`` ago so rows
+    still sitting in the ingest buffer are not missed. Returns the number of
+    hours compacted.
+    """
+    now = now or datetime.utcnow()
+    if settle_seconds is None:
+        settle_seconds = current_app.config.get('ANALYTICS_ROLLUP_SETTLE_SECONDS', 120)
+    end = floor_hour(now - timedelta(seconds=settle_seconds))
+
+    start = rollup_watermark()
+    if start is None:
+        earliest = [_earliest_created_at(model) for model in (PageView, Interaction)]
+        earliest = [value for value in earliest if value]
+        if not earliest:
+            return 0
+        start = floor_hour(min(earliest))
+
+    compacted = 0
+    while start < end:
+        # Work one day at a time so each day bucket is built right after its last hour
+        chunk_end = min(end, floor_day(start) + DAY)
+        _compact_hours(start, chunk_end)
+        if chunk_end == floor_day(chunk_end):
+            _compact_day(chunk_end - DAY)
+        db.session.commit()
+        compacted += int((chunk_end - start) / HOUR)
+        start = chunk_end
+    return compacted
+
+
+def _earliest_created_at(model):
+    """Oldest created_at across the partitions, skipping empty months.
+
+    Partitions are made ahead of time and can be emptied, so the oldest
+    month may have no rows; each probe is a MIN over the created_at index.
+    """
+    months = partition_months(model)
+    if not months:
+        return _as_datetime(db.session.execute(select(func.min(model.created_at))).scalar())
+    for month in months:
+        source = partition_source(model, month, add_months(month, 1))
+        earliest = db.session.execute(select(func.min(source.created_at))).scalar()
+        if earliest is not None:
+            return _as_datetime(earliest)
+    return None
+
+
+def _compact_hours(start, end):
+    db.session.execute(
+        delete(AnalyticsRollup).where(
+            AnalyticsRollup.granularity == 'hour',
+            AnalyticsRollup.bucket_start >= start,
+            AnalyticsRollup.bucket_start < end
+        )
+    )
+
+    rows = []
+    for metric, (model, column) in ROLLUP_METRICS.items():
+        source = partition_source(model, start, end)
+        bucket = _hour_bucket(source.created_at)
+        grouped = [bucket] if column is None else [bucket, getattr(source, column)]
+        query = select(*grouped, func.count()).where(
+            source.created_at >= start,
+            source.created_at < end
+        ).group_by(*grouped)
+
+        if column is None:
+            # Totals get a row for every hour so the watermark advances through quiet periods
+            totals = {row[0]: row[1] for row in db.session.execute(query)}
+            totals = {_as_datetime(key): value for key, value in totals.items()}
+            hour = start
+            while hour < end:
+                rows.append(_rollup_row('hour', hour, metric, None, totals.get(hour, 0)))
+                hour += HOUR
+        else:
+            for hour, dimension, count in db.session.execute(query):
+                rows.append(_rollup_row('hour', _as_datetime(hour), metric, dimension, count))
+
+    if rows:
+        db.session.execute(insert(AnalyticsRollup), rows)
+
+    _compact_hour_sketches(start, end)
+
+
+def _compact_hour_sketches(start, end):
+    db.session.execute(
+        delete(VisitorSketch).where(
+            VisitorSketch.granularity == 'hour',
+            VisitorSketch.bucket_start >= start,
+            VisitorSketch.bucket_start < end
+        )
+    )
+
+    # Collect distinct values per (hour, kind, page) first so each is hashed once
+    distinct = defaultdict(set)
+    source = partition_source(PageView, start, end)
+    query = select(
+        _hour_bucket(source.created_at),
+        source.page_url,
+        *_sketch_columns(source)
+    ).where(source.created_at >= start, source.created_at < end)
+    for hour, page_url, *values in db.session.execute(query):
+        hour = _as_datetime(hour)
+        for kind, value in zip(SKETCH_KINDS, values):
+            if value is not None:
+                distinct[(hour, kind, None)].add(value)
+                distinct[(hour, kind, page_url)].add(value)
+
+    precision = _hll_precision()
+    rows = [
+        _sketch_row('hour', hour, kind, page_url, HyperLogLog(precision).update(values))
+        for (hour, kind, page_url), values in distinct.items()
+    ]
+    if rows:
+        db.session.execute(insert(VisitorSketch), rows)
+
+
+def _compact_day(day):
+    db.session.execute(
+        delete(AnalyticsRollup).where(
+            AnalyticsRollup.granularity == 'day',
+            AnalyticsRollup.bucket_start == day
+        )
+    )
+    query = select(
+        AnalyticsRollup.metric,
+        AnalyticsRollup.dimension,
+        func.sum(AnalyticsRollup.count)
+    ).where(
+        AnalyticsRollup.granularity == 'hour',
+        AnalyticsRollup.bucket_start >= day,
+        AnalyticsRollup.bucket_start < day + DAY
+    ).group_by(AnalyticsRollup.metric, AnalyticsRollup.dimension)
+
+    rows = [_rollup_row('day', day, metric, dimension, count) for metric, dimension, count in db.session.execute(query)]
+    if rows:
+        db.session.execute(insert(AnalyticsRollup), rows)
+
+    db.session.execute(
+        delete(VisitorSketch).where(
+            VisitorSketch.granularity == 'day',
+            VisitorSketch.bucket_start == day
+        )
+    )
+    merged = {}
+    query = select(VisitorSketch.kind, VisitorSketch.page_url, VisitorSketch.sketch).where(
+        VisitorSketch.granularity == 'hour',
+        VisitorSketch.bucket_start >= day,
+        VisitorSketch.bucket_start < day + DAY
+    )
+    for kind, page_url, data in db.session.execute(query):
+        sketch = HyperLogLog.from_bytes(data)
+        if (kind, page_url) in merged:
+            merged[(kind, page_url)].merge(sketch)
+        else:
+            merged[(kind, page_url)] = sketch
+
+    rows = [_sketch_row('day', day, kind, page_url, sketch) for (kind, page_url), sketch in merged.items()]
+    if rows:
+        db.session.execute(insert(VisitorSketch), rows)
+
+
+def _rollup_row(granularity, bucket_start, metric, dimension, count):
+    return {
+        'granularity': granularity,
+        'bucket_start': bucket_start,
+        'metric': metric,
+        'dimension': dimension,
+        'count': count
+    }
+
+
+def _sketch_row(granularity, bucket_start, kind, page_url, sketch):
+    return {
+        'granularity': granularity,
+        'bucket_start': bucket_start,
+        'kind': kind,
+        'page_url': page_url,
+        'sketch': sketch.to_bytes()
+    }
+
+
+def _sketch_columns(source):
+    return [getattr(source, column) for column in SKETCH_KINDS.values()]
+
+
+def _hll_precision():
+    return current_app.config.get('ANALYTICS_HLL_PRECISION', DEFAULT_HLL_PRECISION)
+
+
+def reset_rollups():
+    """Drop every rollup and sketch so the next compaction rebuilds from raw rows"""
+    db.session.execute(delete(AnalyticsRollup))
+    db.session.execute(delete(VisitorSketch))
+    db.session.commit()
+
+
+def window_plan(start, now, watermark):
+    """Split ``[start, now)`` into raw edges, hour buckets and day buckets.
+
+    Each entry is a ``(from, to)`` pair; a ``to`` of None means open ended.
+    """
+    first_hour = ceil_hour(start)
+    compacted_until = min(watermark, floor_hour(now)) if watermark else None
+    if compacted_until is None or compacted_until <= first_hour:
+        return {'raw': [(start, None)], 'hours': [], 'days': []}
+
+    raw = [(compacted_until, None)]
+    if start < first_hour:
+        raw.insert(0, (start, first_hour))
+
+    first_day = ceil_day(first_hour)
+    last_day = floor_day(compacted_until)
+    if first_day < last_day:
+        hours = [(first_hour, first_day), (last_day, compacted_until)]
+        days = [(first_day, last_day)]
+    else:
+        hours = [(first_hour, compacted_until)]
+        days = []
+
+    return {
+        'raw': raw,
+        'hours': [(a, b) for a, b in hours if a < b],
+        'days': days
+    }
+
+
+def dashboard_counts(start, now=None):
+    """Merge rollup and raw counts for every metric over ``[start, now)``.
+
+    Returns ``{metric: Counter(dimension -> count)}`` plus a ``daily`` Counter
+    of page views keyed by ISO date.
+    """
+    now = now or datetime.utcnow()
+    plan = window_plan(start, now, rollup_watermark())
+    counts = defaultdict(Counter)
+
+    # Every rollup bucket and raw edge is one branch of a single UNION ALL
+    parts = []
+    in_window = _bucket_window(AnalyticsRollup, plan)
+    if in_window is not None:
+        parts.append(select(
+            AnalyticsRollup.metric,
+            AnalyticsRollup.dimension,
+            func.sum(AnalyticsRollup.count)
+        ).where(in_window).group_by(AnalyticsRollup.metric, AnalyticsRollup.dimension))
+        day = cast(func.date(AnalyticsRollup.bucket_start), String)
+        parts.append(select(
+            literal('daily'),
+            day,
+            func.sum(AnalyticsRollup.count)
+        ).where(in_window, AnalyticsRollup.metric == 'pageviews').group_by(day))
+
+    for range_start, range_end in plan['raw']:
+        parts.extend(_raw_count_queries(range_start, range_end))
+
+    for metric, dimension, count in db.session.execute(union_all(*parts)):
+        counts[metric][dimension] += count or 0
+    return counts
+
+
+def _bucket_window(model, plan):
+    """OR of the day and hour bucket ranges in ``plan``, or None when there are none"""
+    windows = [
+        and_(model.granularity == granularity, model.bucket_start >= range_start, model.bucket_start < range_end)
+        for granularity, ranges in (('day', plan['days']), ('hour', plan['hours']))
+        for range_start, range_end in ranges
+    ]
+    return or_(*windows) if windows else None
+
+
+def _raw_count_queries(range_start, range_end):
+    """``(metric, dimension, count)`` selects for every metric over a raw range.
+
+    Each metric keeps its own GROUP BY: grouping all dimensions in one pass
+    multiplies the groups and is slower than separate index-ordered scans.
+    """
+    queries = []
+    sources = {}
+    for metric, (model, column) in ROLLUP_METRICS.items():
+        source = sources.get(model)
+        if source is None:
+            source = sources[model] = partition_source(model, range_start, range_end)
+        dimension = null() if column is None else getattr(source, column)
+        query = select(literal(metric), dimension, func.count()).where(
+            *_raw_range(source, range_start, range_end)
+        )
+        queries.append(query if column is None else query.group_by(dimension))
+
+    source = sources[PageView]
+    day = cast(func.date(source.created_at), String)
+    queries.append(select(literal('daily'), day, func.count()).where(
+        *_raw_range(source, range_start, range_end)
+    ).group_by(day))
+    return queries
+
+
+def approximate_uniques(start, now=None, page_url=None):
+    """Estimate distinct visitors and sessions over ``[start, now)``.
+
+    Merges the stored sketches for every compacted bucket in the window and
+    only reads raw rows for the uncompacted edges. Returns
+    ``{'visitors': n, 'sessions': n, 'error': relative_standard_error}``.
+    """
+    now = now or datetime.utcnow()
+    plan = window_plan(start, now, rollup_watermark())
+    precision = _hll_precision()
+    sketches = {kind: HyperLogLog(precision) for kind in SKETCH_KINDS}
+    page_filter = VisitorSketch.page_url.is_(None) if page_url is None else VisitorSketch.page_url == page_url
+
+    in_window = _bucket_window(VisitorSketch, plan)
+    if in_window is not None:
+        query = select(VisitorSketch.kind, VisitorSketch.sketch).where(page_filter, in_window)
+        for kind, data in db.session.execute(query):
+            sketches[kind].merge(HyperLogLog.from_bytes(data))
+
+    for range_start, range_end in plan['raw']:
+        source = partition_source(PageView, range_start, range_end)
+        conditions = _raw_range(source, range_start, range_end)
+        if page_url is not None:
+            conditions.append(source.page_url == page_url)
+        for values in db.session.execute(select(*_sketch_columns(source)).where(*conditions)):
+            for kind, value in zip(SKETCH_KINDS, values):
+                sketches[kind].add(value)
+
+    result = {kind: sketch.count() for kind, sketch in sketches.items()}
+    result['error'] = round(relative_error(min(sketch.precision for sketch in sketches.values())), 4)
+    return result
+
+
+def exact_uniques(start, page_url=None):
+    """Count distinct visitors and sessions over raw rows since ``start``"""
+    source = partition_source(PageView, start)
+    conditions = [source.created_at >= start]
+    if page_url is not None:
+        conditions.append(source.page_url == page_url)
+    visitors, sessions = db.session.execute(
+        select(*(func.count(func.distinct(column)) for column in _sketch_columns(source))).where(*conditions)
+    ).one()
+    return {'visitors': visitors, 'sessions': sessions, 'error': 0.0}
+
+
+def _raw_range(model, range_start, range_end):
+    conditions = [model.created_at >= range_start]
+    if range_end is not None:
+        conditions.append(model.created_at < range_end)
+    return conditions
+
+
+class RollupCompactor:
+    """Background job that runs ``compact_rollups`` every few minutes"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._worker = None
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ANALYTICS_ROLLUPS_ENABLED', True)
+        app.config.setdefault('ANALYTICS_ROLLUP_INTERVAL', 300)
+        app.config.setdefault('ANALYTICS_ROLLUP_SETTLE_SECONDS', 120)
+        app.config.setdefault('ANALYTICS_HLL_PRECISION', DEFAULT_HLL_PRECISION)
+        app.config.setdefault('ANALYTICS_RETENTION_MONTHS', 13)
+        app.config.setdefault('ANALYTICS_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'archive'))
+        app.config.setdefault('ANALYTICS_PARTITION_CATALOG_TTL', 60)
+
+        self.app = app
+        self.interval = app.config['ANALYTICS_ROLLUP_INTERVAL']
+        app.extensions['analytics_rollups'] = self
+
+        if app.config['ANALYTICS_ROLLUPS_ENABLED']:
+            self.start()
+            atexit.register(self.stop)
+
+    def start(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._stopping.clear()
+        self._worker = threading.Thread(target=self._run, name='analytics-rollups', daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+            self._worker = None
+
+    def run_once(self):
+        with self.app.app_context():
+            try:
+                compacted = compact_rollups()
+            except Exception:
+                db.session.rollback()
+                logger.exception('Analytics rollup compaction failed')
+                return 0
+            if compacted:
+                # New rollup buckets change the dashboard totals
+                response_cache.invalidate('analytics')
+            try:
+                ensure_upcoming_partitions()
+                apply_retention(rollup_watermark())
+            except Exception:
+                db.session.rollback()
+                logger.exception('Analytics partition maintenance failed')
+            return compacted
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.run_once()
+
+
+rollup_compactor = RollupCompactor()
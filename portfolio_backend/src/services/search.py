@@ -0,0 +1,194 @@
+"""Full-text search over blog posts, projects and products.
+
+Documents live in one SQLite FTS5 table, ``search_index``, with a title,
+body and tags column. The rowid encodes the source row
+(``id * 8 + kind code``), so each update or delete touches exactly one
+document. The write handlers call ``index_document`` or ``remove_document``
+in the same transaction as their change. ``rebuild_search_index`` refills
+the table from scratch (``flask --app src.main db rebuild-search``).
+
+Only public rows are indexed: published posts and active products. Results
+are ranked with BM25 with the title weighted above the tags and the body.
+Every query term matches as a prefix.
+
+Titles and snippets come back as HTML. FTS5 wraps matches in private-use
+sentinel characters, the text is escaped, and only then do the sentinels
+become ``<mark>`` tags, so indexed content can never inject markup.
+"""
+import html
+import json
+import re
+
+from sqlalchemy import select, text
+
+from src.models.user import db
+from src.models.blog import BlogPost
+from src.models.project import Project
+from src.models.product import Product
+from src.services.pagination import decode_cursor, encode_cursor
+
+# Column weights for bm25(): kind, item_id, title, body, tags
+BM25_WEIGHTS = (0.0, 0.0, 10.0, 1.0, 4.0)
+SNIPPET_TOKENS = 16
+
+# Private-use code points FTS5 puts around matches; swapped for <mark> after escaping
+MATCH_OPEN = '\ue000'
+MATCH_CLOSE = '\ue001'
+
+CREATE_SEARCH_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+    "kind UNINDEXED, item_id UNINDEXED, title, body, tags, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+
+def _json_words(value):
+    """Flatten a JSON-encoded list column into plain words"""
+    if not value:
+        return ''
+    try:
+        items = json.loads(value)
+    except (TypeError, ValueError):
+        return value
+    if isinstance(items, list):
+        return ' '.join(str(item) for item in items)
+    return str(items)
+
+
+def _blog_document(post):
+    if not post.published:
+        return None
+    body = ' '.join(part for part in (post.excerpt, post.content) if part)
+    return post.title, body, _json_words(post.tags)
+
+
+def _project_document(project):
+    body = ' '.join(part for part in (project.description, _json_words(project.tech_stack)) if part)
+    return project.title, body, _json_words(project.tags)
+
+
+def _product_document(product):
+    if not product.active:
+        return None
+    return product.name, product.description, _json_words(product.tags)
+
+
+# API type name -> (model, rowid code, document builder)
+SEARCH_KINDS = {
+    'blog': (BlogPost, 1, _blog_document),
+    'project': (Project, 2, _project_document),
+    'product': (Product, 3, _product_document),
+}
+
+
+def search_available(bind=None):
+    bind = bind if bind is not None else db.engine
+    return bind.dialect.name == 'sqlite'
+
+
+def _rowid(kind, item_id):
+    return item_id * 8 + SEARCH_KINDS[kind][1]
+
+
+def _write_document(executor, kind, item):
+    document = SEARCH_KINDS[kind][2](item)
+    rowid = _rowid(kind, item.id)
+    executor.execute(text('DELETE FROM search_index WHERE rowid = :rowid'), {'rowid': rowid})
+    if document is None:
+        return False
+    title, body, tags = document
+    executor.execute(
+        text('INSERT INTO search_index (rowid, kind, item_id, title, body, tags) '
+             'VALUES (:rowid, :kind, :item_id, :title, :body, :tags)'),
+        {'rowid': rowid, 'kind': kind, 'item_id': item.id, 'title': title or '', 'body': body or '', 'tags': tags or ''}
+    )
+    return True
+
+
+def index_document(kind, item):
+    """(Re)index ``item`` in the current session; call before the handler commits"""
+    if not search_available():
+        return
+    if item.id is None:
+        db.session.flush()
+    _write_document(db.session, kind, item)
+
+
+def remove_document(kind, item_id):
+    """Drop a deleted row from the index in the current session"""
+    if not search_available():
+        return
+    db.session.execute(text('DELETE FROM search_index WHERE rowid = :rowid'), {'rowid': _rowid(kind, item_id)})
+
+
+def rebuild_search_index(connection=None):
+    """Re-index every public post, project and product; returns the document count"""
+    executor = connection if connection is not None else db.session
+    executor.execute(text('DELETE FROM search_index'))
+    count = 0
+    for kind, (model, code, build) in SEARCH_KINDS.items():
+        for item in executor.execute(select(*model.__table__.columns)):
+            count += _write_document(executor, kind, item)
+    executor.execute(text("INSERT INTO search_index (search_index) VALUES ('optimize')"))
+    if connection is None:
+        db.session.commit()
+    return count
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query where every word is a prefix term"""
+    words = re.findall(r'\w+', query.lower())
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def highlighted_html(value):
+    """Escape FTS5 output and turn its match sentinels into ``<mark>`` tags"""
+    if value is None:
+        return None
+    return html.escape(value).replace(MATCH_OPEN, '<mark>').replace(MATCH_CLOSE, '</mark>')
+
+
+def search(query, kinds=None, limit=20, cursor=None):
+    """Return ``(results, next_cursor)`` for ``query`` ranked by BM25"""
+    expression = match_expression(query)
+    if not expression:
+        return [], None
+
+    cursor_name = f'search:{expression}:{",".join(sorted(kinds or []))}'
+    weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+    clauses = ['search_index MATCH :expression']
+    params = {'expression': expression, 'limit': limit + 1, 'open': MATCH_OPEN, 'close': MATCH_CLOSE}
+
+    if kinds:
+        placeholders = ', '.join(f':kind_{index}' for index in range(len(kinds)))
+        clauses.append(f'kind IN ({placeholders})')
+        params.update({f'kind_{index}': kind for index, kind in enumerate(kinds)})
+    if cursor:
+        score, rowid = decode_cursor(cursor_name, cursor)
+        clauses.append(f'(bm25(search_index, {weights}), rowid) > (:after_score, :after_rowid)')
+        params.update({'after_score': score, 'after_rowid': rowid})
+
+    rows = db.session.execute(text(
+        f"SELECT rowid, kind, item_id, bm25(search_index, {weights}) AS score, "
+        f"highlight(search_index, 2, :open, :close) AS title, "
+        f"snippet(search_index, 3, :open, :close, '…', {SNIPPET_TOKENS}) AS snippet "
+        f"FROM search_index WHERE {' AND '.join(clauses)} "
+        f"ORDER BY score, rowid LIMIT :limit"
+    ), params).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(cursor_name, [rows[-1].score, rows[-1].rowid])
+
+    results = [
+        {
+            'type': row.kind,
+            'id': row.item_id,
+            'title': highlighted_html(row.title),
+            'snippet': highlighted_html(row.snippet),
+            'score': round(-row.score, 4)
+        }
+        for row in rows
+    ]
+    return results, next_cursor
@@ -0,0 +1,65 @@
+"""Schema-driven JSON encoding for Core result rows.
+
+The list endpoints select plain column tuples (see ``projection``) and
+turn them into dicts with a single ``zip`` per row, leaving datetimes as
+they are. ``json_response`` then encodes the whole payload in one pass:
+with ``orjson`` when it is installed (datetimes are written natively, in
+the same form as ``isoformat()``), otherwise with the standard library
+and a ``default`` hook that only fires for non-JSON values. Neither path
+hydrates ORM objects or calls ``to_dict()``.
+"""
+import json
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+from flask import Response
+
+from src.services.metrics import record_serialization
+
+try:
+    import orjson
+except ImportError:  # optional fast backend
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(payload):
+    """Encode ``payload`` as compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    """Drop-in for ``jsonify`` that uses the fast encoder"""
+    started = time.perf_counter()
+    body = dumps(payload)
+    record_serialization(time.perf_counter() - started)
+    return Response(body, status=status, mimetype='application/json')
+
+
+@lru_cache(maxsize=None)
+def model_fields(model):
+    """Serialized field names of ``model``: its columns in declaration order"""
+    return tuple(column.key for column in model.__table__.columns)
+
+
+def serialize_rows(rows, fields):
+    """Map projected row tuples onto ``fields``; values are encoded by ``dumps``"""
+    fields = tuple(fields)
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def backend():
+    return 'orjson' if orjson is not None else 'json'
@@ -0,0 +1,313 @@
+"""Serving the built SPA from ``src/static``.
+
+``static_files.init_app`` walks the static folder once at startup and
+builds an immutable manifest. It maps each URL path to the file's size,
+mtime, content hash (used as the ETag), MIME type and any precompressed
+``.br``/``.gz`` siblings. ``index.html`` and every file up to
+``STATIC_MEMORY_MAX_SIZE`` bytes are kept in memory together with their
+siblings. Serving them, and resolving unknown paths to the SPA shell,
+never touches the disk. Larger files are streamed with ``send_file`` from
+the path recorded in the manifest.
+
+When the client accepts an encoding that has a sibling, the sibling is
+sent as-is. In-memory text files without siblings are compressed once
+when the manifest is built, so ``index.html`` is not recompressed by the
+``compression`` hook on every request.
+
+Fingerprinted build output gets a one-year ``immutable`` Cache-Control;
+everything else, including ``index.html``, is revalidated on every use.
+A file counts as fingerprinted when Vite's build manifest
+(``.vite/manifest.json``, written with ``build.manifest``) lists it. Without
+a manifest only names carrying a hex content hash (``app.3f9a1c0e.js``)
+qualify, since a loose pattern would also match ``site-background.jpg``.
+
+With ``STATIC_RELOAD`` (on by default in debug mode) a background thread
+polls the folder every ``STATIC_RELOAD_INTERVAL`` seconds and swaps in a
+fresh manifest after a rebuild. ``flask --app src.main static compress``
+writes the siblings after a frontend build.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import threading
+from types import MappingProxyType
+
+from flask import Response, request, send_file
+
+from src.services.compression import COMPRESSIBLE_TYPES, available_encodings, compress
+
+logger = logging.getLogger(__name__)
+
+# Fallback when there is no build manifest: a hex content hash such as logo.4f3a9b2c.svg
+HASHED_NAME = re.compile(r'[.-][0-9a-f]{8,}\.[A-Za-z0-9]+$')
+SIBLING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+INDEX = 'index.html'
+BUILD_MANIFEST = '.vite/manifest.json'
+
+
+def _read(path):
+    with open(path, 'rb') as handle:
+        return handle.read()
+
+
+def build_output_files(folder):
+    """URL paths the Vite build manifest lists as emitted files, or None without a manifest"""
+    path = os.path.join(folder, *BUILD_MANIFEST.split('/'))
+    try:
+        with open(path, encoding='utf-8') as handle:
+            chunks = json.load(handle)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        logger.warning('Ignoring unreadable build manifest %s', path, exc_info=True)
+        return None
+
+    files = set()
+    for chunk in chunks.values() if isinstance(chunks, dict) else ():
+        if not isinstance(chunk, dict):
+            continue
+        # Entry chunks built from index.html point back at it; it is never fingerprinted
+        if chunk.get('file') and chunk['file'] != INDEX:
+            files.add(chunk['file'])
+        files.update(chunk.get('css') or ())
+        files.update(chunk.get('assets') or ())
+    return files
+
+
+def _content_hash(path):
+    digest = hashlib.blake2b(digest_size=12)
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StaticEntry:
+    """One servable file, its precompressed variants and, if small, its bytes"""
+
+    __slots__ = ('path', 'url_path', 'size', 'mtime', 'etag', 'mimetype', 'hashed', 'variants', 'bodies')
+
+    def __init__(self, path, url_path, keep_in_memory, hashed, compress_min_size=None):
+        stat = os.stat(path)
+        self.path = path
+        self.url_path = url_path
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.etag = _content_hash(path)
+        self.mimetype = mimetypes.guess_type(url_path)[0] or 'application/octet-stream'
+        self.hashed = hashed
+        self.variants = MappingProxyType({
+            encoding: path + suffix
+            for encoding, suffix in SIBLING_SUFFIXES.items()
+            if os.path.isfile(path + suffix)
+        })
+        # encoding (None for identity) -> bytes, only for entries served from memory
+        self.bodies = MappingProxyType({})
+        if keep_in_memory:
+            bodies = {None: _read(path)}
+            bodies.update((encoding, _read(variant)) for encoding, variant in self.variants.items())
+            if (
+                compress_min_size is not None
+                and not self.variants
+                and self.mimetype in COMPRESSIBLE_TYPES
+                and self.size >= compress_min_size
+            ):
+                for encoding in available_encodings():
+                    compressed = compress(bodies[None], encoding)
+                    if len(compressed) < self.size:
+                        bodies[encoding] = compressed
+            self.bodies = MappingProxyType(bodies)
+
+    def encodings(self):
+        """Encodings this entry can be sent in without compressing per request"""
+        return self.bodies.keys() if self.bodies else self.variants.keys()
+
+    def to_dict(self):
+        return {
+            'path': self.url_path,
+            'size': self.size,
+            'mtime': self.mtime,
+            'etag': self.etag,
+            'mimetype': self.mimetype,
+            'hashed': self.hashed,
+            'encodings': sorted(encoding for encoding in self.encodings() if encoding),
+            'in_memory': bool(self.bodies)
+        }
+
+
+def build_manifest(folder, memory_max_size=0, compress_min_size=None):
+    """Immutable map of each servable URL path under ``folder`` to its ``StaticEntry``
+
+    In-memory text files of at least ``compress_min_size`` bytes get their
+    compressed bodies built here; ``None`` leaves them uncompressed.
+    """
+    manifest = {}
+    if not folder or not os.path.isdir(folder):
+        return MappingProxyType(manifest)
+    build_files = build_output_files(folder)
+    for root, dirs, files in os.walk(folder):
+        # The build manifest itself is not part of the site
+        dirs[:] = [name for name in dirs if name != '.vite']
+        for name in files:
+            if name.endswith(('.br', '.gz')):
+                continue
+            path = os.path.join(root, name)
+            url_path = os.path.relpath(path, folder).replace(os.sep, '/')
+            keep_in_memory = url_path == INDEX or os.path.getsize(path) <= memory_max_size
+            if build_files is not None:
+                hashed = url_path in build_files
+            else:
+                hashed = bool(HASHED_NAME.search(url_path))
+            manifest[url_path] = StaticEntry(path, url_path, keep_in_memory, hashed, compress_min_size)
+    return MappingProxyType(manifest)
+
+
+def folder_signature(folder):
+    """Cheap fingerprint of the folder contents used by the reload watcher"""
+    signature = []
+    if folder and os.path.isdir(folder):
+        for root, dirs, files in os.walk(folder):
+            for name in files:
+                stat = os.stat(os.path.join(root, name))
+                signature.append((root, name, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(signature))
+
+
+class StaticFiles:
+    """Manifest-backed static file and SPA fallback serving"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.folder = None
+        self._manifest = MappingProxyType({})
+        self._signature = None
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stopping = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('STATIC_HASHED_MAX_AGE', 365 * 24 * 3600)
+        app.config.setdefault('STATIC_MAX_AGE', 0)
+        app.config.setdefault('STATIC_MEMORY_MAX_SIZE', 256 * 1024)
+        app.config.setdefault('STATIC_RELOAD', app.debug)
+        app.config.setdefault('STATIC_RELOAD_INTERVAL', 1.0)
+
+        self.app = app
+        self.folder = app.static_folder
+        app.extensions['static_files'] = self
+        self.reload()
+
+        if app.config['STATIC_RELOAD']:
+            self.start_watcher()
+            atexit.register(self.stop_watcher)
+
+    def manifest(self):
+        return self._manifest
+
+    def reload(self):
+        """Rescan the static folder and swap in the new manifest"""
+        with self._lock:
+            self._signature = folder_signature(self.folder)
+            self._manifest = build_manifest(
+                self.folder,
+                self.app.config['STATIC_MEMORY_MAX_SIZE'],
+                self.app.config['COMPRESS_MIN_SIZE'] if self.app.config.get('COMPRESS_ENABLED') else None
+            )
+        return self._manifest
+
+    def start_watcher(self):
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stopping.clear()
+        self._watcher = threading.Thread(target=self._watch, name='static-reload', daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stopping.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def serve(self, path):
+        """Response for ``path``, falling back to index.html for SPA routes"""
+        manifest = self._manifest
+        entry = manifest.get(path) if path else None
+        if entry is None:
+            entry = manifest.get(INDEX)
+            if entry is None:
+                return "index.html not found", 404
+        return self._send(entry)
+
+    def _send(self, entry):
+        # A prebuilt .br needs no brotli package to serve, so prefer it whenever it exists
+        encoding = next(
+            (encoding for encoding in ('br', 'gzip') if encoding in entry.encodings() and request.accept_encodings[encoding]),
+            None
+        )
+        etag = f'{entry.etag}-{encoding}' if encoding else entry.etag
+
+        if entry.bodies:
+            response = Response(entry.bodies[encoding], mimetype=entry.mimetype)
+            response.set_etag(etag)
+            response.last_modified = entry.mtime
+            response.make_conditional(request)
+        else:
+            response = send_file(
+                entry.variants[encoding] if encoding else entry.path,
+                mimetype=entry.mimetype,
+                etag=etag,
+                last_modified=entry.mtime,
+                conditional=True
+            )
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if any(entry.encodings()):
+            response.vary.add('Accept-Encoding')
+
+        if entry.hashed:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = self.app.config['STATIC_HASHED_MAX_AGE']
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+            response.cache_control.max_age = self.app.config['STATIC_MAX_AGE']
+        return response
+
+    def _watch(self):
+        while not self._stopping.wait(self.app.config['STATIC_RELOAD_INTERVAL']):
+            try:
+                if folder_signature(self.folder) != self._signature:
+                    self.reload()
+                    logger.info('Reloaded static manifest (%d files)', len(self._manifest))
+            except OSError:
+                # A build may be rewriting files; retry on the next tick
+                logger.debug('Static manifest reload deferred', exc_info=True)
+
+
+def precompress(folder, min_size=1024):
+    """Write .gz (and .br when available) siblings for compressible files; returns files written"""
+    written = 0
+    for url_path, entry in build_manifest(folder).items():
+        if entry.mimetype not in COMPRESSIBLE_TYPES or entry.size < min_size:
+            continue
+        data = _read(entry.path)
+        for encoding in available_encodings():
+            target = entry.path + SIBLING_SUFFIXES[encoding]
+            compressed = compress(data, encoding, 11 if encoding == 'br' else 9)
+            if len(compressed) >= len(data):
+                continue
+            with open(target, 'wb') as handle:
+                handle.write(compressed)
+            os.utime(target, (entry.mtime, entry.mtime))
+            written += 1
+    return written
+
+
+static_files = StaticFiles()
@@ -0,0 +1,175 @@
+"""Normalized tag, tech-stack and gallery-image index.
+
+The JSON text columns (``tags``, ``tech_stack``, ``gallery_images``) stay
+as the API representation. Every write also mirrors them into ``tag`` /
+``tagged_item`` and ``product_image``, so filters and counts run as
+indexed joins instead of parsing JSON row by row, and
+``/shop/products/<id>/images`` reads a product's gallery in order. ``sync_item`` is called
+by the write handlers before they commit; ``rebuild_tag_index`` refills
+everything from the JSON columns.
+"""
+import json
+
+from sqlalchemy import and_, delete, func, insert, or_, select
+
+from src.models.user import db
+from src.models.blog import BlogPost
+from src.models.project import Project
+from src.models.product import Product
+from src.models.tag import Tag, TaggedItem, ProductImage
+
+TAG_KINDS = ('tag', 'tech')
+
+# item type -> (model, {tag kind: JSON column})
+TAGGED_TYPES = {
+    'project': (Project, {'tag': 'tags', 'tech': 'tech_stack'}),
+    'blog': (BlogPost, {'tag': 'tags'}),
+    'product': (Product, {'tag': 'tags'}),
+}
+
+# item type -> condition for rows the public endpoints show (drafts and inactive products are hidden)
+VISIBLE = {
+    'blog': BlogPost.published.is_(True),
+    'product': Product.active.is_(True),
+}
+
+
+def json_list(value):
+    """Decode a JSON list column, tolerating NULL and malformed text"""
+    if not value:
+        return []
+    try:
+        items = json.loads(value)
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(items, list):
+        return []
+    return [str(item).strip() for item in items if item is not None and str(item).strip()]
+
+
+def tag_key(name):
+    return name.strip().lower()
+
+
+def _tag_ids(executor, names):
+    """Map each tag key to its id, creating missing tags"""
+    by_key = {}
+    for name in names:
+        by_key.setdefault(tag_key(name), name.strip())
+    if not by_key:
+        return {}
+
+    ids = dict(executor.execute(select(Tag.key, Tag.id).where(Tag.key.in_(by_key))).all())
+    missing = [{'name': name, 'key': key} for key, name in by_key.items() if key not in ids]
+    if missing:
+        executor.execute(insert(Tag), missing)
+        ids.update(executor.execute(
+            select(Tag.key, Tag.id).where(Tag.key.in_([row['key'] for row in missing]))
+        ).all())
+    return ids
+
+
+def _write_item(executor, item_type, item):
+    model, columns = TAGGED_TYPES[item_type]
+    executor.execute(delete(TaggedItem).where(TaggedItem.item_type == item_type, TaggedItem.item_id == item.id))
+
+    names_by_kind = {kind: json_list(getattr(item, column)) for kind, column in columns.items()}
+    ids = _tag_ids(executor, [name for names in names_by_kind.values() for name in names])
+    rows = []
+    for kind, names in names_by_kind.items():
+        for key in dict.fromkeys(tag_key(name) for name in names):
+            rows.append({'tag_id': ids[key], 'kind': kind, 'item_type': item_type, 'item_id': item.id})
+    if rows:
+        executor.execute(insert(TaggedItem), rows)
+
+    if item_type == 'product':
+        executor.execute(delete(ProductImage).where(ProductImage.product_id == item.id))
+        images = [
+            {'product_id': item.id, 'position': position, 'url': url}
+            for position, url in enumerate(json_list(item.gallery_images))
+        ]
+        if images:
+            executor.execute(insert(ProductImage), images)
+
+
+def sync_item(item_type, item):
+    """Mirror ``item``'s JSON tag columns into the index; call before committing"""
+    if item.id is None:
+        db.session.flush()
+    _write_item(db.session, item_type, item)
+
+
+def remove_item(item_type, item_id):
+    """Drop a deleted row's tags (and product images) from the index"""
+    db.session.execute(delete(TaggedItem).where(TaggedItem.item_type == item_type, TaggedItem.item_id == item_id))
+    if item_type == 'product':
+        db.session.execute(delete(ProductImage).where(ProductImage.product_id == item_id))
+
+
+def rebuild_tag_index(connection=None):
+    """Rebuild tagged_item and product_image from the JSON columns; returns rows indexed"""
+    executor = connection if connection is not None else db.session
+    executor.execute(delete(TaggedItem))
+    executor.execute(delete(ProductImage))
+    count = 0
+    for item_type, (model, columns) in TAGGED_TYPES.items():
+        for item in executor.execute(select(*model.__table__.columns)).all():
+            _write_item(executor, item_type, item)
+            count += 1
+    if connection is None:
+        db.session.commit()
+    return count
+
+
+def filter_by_tag(query, model, item_type, name, kind='tag'):
+    """Restrict ``query`` to rows carrying tag ``name`` through an indexed join"""
+    return (
+        query
+        .join(TaggedItem, and_(
+            TaggedItem.item_id == model.id,
+            TaggedItem.item_type == item_type,
+            TaggedItem.kind == kind
+        ))
+        .join(Tag, Tag.id == TaggedItem.tag_id)
+        .filter(Tag.key == tag_key(name))
+    )
+
+
+def _visible_items():
+    """Condition keeping tagged items whose row is public"""
+    conditions = []
+    for item_type, (model, _) in TAGGED_TYPES.items():
+        if item_type in VISIBLE:
+            visible_ids = select(model.id).where(VISIBLE[item_type])
+            conditions.append(and_(TaggedItem.item_type == item_type, TaggedItem.item_id.in_(visible_ids)))
+        else:
+            conditions.append(TaggedItem.item_type == item_type)
+    return or_(*conditions)
+
+
+def tag_counts(kind=None, item_type=None, limit=None):
+    """Return ``[{'name', 'count'}]`` ordered by how many public items use each tag"""
+    count = func.count().label('count')
+    query = (
+        select(Tag.name, count)
+        .join(TaggedItem, TaggedItem.tag_id == Tag.id)
+        .where(_visible_items())
+        .group_by(Tag.id)
+        .order_by(count.desc(), Tag.name)
+    )
+    if kind:
+        query = query.where(TaggedItem.kind == kind)
+    if item_type:
+        query = query.where(TaggedItem.item_type == item_type)
+    if limit:
+        query = query.limit(limit)
+    return [{'name': name, 'count': total} for name, total in db.session.execute(query)]
+
+
+def product_images(product_id):
+    """A product's gallery images in display order"""
+    return db.session.execute(
+        select(ProductImage)
+        .where(ProductImage.product_id == product_id)
+        .order_by(ProductImage.position)
+    ).scalars().all()
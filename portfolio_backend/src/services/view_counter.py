@@ -0,0 +1,143 @@
+"""Write-behind view counter for blog posts.
+
+Reading a post only bumps an in-memory delta. A background worker folds the
+pending deltas into ``blog_post.views`` every ``BLOG_VIEW_FLUSH_INTERVAL``
+seconds with one executemany ``UPDATE ... SET views = views + :delta``, so
+the read path never takes SQLite's write lock. Views that have not been
+flushed yet are added back in by ``current_views``; at most one interval of
+counts is lost if the process dies without running its exit hook.
+
+Deltas are kept per process, so with several gunicorn workers each one
+flushes its own share into the same column.
+
+A flush does not touch the blog collection version or the response cache,
+which would otherwise be thrown away every interval on any site with
+traffic. The cached and ETagged blog lists and ``/blog/posts/<id>``
+therefore report ``views`` as of their last content change or cache expiry.
+The uncached slug route adds the pending deltas and is always current.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from sqlalchemy import bindparam, func, update
+
+from src.models.user import db
+from src.models.blog import BlogPost
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """Buffers ``BlogPost.views`` increments and flushes them in bulk"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = False
+        self.flush_interval = 5.0
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._worker = None
+        self._stopping = threading.Event()
+        self._stats = {'recorded': 0, 'flushed': 0, 'failed': 0, 'batches': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('BLOG_VIEW_COUNTER_ENABLED', True)
+        app.config.setdefault('BLOG_VIEW_FLUSH_INTERVAL', 5.0)
+
+        self.app = app
+        self.enabled = app.config['BLOG_VIEW_COUNTER_ENABLED']
+        self.flush_interval = app.config['BLOG_VIEW_FLUSH_INTERVAL']
+        app.extensions['blog_view_counter'] = self
+
+        if self.enabled:
+            self.start()
+            atexit.register(self.stop)
+
+    def start(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._stopping.clear()
+        self._worker = threading.Thread(target=self._run, name='blog-view-counter', daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        """Stop the worker and flush the remaining deltas"""
+        self._stopping.set()
+        if self._worker is not None:
+            self._worker.join(timeout=max(self.flush_interval * 2, 5))
+            self._worker = None
+        self.flush()
+
+    def record(self, post_id, amount=1):
+        """Count ``amount`` views of ``post_id``; writes through when disabled"""
+        with self._lock:
+            self._pending[post_id] += amount
+            self._stats['recorded'] += amount
+        if not self.enabled:
+            self.flush()
+
+    def current_views(self, post):
+        """Persisted views of ``post`` plus the deltas not yet flushed"""
+        with self._lock:
+            pending = self._pending.get(post.id, 0)
+        return (post.views or 0) + pending
+
+    def flush(self):
+        """Write every pending delta with one batched UPDATE"""
+        with self._flush_lock:
+            with self._lock:
+                deltas, self._pending = self._pending, Counter()
+            if not deltas:
+                return 0
+
+            try:
+                self._write(deltas)
+            except Exception:
+                logger.exception('Failed to flush views for %d blog posts', len(deltas))
+                with self._lock:
+                    # Keep the counts so the next flush retries them
+                    self._pending.update(deltas)
+                    self._stats['failed'] += 1
+                return 0
+
+            with self._lock:
+                self._stats['flushed'] += sum(deltas.values())
+                self._stats['batches'] += 1
+            return len(deltas)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending_posts'] = len(self._pending)
+            stats['pending_views'] = sum(self._pending.values())
+        stats['running'] = self._worker is not None and self._worker.is_alive()
+        return stats
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+
+    def _write(self, deltas):
+        table = BlogPost.__table__
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam('post_id'))
+            # A view is not an edit, so leave updated_at alone
+            .values(views=func.coalesce(table.c.views, 0) + bindparam('delta'), updated_at=table.c.updated_at)
+        )
+        rows = [{'post_id': post_id, 'delta': delta} for post_id, delta in deltas.items()]
+        with self.app.app_context():
+            try:
+                db.session.execute(statement, rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,48 @@
+"""Shared fixtures: the app on a scratch SQLite database.
+
+``src.main`` reads ``DATABASE_URL`` and creates its schema at import, so the
+variable is set here before any test imports it. Run from
+``portfolio_backend`` with ``python -m pytest``.
+"""
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='portfolio-tests-'), 'app.db')
+os.environ.pop('DATABASE_REPLICA_URLS', None)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from src.main import app
+    return app
+
+
+@pytest.fixture(scope='session')
+def seeded(app):
+    """A handful of projects and published posts, enough for a per-row query to repeat"""
+    from src.models.blog import BlogPost
+    from src.models.project import Project
+    from src.models.user import db
+
+    with app.app_context():
+        for i in range(6):
+            db.session.add(Project(title=f'Project {i}', description='Description', category='web', tags='["flask"]'))
+            db.session.add(BlogPost(
+                title=f'Post {i}', slug=f'post-{i}', content='Content', category='AI',
+                published=True, published_at=datetime.utcnow()
+            ))
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def client(seeded):
+    from src.services.cache import response_cache
+
+    # Every test starts with a cold response cache so its queries actually run
+    with seeded.app_context():
+        response_cache.clear()
+    return seeded.test_client()
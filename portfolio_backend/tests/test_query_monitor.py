@@ -0,0 +1,57 @@
+from collections import Counter
+
+import pytest
+
+from src.models.project import Project
+from src.services.query_monitor import (
+    QueryBudgetExceeded, assert_max_queries, check_route_queries, fingerprint, query_monitor
+)
+from src.services.query_plans import ROUTE_PLAN_CHECKS
+
+
+@pytest.mark.parametrize('path', ['/api/projects', '/api/blog/posts', '/api/shop/products'])
+def test_list_endpoint_within_budget(client, path):
+    # One collection_version read for the ETag plus the page itself, however many rows
+    with assert_max_queries(2, repeat_threshold=2):
+        response = client.get(path)
+    assert response.status_code == 200
+
+
+def test_cached_list_skips_the_page_query(client):
+    client.get('/api/projects')
+    with assert_max_queries(1):
+        response = client.get('/api/projects')
+    assert response.headers['X-Cache'] == 'HIT'
+
+
+def test_assert_max_queries_flags_n_plus_one(seeded):
+    with seeded.app_context():
+        projects = Project.query.all()
+        with pytest.raises(QueryBudgetExceeded, match='repeated 6x'):
+            with assert_max_queries(100, repeat_threshold=3):
+                for project in projects:
+                    Project.query.filter_by(id=project.id).first()
+
+
+def test_assert_max_queries_flags_budget(seeded):
+    with seeded.app_context():
+        with pytest.raises(QueryBudgetExceeded, match='2 statements, budget is 1'):
+            with assert_max_queries(1):
+                Project.query.count()
+                Project.query.count()
+
+
+def test_fingerprint_folds_in_lists():
+    assert fingerprint('SELECT * FROM t WHERE id IN (?, ?, ?)') == fingerprint('SELECT *\n  FROM t WHERE id IN (?,?)')
+
+
+def test_monitor_check_reports_repeats(seeded):
+    statement = fingerprint('SELECT * FROM tag WHERE item_id = ?')
+    with seeded.test_request_context():
+        problems = query_monitor.check('projects.get_projects', Counter({statement: query_monitor.repeat_threshold}))
+        assert problems == [f'repeated {query_monitor.repeat_threshold}x (possible N+1): {statement}']
+        assert query_monitor.check('projects.get_projects', Counter({statement: 1})) == []
+
+
+def test_route_checks_pass(seeded):
+    assert check_route_queries(seeded, ROUTE_PLAN_CHECKS) == {}
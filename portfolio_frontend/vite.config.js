@@ -11,6 +11,10 @@ export default defineConfig({
       "@": path.resolve(__dirname, "./src"),
     },
   },
+  build: {
+    // Lets the backend tell fingerprinted assets apart when setting Cache-Control
+    manifest: true,
+  },
   server: {
     host: '0.0.0.0',
     port: 5173,